@@ -0,0 +1,263 @@
+"""管理后台：由 app.create_app() 调用 init_admin() 时才导入并注册
+
+列表视图不统计总数，按 (排序列, id) 键集翻页，搜索和批量操作由子类按索引实现。
+
+Flask-Admin 的翻页链接只带页码，因此上一页/下一页链接额外带上当前页第一行/最后一行的排序键（before/after 参数），
+任一工作进程收到后都能直接从该位置继续；没有这个参数（直接跳到某页、改了每页条数）时退回 OFFSET。
+"""
+import base64
+import json
+from collections import namedtuple
+from datetime import datetime
+
+from flask import flash, g, redirect, session, url_for
+from flask_admin import Admin, AdminIndexView
+from flask_admin.actions import action
+from flask_admin.babel import gettext, lazy_gettext
+from flask_admin.contrib.sqla import ModelView, tools
+from sqlalchemy import and_, or_, select, tuple_
+
+import dataio
+import search_index
+
+SEEK_ARGS = ('after', 'before')
+
+# 列表当前页的排序方式和首尾两行，用于生成上一页/下一页链接
+ListRows = namedtuple('ListRows', ['column', 'descending', 'first', 'last'])
+
+
+def keyset_filters(column, pk, descending, value, last_id):
+    """返回 (排序键在 (value, last_id) 之后的行, 这些行取完后接着取的行)，第二项可能为 None
+
+    SQLite 中 NULL 在升序时最前、倒序时最后。NULL 段和非 NULL 段分开查询，
+    不把 IS NULL 用 OR 拼进定位条件，两段都能在 (排序列, id) 索引上直接定位。
+    """
+    after_pk = pk < last_id if descending else pk > last_id
+    if column.key == pk.key:
+        return after_pk, None
+    if value is None:
+        return and_(column.is_(None), after_pk), None if descending else column.isnot(None)
+    key = tuple_(column, pk)
+    seek = key < (value, last_id) if descending else key > (value, last_id)
+    return seek, column.is_(None) if descending and column.expression.nullable else None
+
+
+def encode_position(column, descending, row):
+    """把一行的排序键编码为翻页参数，带上排序列和方向，排序改变后不再使用"""
+    value = getattr(row, column.key)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([column.key, descending, value, row.id], ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_position(column, descending, token):
+    """解析翻页参数，返回 (排序值, id)；格式错误或者不是当前排序时返回 None"""
+    try:
+        key, token_descending, value, last_id = json.loads(base64.urlsafe_b64decode(token.encode()))
+        if key != column.key or token_descending is not descending or type(last_id) is not int:
+            return None
+        if value is not None:
+            python_type = column.expression.type.python_type
+            value = datetime.fromisoformat(value) if python_type is datetime else python_type(value)
+    except (TypeError, ValueError):  # json.JSONDecodeError、binascii.Error 均为 ValueError 的子类
+        return None
+    return value, last_id
+
+
+def prefix_filter(column, term):
+    """前缀匹配，用范围条件代替 LIKE 以便使用列上的索引（区分大小写）"""
+    return and_(column >= term, column < term + '\uffff')
+
+
+class KeysetModelView(ModelView):
+    """只允许按有索引的列排序；子类用 search_filter 返回能用上索引的搜索条件"""
+
+    simple_list_pager = True  # 不执行 COUNT(*)，只显示上一页/下一页
+    page_size = 50
+    column_default_sort = ('id', True)
+    bulk_chunk_size = 500
+
+    def search_filter(self, term):
+        """返回 term 的搜索条件；返回 None 时使用 Flask-Admin 默认的 LIKE 搜索"""
+        return None
+
+    def _apply_search(self, query, count_query, joins, count_joins, search):
+        terms = search.split()
+        conditions = [self.search_filter(term) for term in terms]
+        if any(condition is None for condition in conditions):
+            return super()._apply_search(query, count_query, joins, count_joins, search)
+        for condition in conditions:
+            query = query.filter(condition)
+            if count_query is not None:
+                count_query = count_query.filter(condition)
+        return query, count_query, joins, count_joins
+
+    def _get_list_extra_args(self):
+        """翻页参数不属于 Flask-Admin 的列表参数，取出后不再带到排序、搜索等链接中"""
+        view_args = super()._get_list_extra_args()
+        g.admin_list_seek = None
+        for name in SEEK_ARGS:
+            token = view_args.extra_args.pop(name, None)
+            if token and view_args.page:
+                g.admin_list_seek = (name, token)
+        g.admin_list_args = view_args
+        return view_args
+
+    def _get_list_url(self, view_args):
+        """当前列表的上一页/下一页（以及当前页，用作编辑后的返回地址）带上排序键"""
+        current, rows = getattr(g, 'admin_list_args', None), getattr(g, 'admin_list_rows', None)
+        if current is not None and (view_args.sort, view_args.sort_desc, view_args.search, view_args.filters,
+                                    view_args.page_size) == (current.sort, current.sort_desc, current.search,
+                                                             current.filters, current.page_size):
+            page, current_page = view_args.page or 0, current.page or 0
+            seek = None
+            if page and page == current_page and g.admin_list_seek:
+                seek = g.admin_list_seek
+            elif rows and page and page == current_page + 1:
+                seek = ('after', encode_position(rows.column, rows.descending, rows.last))
+            elif rows and page and page == current_page - 1:
+                seek = ('before', encode_position(rows.column, rows.descending, rows.first))
+            if seek is not None:
+                view_args = view_args.clone(extra_args=dict(view_args.extra_args, **dict([seek])))
+        return super()._get_list_url(view_args)
+
+    def _apply_sorting(self, query, joins, sort_column, sort_desc):
+        pk = self.model.id
+        if sort_column is not None and sort_column in self._sortable_columns:
+            column, descending = self._sortable_columns[sort_column], bool(sort_desc)
+        else:
+            column, descending = getattr(self.model, self.column_default_sort[0]), self.column_default_sort[1]
+        g.admin_list_sort = (column, descending)
+        # 向前翻页时按相反的顺序从本页第一行往回取，取到后再倒过来
+        g.admin_list_position = None
+        seek = getattr(g, 'admin_list_seek', None)
+        if seek is not None:
+            position = decode_position(column, descending, seek[1])
+            if position is not None:
+                g.admin_list_position = (seek[0] == 'before',) + position
+                descending ^= seek[0] == 'before'
+        # 相同排序值按 id 排列，翻页位置唯一
+        query = query.order_by(column.desc() if descending else column)
+        if column.key != pk.key:
+            query = query.order_by(pk.desc() if descending else pk)
+        return query, joins
+
+    def _apply_pagination(self, query, page, page_size):
+        page_size = page_size or self.page_size
+        position = g.admin_list_position if page else None
+        g.admin_list_rest = None
+        if position is None:
+            return super()._apply_pagination(query, page, page_size)
+        column, descending = g.admin_list_sort
+        backward, value, last_id = position
+        seek, rest = keyset_filters(column, self.model.id, descending ^ backward, value, last_id)
+        if rest is not None:
+            g.admin_list_rest = (query, rest)
+        return query.filter(seek).limit(page_size)
+
+    def get_list(self, page, sort_column, sort_desc, search, filters, execute=True, page_size=None):
+        g.admin_list_rows = None
+        count, data = super().get_list(page, sort_column, sort_desc, search, filters, execute, page_size)
+        if not execute:
+            return count, data
+        page_size = page_size or self.page_size
+        if g.admin_list_rest is not None and len(data) < page_size:
+            # 当前段（NULL 或非 NULL）取完了，用另一条能走索引的查询接着取另一段
+            query, rest = g.admin_list_rest
+            data += query.filter(rest).limit(page_size - len(data)).all()
+        if page and g.admin_list_position is not None and g.admin_list_position[0]:
+            data.reverse()
+        if data:
+            column, descending = g.admin_list_sort
+            g.admin_list_rows = ListRows(column, descending, data[0], data[-1])
+        return count, data
+
+    @action('delete', lazy_gettext('Delete'), lazy_gettext('Are you sure you want to delete selected records?'))
+    def action_delete(self, ids):
+        """批量删除按 bulk_chunk_size 分块提交，每块一个事务，删除逐行经过 ORM 以同步全文索引等"""
+        deleted = 0
+        try:
+            for chunk in dataio.chunked(ids, self.bulk_chunk_size):
+                models = tools.get_query_for_ids(self.get_query(), self.model, chunk).all()
+                for model in models:
+                    self.on_model_delete(model)
+                    self.session.delete(model)
+                self.session.commit()
+                deleted += len(models)
+        except Exception as ex:
+            self.session.rollback()
+            if not self.handle_view_exception(ex):
+                raise
+            flash(gettext('Failed to delete records. %(error)s', error=str(ex)), 'error')
+        if deleted:
+            flash(f'已删除 {deleted} 条记录', 'success')
+
+
+class SecureModelView(KeysetModelView):
+    def is_accessible(self):
+        return session.get('is_admin', False)
+
+    def inaccessible_callback(self, name, **kwargs):
+        return redirect(url_for('main.admin_login'))
+
+
+class SecureAdminIndexView(AdminIndexView):
+    def is_accessible(self):
+        return session.get('is_admin', False)
+
+    def inaccessible_callback(self, name, **kwargs):
+        return redirect(url_for('main.admin_login'))
+
+
+def company_search_ids(session_, company_model, term):
+    """全文索引中匹配 term 的公司 id 子查询，不可用时退回名称前缀匹配"""
+    ranked = search_index.ranked_matches(term) if search_index.is_available() else None
+    if ranked is None:
+        return session_.query(company_model.id).filter(prefix_filter(company_model.name, term))
+    return select([ranked.subquery().c.rowid])
+
+
+# 列表只能按有索引的列排序，搜索只用能走索引的条件（前缀匹配、全文索引）
+class UserAdmin(SecureModelView):
+    column_sortable_list = ['id', 'username', 'email']
+    column_searchable_list = ['username', 'email']
+
+    def search_filter(self, term):
+        return or_(prefix_filter(self.model.username, term), prefix_filter(self.model.email, term))
+
+
+class CompanyAdmin(SecureModelView):
+    column_sortable_list = ['id', 'name', 'country', 'certification_status']
+    column_searchable_list = ['name', 'country', 'description']
+
+    def search_filter(self, term):
+        return self.model.id.in_(company_search_ids(self.session, self.model, term))
+
+
+class ProductAdmin(SecureModelView):
+    column_sortable_list = ['id', 'model_name', 'max_range', 'max_speed', 'passenger_capacity']
+    column_searchable_list = ['model_name', 'company.name']
+
+    def search_filter(self, term):
+        company_model = self.model.company.property.mapper.class_
+        return or_(prefix_filter(self.model.model_name, term),
+                   self.model.company_id.in_(company_search_ids(self.session, company_model, term)))
+
+
+class JobAdmin(SecureModelView):
+    column_sortable_list = ['id', 'created_at', 'salary_min', 'salary_max']
+    column_searchable_list = ['company', 'location']
+    column_default_sort = ('created_at', True)
+
+    def search_filter(self, term):
+        return or_(prefix_filter(self.model.company, term), self.model.location == term)
+
+
+def build_admin(app, session_, user_model, company_model, product_model, job_model):
+    admin = Admin(app, name='EVTOL管理后台', template_mode='bootstrap3', index_view=SecureAdminIndexView())
+    admin.add_view(UserAdmin(user_model, session_, name='用户管理'))
+    admin.add_view(CompanyAdmin(company_model, session_, name='EVTOL公司'))
+    admin.add_view(ProductAdmin(product_model, session_, name='EVTOL产品'))
+    admin.add_view(JobAdmin(job_model, session_, name='招聘信息'))
+    return admin
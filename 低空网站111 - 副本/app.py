@@ -1,17 +1,66 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session
-from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Blueprint, Flask, Response, current_app, render_template, request, jsonify, redirect, url_for, flash, session
+from sqlalchemy import event, inspect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import contains_eager, object_session
+from collections import namedtuple
 from datetime import datetime
+import base64
+import functools
+import gc
+import hashlib
+import json
+import logging
 import os
+import threading
+import time
 
-app = Flask(__name__)
-# 配置
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///database.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['SECRET_KEY'] = 'your-secret-key'  # 用于session加密
-app.config['FLASK_ADMIN_SWATCH'] = 'cerulean'  # 管理界面主题
+import click
 
-db = SQLAlchemy(app)
+import assets
+import cache
+import catalog
+import dataio
+import hashing
+import metrics
+import query_guard
+import search_index
+import suggest_index
+import versions
+from salary import parse_salary, parse_salary_range
+from storage import SQLiteProfileSQLAlchemy, is_file_database
+from write_queue import GroupCommitQueue, WriteQueueBusy
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# 路由、命令和请求钩子注册在蓝图上，由 create_app() 注册到应用
+main = Blueprint('main', __name__, cli_group=None)
+
+# 扩展和缓存对象在导入时创建，create_app() 中按应用配置初始化
+db = SQLiteProfileSQLAlchemy()
+
+# 请求耗时、SQL 和模板渲染指标，/metrics 汇总所有工作进程
+request_metrics = metrics.RequestMetrics()
+
+# 密码哈希在进程池中计算，排队超过上限时返回 503；等待和计算耗时记入 /metrics
+passwords = hashing.PasswordHasher(registry=request_metrics.registry)
+
+# 静态资源清单（python assets.py 生成）：url_for('static') 指向压缩后带内容哈希的文件，调试模式下直接使用源文件
+@main.app_url_defaults
+def _hashed_static_url(endpoint, values):
+    if endpoint == 'static':
+        asset_manifest = current_app.extensions['asset_manifest']
+        if values.get('filename') in asset_manifest:
+            values['filename'] = asset_manifest[values['filename']]
+
+@main.after_app_request
+def _cache_hashed_static(response):
+    """带哈希的文件内容不会变化，没有经过 nginx 时也让浏览器长期缓存"""
+    if request.endpoint == 'static' and request.view_args['filename'].startswith(assets.DIST + '/'):
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = current_app.config['ASSET_MAX_AGE']
+        response.cache_control.immutable = True
+    return response
 
 # 先定义所有模型
 class User(db.Model):
@@ -21,10 +70,10 @@ class User(db.Model):
     password_hash = db.Column(db.String(128))
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = passwords.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return passwords.verify(self.password_hash, password)
 
 class AdminUser(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -33,27 +82,197 @@ class AdminUser(db.Model):
     is_admin = db.Column(db.Boolean, default=True)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = passwords.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return passwords.verify(self.password_hash, password)
 
 # 定义EVTOL公司模型
 class EvtolCompany(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
-    country = db.Column(db.String(50))
+    name = db.Column(db.String(100), nullable=False, index=True)
+    country = db.Column(db.String(50), index=True)
     description = db.Column(db.Text)
-    certification_status = db.Column(db.String(100))
+    certification_status = db.Column(db.String(100), index=True)
+
+def _queue_suggest_change(target, *change):
+    """记录联想索引的变更，事务提交后才应用到内存"""
+    target_session = object_session(target)
+    if target_session is not None:
+        target_session.info.setdefault('suggest_changes', []).append(change)
+
+# 公司数据变更时同步全文索引（包括 Flask-Admin 中的编辑），与业务数据在同一事务内提交
+@event.listens_for(EvtolCompany, 'after_insert')
+@event.listens_for(EvtolCompany, 'after_update')
+def _index_company(mapper, connection, target):
+    search_index.index_company(connection, target)
+    _queue_suggest_change(target, 'upsert_company', target.id, target.name, target.country)
+
+@event.listens_for(EvtolCompany, 'after_delete')
+def _unindex_company(mapper, connection, target):
+    search_index.remove_company(connection, target.id)
+    _queue_suggest_change(target, 'remove_company', target.id)
     
 # 定义EVTOL产品模型
 class EvtolProduct(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    company_id = db.Column(db.Integer, db.ForeignKey('evtol_company.id'))
-    model_name = db.Column(db.String(100), nullable=False)
-    max_range = db.Column(db.Float)
-    max_speed = db.Column(db.Float)
-    passenger_capacity = db.Column(db.Integer)
+    company_id = db.Column(db.Integer, db.ForeignKey('evtol_company.id'), index=True)
+    model_name = db.Column(db.String(100), nullable=False, index=True)
+    max_range = db.Column(db.Float, index=True)
+    max_speed = db.Column(db.Float, index=True)
+    passenger_capacity = db.Column(db.Integer, index=True)
+
+    company = db.relationship('EvtolCompany', backref='products')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'model_name': self.model_name,
+            'max_range': self.max_range,
+            'max_speed': self.max_speed,
+            'passenger_capacity': self.passenger_capacity,
+            'company': {
+                'id': self.company.id,
+                'name': self.company.name,
+                'country': self.company.country,
+                'certification_status': self.company.certification_status
+            } if self.company else None
+        }
+
+@event.listens_for(EvtolProduct, 'after_insert')
+@event.listens_for(EvtolProduct, 'after_update')
+def _index_product(mapper, connection, target):
+    _queue_suggest_change(target, 'upsert_product', target.id, target.model_name)
+
+@event.listens_for(EvtolProduct, 'after_delete')
+def _unindex_product(mapper, connection, target):
+    _queue_suggest_change(target, 'remove_product', target.id)
+
+# 联想索引（每个进程一份），提交后增量更新，回滚则丢弃变更
+suggestions = suggest_index.SuggestIndex()
+
+@event.listens_for(db.session, 'after_commit')
+def _apply_suggest_changes(committed_session):
+    for method, *args in committed_session.info.pop('suggest_changes', []):
+        if suggestions.loaded_at:
+            getattr(suggestions, method)(*args)
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_suggest_changes(rolled_back_session):
+    rolled_back_session.info.pop('suggest_changes', None)
+
+# 数据表版本号，每次写入时在同一事务内递增
+table_version = db.Table(
+    versions.VERSION_TABLE,
+    db.Column('name', db.String(50), primary_key=True),
+    db.Column('version', db.Integer, nullable=False),
+    db.Column('updated_at', db.Float)
+)
+table_versions = versions.TableVersions()
+
+def table_stamps(tables):
+    return table_versions.stamps(db.get_read_engine() or db.engine, tables)
+
+def shared_cache_path(app):
+    """共享缓存文件放在数据库文件旁边，内存数据库不使用"""
+    url = db.get_engine(app).url
+    if not app.config['SHARED_CACHE_ENABLED'] or not is_file_database(url):
+        return None
+    return url.database + '-cache'
+
+def deploy_version():
+    """返回 (指纹, 最后修改时间)：指纹由代码、模板和静态资源清单的修改时间和大小计算，重新部署后随之变化"""
+    paths = [os.path.join(ROOT, name) for name in os.listdir(ROOT) if name.endswith('.py')]
+    for root, _, names in os.walk(os.path.join(ROOT, 'templates')):
+        paths.extend(os.path.join(root, name) for name in names)
+    paths.append(os.path.join(assets.STATIC_FOLDER, assets.MANIFEST))
+    digest = hashlib.sha1()
+    latest = 0
+    for path in sorted(paths):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        digest.update(f'{path}:{stat.st_mtime_ns}:{stat.st_size};'.encode())
+        latest = max(latest, stat.st_mtime)
+    return digest.hexdigest()[:12], latest
+
+# 与数据表版本的格式相同：(版本, 修改时间)
+DEPLOY_VERSION = deploy_version()
+
+def response_stamps(tables):
+    """条件 GET 使用数据表版本加上部署版本：重新部署后页面引用的静态资源文件名会变，旧的 ETag 和 Last-Modified 都不再有效"""
+    return table_stamps(tables) + (DEPLOY_VERSION,)
+
+def catalog_paths(app):
+    """目录快照放在数据库文件旁边，内存数据库不使用"""
+    url = db.get_engine(app).url
+    if not app.config['CATALOG_SNAPSHOT_ENABLED'] or not is_file_database(url):
+        return None
+    return url.database, url.database + '-catalog'
+
+# 公司和产品目录的只读快照（mmap），版本与数据库一致时 /search 和联想索引直接读取，不一致时查询数据库；
+# 文件位置由 init_extensions() 绑定到应用（后台构建线程中没有应用上下文）
+catalog_snapshots = catalog.CatalogSnapshots(lambda: None)
+
+def current_catalog(tables):
+    return catalog_snapshots.current(dict(zip(tables, table_stamps(tables))))
+
+# 各工作进程共用的缓存层：同一台机器上的页面、响应和用户信息只计算一次，进程内的 LRU 未命中时读取；
+# 以部署指纹为命名空间，重新部署后旧代码生成的条目不再命中
+shared_cache = cache.SharedCache(lambda: None, namespace=DEPLOY_VERSION[0])
+
+# 响应缓存，缓存键包含数据表版本（其他进程的修改也会让旧条目失效），本进程提交后立即清理相关条目
+response_cache = cache.ResponseCache(stamps=table_stamps, shared=shared_cache, name='response')
+
+# 整页缓存：页面中与登录用户相关的部分用 hole() 占位，返回前按用户填入片段
+page_cache = cache.PageCache(
+    stamps=table_stamps, fragments={'nav_user': '_nav_user.html', 'job_actions': '_job_actions.html'},
+    shared=shared_cache, name='page'
+)
+
+@event.listens_for(db.session, 'after_flush')
+def _record_changed_tables(flushed_session, flush_context):
+    changed = {obj.__table__.name for obj in
+               list(flushed_session.new) + list(flushed_session.dirty) + list(flushed_session.deleted)}
+    if changed:
+        table_versions.bump(flushed_session.connection(), changed)
+        flushed_session.info.setdefault('changed_tables', set()).update(changed)
+
+def invalidate_local_caches(tables):
+    """本进程提交修改后清理相关的缓存条目，目录数据变化时在后台重新构建目录快照"""
+    table_versions.reset()
+    response_cache.invalidate_tags(tables)
+    page_cache.invalidate_tags(tables)
+    if set(tables) & set(catalog.TABLES):
+        catalog_snapshots.request_build()
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_response_cache(committed_session):
+    changed = committed_session.info.pop('changed_tables', ())
+    if changed:
+        invalidate_local_caches(changed)
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_changed_tables(rolled_back_session):
+    rolled_back_session.info.pop('changed_tables', None)
+
+# 分组提交：开启后发布招聘和注册的写入由后台线程合并提交，每批只 fsync 一次
+write_queue = GroupCommitQueue(db)
+
+def run_write(work):
+    """执行 work(session) 并提交，返回时数据已经提交；开启分组提交时与其他请求的写入一起提交"""
+    if current_app.config['GROUP_COMMIT_ENABLED']:
+        # 先结束本线程的事务，已经写过数据时会占着写线程需要的写连接
+        db.session.close()
+        return write_queue.submit(work, timeout=current_app.config['GROUP_COMMIT_TIMEOUT'])
+    try:
+        result = work(db.session)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return result
     
 # 添加Job模型定义
 class Job(db.Model):
@@ -64,44 +283,75 @@ class Job(db.Model):
     description = db.Column(db.Text)
     requirements = db.Column(db.Text)
     salary_range = db.Column(db.String(100))
+    salary_min = db.Column(db.Integer)  # 月薪下限（元），由 salary_range 解析
+    salary_max = db.Column(db.Integer)  # 月薪上限（元）
     contact_email = db.Column(db.String(120))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+
+    # 列表按 (created_at, id) 倒序做游标翻页，按公司/地点筛选时同样走索引
+    __table_args__ = (
+        db.Index('ix_job_created_at_id', 'created_at', 'id'),
+        db.Index('ix_job_company_created_at_id', 'company', 'created_at', 'id'),
+        db.Index('ix_job_location_created_at_id', 'location', 'created_at', 'id'),
+        db.Index('ix_job_salary_min_id', 'salary_min', 'id'),
+        db.Index('ix_job_salary_max_id', 'salary_max', 'id'),
+        db.Index('ix_job_location_salary_max_id', 'location', 'salary_max', 'id'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'title': self.title,
+            'company': self.company,
+            'location': self.location,
+            'description': self.description,
+            'requirements': self.requirements,
+            'salary_range': self.salary_range,
+            'salary_min': self.salary_min,
+            'salary_max': self.salary_max,
+            'contact_email': self.contact_email,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
     
-# 在所有模型定义之后再导入和配置 Flask-Admin
-from flask_admin import Admin, AdminIndexView
-from flask_admin.contrib.sqla import ModelView
-
-class SecureModelView(ModelView):
-    def is_accessible(self):
-        return session.get('is_admin', False)
-
-    def inaccessible_callback(self, name, **kwargs):
-        return redirect(url_for('admin_login'))
-
-class SecureAdminIndexView(AdminIndexView):
-    def is_accessible(self):
-        return session.get('is_admin', False)
-
-    def inaccessible_callback(self, name, **kwargs):
-        return redirect(url_for('admin_login'))
-
-# 初始化 Flask-Admin
-admin = Admin(
-    app, 
-    name='EVTOL管理后台', 
-    template_mode='bootstrap3',
-    index_view=SecureAdminIndexView()
-)
+# 发布或编辑（包括 Flask-Admin）招聘时根据 salary_range 填写数值薪资
+@event.listens_for(Job, 'before_insert')
+@event.listens_for(Job, 'before_update')
+def _parse_job_salary(mapper, connection, target):
+    if inspect(target).attrs.salary_range.history.has_changes():
+        target.salary_min, target.salary_max = parse_salary_range(target.salary_range)
+    
+def init_admin(app):
+    """注册 Flask-Admin 及其视图；在 create_app() 中、处理请求之前调用，运行中不修改路由表
+
+    Flask-Admin 到这里才导入，只导入模型的脚本不需要加载；gunicorn 在主进程中注册一次，工作进程 fork 后共享。
+    """
+    import admin_views
+    return admin_views.build_admin(app, db.session, User, EvtolCompany, EvtolProduct, Job)
 
-# 添加视图
-admin.add_view(SecureModelView(User, db.session, name='用户管理'))
-admin.add_view(SecureModelView(EvtolCompany, db.session, name='EVTOL公司'))
-admin.add_view(SecureModelView(EvtolProduct, db.session, name='EVTOL产品'))
-admin.add_view(SecureModelView(Job, db.session, name='招聘信息'))
+def rehash_password(account, password):
+    """登录成功后，用当前的哈希参数重新保存旧的密码哈希"""
+    if passwords.needs_rehash(account.password_hash):
+        account.set_password(password)
+        db.session.commit()
+
+@main.app_errorhandler(hashing.HashingBusy)
+def hashing_busy(e):
+    response = jsonify({'error': '登录人数过多，请稍后再试'})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
+@main.app_errorhandler(WriteQueueBusy)
+def write_queue_busy(e):
+    # 写操作没有执行，客户端重试不会产生重复数据
+    response = jsonify({'error': '提交人数过多，请稍后再试'})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
 
 # 添加管理员登录路由
-@app.route('/admin/login', methods=['GET', 'POST'])
+@main.route('/admin/login', methods=['GET', 'POST'])
 def admin_login():
     if request.method == 'POST':
         username = request.form.get('username')
@@ -109,6 +359,7 @@ def admin_login():
         
         admin_user = AdminUser.query.filter_by(username=username).first()
         if admin_user and admin_user.check_password(password):
+            rehash_password(admin_user, password)
             session['is_admin'] = True
             return redirect('/admin')
         
@@ -123,50 +374,395 @@ def create_admin():
         db.session.add(admin_user)
         db.session.commit()
 
+def bump_table_versions(tables):
+    """批量写入（不经过 ORM 对象）后手动递增版本号"""
+    with db.engine.begin() as connection:
+        table_versions.bump(connection, tables)
+    invalidate_local_caches(tables)
+
+def add_missing_columns():
+    """为已存在的表补加模型中新增的列（均为可空列，SQLite 可直接 ADD COLUMN）"""
+    inspector = inspect(db.engine)
+    existing_tables = inspector.get_table_names()
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                with db.engine.begin() as connection:
+                    connection.execute(db.text(
+                        f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'
+                    ))
+                metrics.log_event('column_added', table=table.name, column=column.name)
+
+def create_missing_indexes():
+    """为已存在的表补建模型中声明的索引（db.create_all 不会修改已有的表）"""
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
+
+def backfill_job_created_at():
+    """created_at 改为不可空之前发布的招聘可能没有发布时间，补上当前时间
+
+    已有的表仍是可空列（SQLite 不能直接修改约束），模型声明为不可空后按 (created_at, id) 翻页不再需要处理 NULL。
+    """
+    with db.engine.begin() as connection:
+        result = connection.execute(
+            Job.__table__.update().where(Job.created_at.is_(None)).values(created_at=datetime.utcnow())
+        )
+        if result.rowcount:
+            table_versions.bump(connection, [Job.__tablename__])
+    if result.rowcount:
+        metrics.log_event('column_backfilled', table=Job.__tablename__, column='created_at', rows=result.rowcount)
+
+def migrate_schema():
+    """创建缺少的表、列和索引，回填改为不可空的列"""
+    db.create_all()
+    add_missing_columns()
+    create_missing_indexes()
+    backfill_job_created_at()
+
+def setup_database():
+    migrate_schema()
+    search_index.ensure_index(db.engine)
+
+def dispose_engines(app, close=True):
+    """丢弃连接池和共享缓存的 SQLite 连接；fork 出的子进程传 close=False，不关闭父进程的连接"""
+    db.dispose_engines(app, close)
+    shared_cache.dispose(close)
+
+def init_extensions(app):
+    """按应用配置初始化导入时创建的扩展、缓存和后台队列"""
+    config = app.config
+    metrics.configure_logging(config['LOG_LEVEL'])
+    db.init_app(app)
+    request_metrics.init_app(app)
+    passwords.configure(config['PASSWORD_HASH_METHOD'], config['PASSWORD_HASH_WORKERS'],
+                        config['PASSWORD_HASH_MAX_PENDING'], config['PASSWORD_HASH_TIMEOUT'])
+    table_versions.check_interval = config['VERSION_CHECK_INTERVAL']
+    shared_cache.path = functools.partial(shared_cache_path, app)
+    shared_cache.max_entries = config['SHARED_CACHE_MAX_ENTRIES']
+    catalog_snapshots.paths = functools.partial(catalog_paths, app)
+    for local_cache, prefix in ((response_cache, 'RESPONSE_CACHE'), (page_cache, 'PAGE_CACHE'),
+                                (user_cache, 'USER_CACHE')):
+        local_cache.max_size = config[f'{prefix}_SIZE']
+        local_cache.ttl = config[f'{prefix}_TTL']
+    write_queue.init_app(app)
+    app.extensions['asset_manifest'] = {} if app.debug else assets.load_manifest(
+        os.path.join(app.static_folder, assets.MANIFEST))
+    app.jinja_env.globals['hole'] = cache.hole
+
+def create_app(config_object=None):
+    """应用工厂，也是 gunicorn 的入口（app:create_app()）和 flask 命令加载应用的方式
+
+    config_object 默认按 APP_CONFIG 环境变量选择（config.Config、config.ProductionConfig 等）。
+    注册路由和管理后台之后完成启动准备（建表、全文索引、目录快照、联想索引），
+    配合 preload_app 在主进程中执行一次，工作进程 fork 后直接共享。
+    """
+    started = time.perf_counter()
+    app = Flask(__name__)
+    app.config.from_object(config_object or os.environ.get('APP_CONFIG', 'config.Config'))
+    init_extensions(app)
+    app.register_blueprint(main)
+    init_admin(app)
+
+    with app.app_context():
+        setup_database()
+        # 工作进程 fork 后共享主进程映射的快照
+        catalog_snapshots.build()
+        get_suggest_index()
+    # 主进程不保留连接，工作进程各自建立
+    dispose_engines(app)
+    # 冻结启动时创建的对象，工作进程的垃圾回收不再遍历（写入）这些共享的内存页
+    gc.collect()
+    gc.freeze()
+    if app.extensions['asset_manifest'] and assets.is_stale(app.static_folder):
+        metrics.log_event('assets_stale', level=logging.WARNING, hint='python assets.py')
+    metrics.log_event('startup', setup_ms=round((time.perf_counter() - started) * 1000, 2),
+                      rss_kb=metrics.rss_kb())
+    return app
+
+# 页面只需要登录用户的 id 和用户名，缓存在进程内和共享缓存中，user 表版本变化后重新读取
+CurrentUser = namedtuple('CurrentUser', ['id', 'username'])
+user_cache = cache.LRUCache(shared=shared_cache, name='user')
+
 # 在路由部分之前添加辅助函数
-def get_current_user():
+def get_current_user(fresh=False):
+    """返回当前登录用户；fresh=True 时直接从数据库读取完整的 User 对象"""
     user_id = session.get('user_id')
-    if user_id:
+    if not user_id:
+        return None
+    if fresh:
         return User.query.get(user_id)
-    return None
+
+    stamp = table_stamps(['user'])
+    entry = user_cache.get(user_id)
+    if entry is not None and entry[0] == stamp:
+        return entry[1]
+    row = db.session.query(User.id, User.username).filter(User.id == user_id).first()
+    user = CurrentUser(*row) if row else None
+    user_cache.set(user_id, (stamp, user))
+    return user
 
 # 修改首页路由
-@app.route('/')
+@main.route('/')
 def home():
-    user = get_current_user()
-    return render_template('index.html', user=user)
+    page = page_cache.get_or_render([], lambda: render_template('index.html'))
+    return page_cache.fill(page, get_current_user())
 
-@app.route('/search')
-def search():
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+
+def encode_cursor(values):
+    """把排序键编码为不透明的翻页游标"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def decode_cursor(cursor, types):
+    """解析翻页游标，types 为各元素的类型（或类型元组）；格式错误或不是预期的形状时抛出 ValueError"""
     try:
-        query = request.args.get('q', '')
-        print(f"搜索查询: {query}")
-        
-        companies = EvtolCompany.query.filter(
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError('无效的游标')
+    if not (isinstance(values, list) and len(values) == len(types)
+            and all(isinstance(value, kind) and not isinstance(value, bool)
+                    for value, kind in zip(values, types))):
+        raise ValueError('无效的游标')
+    return values
+
+def company_to_dict(company):
+    return {
+        'name': company.name,
+        'country': company.country,
+        'description': company.description,
+        'certification_status': company.certification_status
+    }
+
+def search_cursor_types(query):
+    """search_companies 排序键的形状：全文检索为 [相关度, id]，空查询或不支持全文索引时为 [id]"""
+    return ((int, float), int) if query and search_index.is_available() else (int,)
+
+def search_companies(query, limit, cursor=None):
+    """按相关度返回一页公司，结果为 [(公司字典, 排序键)]，最多 limit + 1 条用于判断是否还有下一页"""
+    if not query or search_index.is_available():
+        snapshot = current_catalog(['evtol_company'])
+        if snapshot is not None:
+            rows = snapshot.search(query, limit, cursor, current_app.config['CATALOG_SNAPSHOT_MAX_POSTINGS'])
+            if rows is not None:
+                return rows
+
+    if query and search_index.is_available():
+        ranked = search_index.ranked_matches(query)
+        if ranked is None:
+            return []
+        ranked = ranked.subquery('ranked')
+        q = db.session.query(EvtolCompany, ranked.c.score).join(ranked, ranked.c.rowid == EvtolCompany.id)
+        if cursor:
+            score, last_id = cursor
+            q = q.filter(db.or_(
+                ranked.c.score > score,
+                db.and_(ranked.c.score == score, EvtolCompany.id > last_id)
+            ))
+        rows = q.order_by(ranked.c.score, EvtolCompany.id).limit(limit + 1).all()
+        return [(company_to_dict(company), [score, company.id]) for company, score in rows]
+
+    # 空查询或不支持全文索引时按 id 顺序翻页
+    q = EvtolCompany.query
+    if query:
+        q = q.filter(
             db.or_(
                 EvtolCompany.name.like(f'%{query}%'),
                 EvtolCompany.country.like(f'%{query}%'),
                 EvtolCompany.description.like(f'%{query}%')
             )
-        ).all()
-        
+        )
+    if cursor:
+        q = q.filter(EvtolCompany.id > cursor[-1])
+    return [(company_to_dict(company), [company.id]) for company in q.order_by(EvtolCompany.id).limit(limit + 1)]
+
+_suggest_refresh_lock = threading.Lock()
+
+def suggest_index_stale(stamps):
+    return (suggestions.stamps != stamps
+            or time.time() - suggestions.loaded_at > current_app.config['SUGGEST_REFRESH_SECONDS'])
+
+def get_suggest_index():
+    """返回联想索引，首次使用、公司或产品表的版本号变化（包括其他进程的修改）时全量加载
+
+    本进程的修改在提交时已经增量应用（版本号变化后同样会再全量加载一次）；SUGGEST_REFRESH_SECONDS 只是兜底的刷新间隔。
+    """
+    if suggest_index_stale(table_stamps(catalog.TABLES)):
+        # 同一进程的多个线程只由一个线程刷新；已经加载过时其他线程继续使用旧的索引
+        if _suggest_refresh_lock.acquire(blocking=not suggestions.loaded_at):
+            try:
+                # 先读版本号再读数据，期间的写入会让下次请求再加载一次，而不是被漏掉
+                stamps = table_stamps(catalog.TABLES)
+                if suggest_index_stale(stamps):
+                    snapshot = current_catalog(catalog.TABLES)
+                    if snapshot is not None:
+                        companies, products = snapshot.suggest_rows()
+                    else:
+                        companies = db.session.query(EvtolCompany.id, EvtolCompany.name, EvtolCompany.country).all()
+                        products = db.session.query(EvtolProduct.id, EvtolProduct.model_name).all()
+                    suggestions.load(companies, products, stamps)
+            finally:
+                _suggest_refresh_lock.release()
+    return suggestions
+
+@main.route('/search/suggest')
+def search_suggest():
+    prefix = request.args.get('q', '').strip()
+    limit = min(max(request.args.get('limit', 8, type=int), 1), 20)
+    if not prefix:
+        return jsonify({'suggestions': []})
+    return jsonify({'suggestions': get_suggest_index().lookup(prefix, limit)})
+
+def wants_ndjson():
+    return request.args.get('format') == 'ndjson' or 'application/x-ndjson' in request.headers.get('Accept', '')
+
+def search_key():
+    """/search 也按 Accept 头选择 JSON 或 NDJSON，缓存键同时区分返回格式"""
+    return cache.query_string_key(), wants_ndjson()
+
+@main.route('/search')
+@cache.conditional(response_stamps, ['evtol_company'], key_func=search_key, vary=('Accept',))
+@response_cache.cached(key_func=search_key, tables=['evtol_company'])
+def search():
+    try:
+        query = request.args.get('q', '').strip()
+        limit = min(max(request.args.get('limit', SEARCH_DEFAULT_LIMIT, type=int), 1), SEARCH_MAX_LIMIT)
+        cursor = request.args.get('cursor')
+
+        try:
+            cursor = decode_cursor(cursor, search_cursor_types(query)) if cursor else None
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        rows = search_companies(query, limit, cursor)
+        next_cursor = encode_cursor(rows[limit - 1][1]) if len(rows) > limit else None
+        companies = [company for company, _ in rows[:limit]]
+        metrics.log_event('search', current_app.config['SEARCH_LOG_SAMPLE_RATE'], query=query, results=len(companies))
+
+        # NDJSON 流式输出：每行一家公司，最后一行是翻页游标
+        if wants_ndjson():
+            def generate():
+                for company in companies:
+                    yield json.dumps({'company': company}, ensure_ascii=False) + '\n'
+                yield json.dumps({'next_cursor': next_cursor}) + '\n'
+            return Response(generate(), mimetype='application/x-ndjson')
+
         results = {
-            'companies': [{
-                'name': c.name,
-                'country': c.country,
-                'description': c.description,
-                'certification_status': c.certification_status
-            } for c in companies]
+            'companies': companies,
+            'next_cursor': next_cursor
         }
-        
-        print(f"搜索结果: {results}")
         return jsonify(results)
     
     except Exception as e:
-        print(f"搜索错误: {str(e)}")
+        metrics.log_event('search_error', level=logging.ERROR, query=request.args.get('q'), error=repr(e))
         return jsonify({'error': '搜索出错'}), 500
 
-@app.route('/register', methods=['GET', 'POST'])
+PRODUCTS_PAGE_SIZE = 20
+PRODUCTS_MAX_PAGE_SIZE = 100
+
+PRODUCT_SORT_FIELDS = {
+    'model_name': EvtolProduct.model_name,
+    'max_range': EvtolProduct.max_range,
+    'max_speed': EvtolProduct.max_speed,
+    'passenger_capacity': EvtolProduct.passenger_capacity,
+}
+
+# 查询参数 -> (列, 比较方式)
+PRODUCT_RANGE_FILTERS = {
+    'range_min': (EvtolProduct.max_range, '>='),
+    'range_max': (EvtolProduct.max_range, '<='),
+    'speed_min': (EvtolProduct.max_speed, '>='),
+    'speed_max': (EvtolProduct.max_speed, '<='),
+    'capacity_min': (EvtolProduct.passenger_capacity, '>='),
+    'capacity_max': (EvtolProduct.passenger_capacity, '<='),
+}
+
+CAPACITY_BUCKET = db.case(
+    (EvtolProduct.passenger_capacity.is_(None), '未知'),
+    (EvtolProduct.passenger_capacity == 0, '货运'),
+    (EvtolProduct.passenger_capacity <= 2, '1-2座'),
+    (EvtolProduct.passenger_capacity <= 4, '3-4座'),
+    else_='5座以上'
+)
+
+def filtered_products(query, args):
+    """在已关联公司表的查询上应用 /products 的筛选条件"""
+    for name, (column, op) in PRODUCT_RANGE_FILTERS.items():
+        value = args.get(name, type=float)
+        if value is not None:
+            query = query.filter(column >= value if op == '>=' else column <= value)
+    for name, column in (('country', EvtolCompany.country),
+                         ('certification_status', EvtolCompany.certification_status),
+                         ('company', EvtolCompany.name)):
+        value = args.get(name, '').strip()
+        if value:
+            query = query.filter(column == value)
+    return query
+
+def product_facet(column, args):
+    rows = filtered_products(
+        db.session.query(column, db.func.count(EvtolProduct.id)).outerjoin(EvtolProduct.company), args
+    ).group_by(column).order_by(db.func.count(EvtolProduct.id).desc()).all()
+    return [{'value': value, 'count': count} for value, count in rows]
+
+@main.route('/products')
+@cache.conditional(response_stamps, ['evtol_product', 'evtol_company'])
+@response_cache.cached(tables=['evtol_product', 'evtol_company'])
+def products_list():
+    """产品列表：范围筛选、多列排序（如 sort=-max_range,max_speed）和分面统计"""
+    limit = min(max(request.args.get('limit', PRODUCTS_PAGE_SIZE, type=int), 1), PRODUCTS_MAX_PAGE_SIZE)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+
+    order_by = []
+    for field in filter(None, request.args.get('sort', '').split(',')):
+        column = PRODUCT_SORT_FIELDS.get(field.lstrip('-'))
+        if column is None:
+            return jsonify({'error': f'不支持的排序字段: {field}'}), 400
+        order_by.append(column.desc() if field.startswith('-') else column)
+    order_by.append(EvtolProduct.id)
+
+    # 公司信息随产品一次 JOIN 取回，不会逐行查询
+    products = filtered_products(
+        EvtolProduct.query.outerjoin(EvtolProduct.company).options(contains_eager(EvtolProduct.company)),
+        request.args
+    ).order_by(*order_by).limit(limit).offset(offset).all()
+
+    facets = {
+        'country': product_facet(EvtolCompany.country, request.args),
+        'capacity': product_facet(CAPACITY_BUCKET, request.args),
+        'certification_status': product_facet(EvtolCompany.certification_status, request.args),
+    }
+    return jsonify({
+        'products': [product.to_dict() for product in products],
+        'total': sum(item['count'] for item in facets['capacity']),
+        'facets': facets
+    })
+
+@main.route('/cache/stats')
+def cache_stats():
+    return jsonify({
+        'response_cache': response_cache.stats(),
+        'page_cache': page_cache.stats(),
+        'user_cache': user_cache.stats(),
+        'shared_cache': shared_cache.stats(),
+        'catalog_snapshot': catalog_snapshots.stats(),
+        'write_queue': write_queue.stats()
+    })
+
+@main.route('/metrics')
+def metrics_endpoint():
+    return Response(request_metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@main.route('/hashing/stats')
+def hashing_stats():
+    return jsonify(passwords.stats())
+
+@main.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
         username = request.form.get('username')
@@ -181,14 +777,17 @@ def register():
         
         user = User(username=username, email=email)
         user.set_password(password)
-        db.session.add(user)
-        db.session.commit()
+        try:
+            run_write(lambda s: s.add(user))
+        except IntegrityError:
+            # 检查之后被其他请求抢先注册
+            return jsonify({'error': '用户名或邮箱已被注册'}), 400
         
         return jsonify({'message': '注册成功'})
     
     return render_template('register.html')
 
-@app.route('/login', methods=['GET', 'POST'])
+@main.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         username = request.form.get('username')
@@ -196,6 +795,7 @@ def login():
         
         user = User.query.filter_by(username=username).first()
         if user and user.check_password(password):
+            rehash_password(user, password)
             session['user_id'] = user.id
             return jsonify({'message': '登录成功'})
         
@@ -203,26 +803,136 @@ def login():
     
     return render_template('login.html')
 
-@app.route('/logout')
+@main.route('/logout')
 def logout():
     session.pop('user_id', None)
-    return redirect(url_for('home'))
-
-# 添加密钥用于session加密
-app.secret_key = 'your-secret-key'  # 在生产环境中使用更安全的密钥
+    return redirect(url_for('main.home'))
 
 # 添加招聘相关路由
-@app.route('/jobs')
+JOBS_PAGE_SIZE = 20
+JOBS_MAX_PAGE_SIZE = 50
+
+def query_and_user_key():
+    """页面中显示了当前用户名，按查询参数和登录用户区分"""
+    return cache.query_string_key(), session.get('user_id')
+
+def query_jobs_page(company, location, limit, cursor):
+    """返回一页招聘信息和下一页游标，游标无效时抛出 ValueError"""
+    query = Job.query
+    if company:
+        query = query.filter(Job.company == company)
+    if location:
+        query = query.filter(Job.location == location)
+    if cursor:
+        try:
+            created_at, last_id = decode_cursor(cursor, (str, int))
+            created_at = datetime.fromisoformat(created_at)
+        except (TypeError, ValueError):
+            raise ValueError('无效的游标')
+        query = query.filter(db.tuple_(Job.created_at, Job.id) < (created_at, last_id))
+
+    jobs = query.order_by(Job.created_at.desc(), Job.id.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(jobs) > limit:
+        jobs = jobs[:limit]
+        next_cursor = encode_cursor([jobs[-1].created_at.isoformat(), jobs[-1].id])
+    return jobs, next_cursor
+
+@response_cache.cached(tables=['job'])
+def jobs_list_json(company, location, limit, cursor):
+    try:
+        jobs, next_cursor = query_jobs_page(company, location, limit, cursor)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'jobs': [job.to_dict() for job in jobs], 'next_cursor': next_cursor})
+
+@main.route('/jobs')
+@cache.conditional(response_stamps, ['job', 'user'], key_func=query_and_user_key)
 def jobs_list():
-    jobs = Job.query.order_by(Job.created_at.desc()).all()
-    user = get_current_user()
-    return render_template('jobs.html', jobs=jobs, user=user)
+    company = request.args.get('company', '').strip()
+    location = request.args.get('location', '').strip()
+    limit = min(max(request.args.get('limit', JOBS_PAGE_SIZE, type=int), 1), JOBS_MAX_PAGE_SIZE)
+    cursor = request.args.get('cursor')
+
+    if request.args.get('format') == 'json':
+        return jobs_list_json(company, location, limit, cursor)
+
+    def render_page():
+        try:
+            jobs, next_cursor = query_jobs_page(company, location, limit, cursor)
+        except ValueError:
+            return None
+        return render_template('jobs.html', jobs=jobs, next_cursor=next_cursor,
+                               company=company, location=location)
+
+    # 整页只按查询参数缓存一份，登录用户相关的片段在返回前填入
+    page = page_cache.get_or_render(['job'], render_page)
+    if page is None:
+        return redirect(url_for('main.jobs_list', company=company or None, location=location or None))
+    return page_cache.fill(page, get_current_user())
+
+# 排序方式 -> (排序列, 是否倒序)
+JOB_SEARCH_SORTS = {
+    'newest': (Job.created_at, True),
+    'salary_desc': (Job.salary_max, True),
+    'salary_asc': (Job.salary_min, False),
+}
 
-@app.route('/jobs/post', methods=['GET', 'POST'])
+@main.route('/jobs/search')
+@cache.conditional(response_stamps, ['job'])
+@response_cache.cached(tables=['job'])
+def jobs_search():
+    """按薪资区间、地点筛选招聘信息，薪资参数支持 30000 或 30k 等写法"""
+    sort = request.args.get('sort', 'newest')
+    if sort not in JOB_SEARCH_SORTS:
+        return jsonify({'error': '不支持的排序方式'}), 400
+    salary_min = parse_salary(request.args.get('salary_min'))
+    salary_max = parse_salary(request.args.get('salary_max'))
+    location = request.args.get('location', '').strip()
+    limit = min(max(request.args.get('limit', JOBS_PAGE_SIZE, type=int), 1), JOBS_MAX_PAGE_SIZE)
+    cursor = request.args.get('cursor')
+
+    sort_column, descending = JOB_SEARCH_SORTS[sort]
+    query = Job.query
+    if location:
+        query = query.filter(Job.location == location)
+    # 薪资区间与筛选区间有交集即命中
+    if salary_min is not None:
+        query = query.filter(Job.salary_max >= salary_min)
+    if salary_max is not None:
+        query = query.filter(Job.salary_min <= salary_max)
+    if sort != 'newest':
+        query = query.filter(sort_column.isnot(None))
+    if cursor:
+        try:
+            last_value, last_id = decode_cursor(cursor, (str if sort == 'newest' else int, int))
+            if sort == 'newest':
+                last_value = datetime.fromisoformat(last_value)
+        except (TypeError, ValueError):
+            return jsonify({'error': '无效的游标'}), 400
+        key = db.tuple_(sort_column, Job.id)
+        query = query.filter(key < (last_value, last_id) if descending else key > (last_value, last_id))
+
+    if descending:
+        query = query.order_by(sort_column.desc(), Job.id.desc())
+    else:
+        query = query.order_by(sort_column, Job.id)
+    jobs = query.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(jobs) > limit:
+        jobs = jobs[:limit]
+        last_value = getattr(jobs[-1], sort_column.key)
+        if sort == 'newest':
+            last_value = last_value.isoformat()
+        next_cursor = encode_cursor([last_value, jobs[-1].id])
+    return jsonify({'jobs': [job.to_dict() for job in jobs], 'next_cursor': next_cursor})
+
+@main.route('/jobs/post', methods=['GET', 'POST'])
 def post_job():
     user = get_current_user()
     if not user:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     if request.method == 'POST':
         job = Job(
@@ -235,12 +945,320 @@ def post_job():
             contact_email=request.form.get('contact_email'),
             user_id=user.id
         )
-        db.session.add(job)
-        db.session.commit()
-        return redirect(url_for('jobs_list'))
+        run_write(lambda s: s.add(job))
+        return redirect(url_for('main.jobs_list'))
     
     return render_template('post_job.html', user=user)
 
+@main.cli.command('backfill-salary')
+@click.option('--batch-size', default=500, show_default=True, help='每批更新的行数')
+@click.option('--all', 'reparse_all', is_flag=True, help='重新解析所有招聘信息，用于解析规则修改之后')
+def backfill_salary(batch_size, reparse_all):
+    """为已有招聘信息补填 salary_min/salary_max"""
+    migrate_schema()
+    last_id = 0
+    updated = 0
+    while True:
+        query = db.session.query(Job.id, Job.salary_range, Job.salary_min, Job.salary_max).filter(
+            Job.id > last_id,
+            Job.salary_range.isnot(None)
+        )
+        if not reparse_all:
+            query = query.filter(Job.salary_min.is_(None), Job.salary_max.is_(None))
+        jobs = query.order_by(Job.id).limit(batch_size).all()
+        if not jobs:
+            break
+        mappings = []
+        for job_id, salary_range, old_min, old_max in jobs:
+            salary_min, salary_max = parse_salary_range(salary_range)
+            if (salary_min, salary_max) != (old_min, old_max):
+                mappings.append({'id': job_id, 'salary_min': salary_min, 'salary_max': salary_max})
+        db.session.bulk_update_mappings(Job, mappings)
+        db.session.commit()
+        bump_table_versions(['job'])
+        updated += len(mappings)
+        last_id = jobs[-1][0]
+        click.echo(f'已处理到 id={last_id}，累计更新 {updated} 条')
+    click.echo(f'薪资字段回填完成，共更新 {updated} 条')
+
+# 批量导入导出：实体名 -> (模型, 自然键, 文件中的字段)
+# 产品和招聘文件中的 company 为公司名称，产品导入时解析为 company_id
+DATA_ENTITIES = {
+    'companies': (EvtolCompany, ('name',), ('name', 'country', 'description', 'certification_status')),
+    'products': (EvtolProduct, ('company_id', 'model_name'),
+                 ('company', 'model_name', 'max_range', 'max_speed', 'passenger_capacity')),
+    'jobs': (Job, ('company', 'title', 'location'),
+             ('title', 'company', 'location', 'description', 'requirements', 'salary_range',
+              'contact_email', 'created_at')),
+}
+EXPORT_CHUNK_SIZE = 1000
+
+def coerce_value(column, value):
+    """把 CSV 中的字符串转换为列的类型"""
+    if not isinstance(value, str):
+        return value
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type in (int, float):
+        return python_type(value)
+    return value
+
+def company_ids(connection, names):
+    """按名称查询公司 id，同名时取最后创建的一家"""
+    rows = connection.execute(
+        db.select(EvtolCompany.id, EvtolCompany.name)
+        .where(EvtolCompany.name.in_(names)).order_by(EvtolCompany.id)
+    )
+    return {name: company_id for company_id, name in rows}
+
+def existing_ids(connection, table, key_columns, keys):
+    """返回已存在行的 {自然键: id}；用前两个键列（有索引）筛选，完整的键在 Python 中比较"""
+    query = db.select(table.c.id, *[table.c[name] for name in key_columns])
+    for position, name in enumerate(key_columns[:2]):
+        query = query.where(table.c[name].in_({key[position] for key in keys}))
+    return {tuple(row[1:]): row[0] for row in connection.execute(query.order_by(table.c.id))}
+
+def execute_grouped(connection, statement, rows):
+    """executemany 要求每行的字段相同，按字段集合分组执行"""
+    groups = {}
+    for row in rows:
+        groups.setdefault(tuple(sorted(row)), []).append(row)
+    for group in groups.values():
+        connection.execute(statement, group)
+
+def import_chunk(connection, entity, records):
+    """在一个事务内导入一块记录，按自然键更新已有行、插入新行，返回 (插入数, 更新数, 跳过数)
+
+    记录中没有的字段（以及不可空的列上的空值）不会写入：更新时保留原值，插入时使用列的默认值。
+    """
+    model, key_columns, fields = DATA_ENTITIES[entity]
+    table = model.__table__
+    if entity == 'products':
+        companies = company_ids(connection, {record.get('company') for record in records})
+
+    rows = {}
+    skipped = 0
+    for record in records:
+        row = {}
+        for name in fields:
+            if name not in record:
+                continue
+            if entity == 'products' and name == 'company':
+                row['company_id'] = companies.get(record[name])
+            elif record[name] is not None or table.c[name].nullable:
+                row[name] = coerce_value(table.c[name], record[name])
+        if 'salary_range' in row:
+            row['salary_min'], row['salary_max'] = parse_salary_range(row['salary_range'])
+        key = tuple(row.get(name) for name in key_columns)
+        if any(value is None for value in key[:2]):
+            skipped += 1  # 缺少自然键，或产品的公司不存在
+            continue
+        rows[key] = row  # 同一块中自然键重复时以最后一行为准
+
+    ids = existing_ids(connection, table, key_columns, rows) if rows else {}
+    updates = [dict(row, _id=ids[key]) for key, row in rows.items() if key in ids]
+    inserts = [row for key, row in rows.items() if key not in ids]
+    execute_grouped(connection, table.update().where(table.c.id == db.bindparam('_id')), updates)
+    execute_grouped(connection, table.insert(), inserts)
+
+    if entity == 'companies' and rows:
+        # 批量写入不经过 ORM 事件，在同一事务内同步全文索引
+        indexed = connection.execute(
+            db.select(EvtolCompany.id, EvtolCompany.name, EvtolCompany.country, EvtolCompany.description)
+            .where(EvtolCompany.name.in_({key[0] for key in rows}))
+        ).fetchall()
+        search_index.index_companies(connection, indexed)
+    if rows:
+        table_versions.bump(connection, [table.name])
+    return len(inserts), len(updates), skipped
+
+def import_records(entity, records, chunk_size=1000, progress=None):
+    """分块导入记录（可以是生成器），每块一个事务"""
+    table_name = DATA_ENTITIES[entity][0].__tablename__
+    try:
+        for chunk in dataio.chunked(records, chunk_size):
+            # 使用会话的写连接，调用方的会话已经占用写连接时也不会互相等待
+            connection = db.session.connection(bind_arguments={'bind': db.engine})
+            try:
+                inserted, updated, skipped = import_chunk(connection, entity, chunk)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            if progress is not None:
+                progress.add(len(chunk), {'插入': inserted, '更新': updated, '跳过': skipped})
+    finally:
+        invalidate_local_caches([table_name])
+        if entity in ('companies', 'products'):
+            suggestions.loaded_at = 0  # 下次使用时全量重新加载
+
+def export_records(entity):
+    """按 id 分块读取，逐行产出导出记录"""
+    model, key_columns, fields = DATA_ENTITIES[entity]
+    table = model.__table__
+    columns = [table.c[name] for name in fields if name in table.c]
+    if entity == 'products':
+        columns.append(EvtolCompany.name.label('company'))
+    last_id = 0
+    while True:
+        query = db.select(table.c.id, *columns).where(table.c.id > last_id)
+        if entity == 'products':
+            query = query.select_from(table.outerjoin(EvtolCompany.__table__))
+        with db.engine.connect() as connection:
+            rows = connection.execute(query.order_by(table.c.id).limit(EXPORT_CHUNK_SIZE)).fetchall()
+        if not rows:
+            return
+        for row in rows:
+            yield dict(row._mapping)
+        last_id = rows[-1].id
+
+def echo_err(message):
+    # 进度输出到标准错误，导出到标准输出时不会混入数据
+    click.echo(message, err=True)
+
+@main.cli.command('import-data')
+@click.argument('entity', type=click.Choice(list(DATA_ENTITIES)))
+@click.argument('path', type=click.Path(exists=False, dir_okay=False, allow_dash=True))
+@click.option('--format', 'fmt', type=click.Choice(dataio.FORMATS), help='文件格式，默认按扩展名判断')
+@click.option('--chunk-size', default=1000, show_default=True, help='每个事务导入的行数')
+def import_data(entity, path, fmt, chunk_size):
+    """从 CSV / JSONL 导入公司（companies）、产品（products）或招聘信息（jobs），按自然键更新已有数据"""
+    migrate_schema()
+    try:
+        fmt = dataio.detect_format(path, fmt)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    progress = dataio.Progress(echo_err, '已导入')
+    try:
+        with dataio.open_stream(path, 'r') as stream:
+            import_records(entity, dataio.read_rows(stream, fmt), chunk_size, progress)
+    except ValueError as e:
+        raise click.ClickException(f'导入中止，之前的 {progress.rows} 行已提交: {e}')
+    progress.done()
+
+@main.cli.command('export-data')
+@click.argument('entity', type=click.Choice(list(DATA_ENTITIES)))
+@click.argument('path', type=click.Path(dir_okay=False, allow_dash=True))
+@click.option('--format', 'fmt', type=click.Choice(dataio.FORMATS), help='文件格式，默认按扩展名判断')
+def export_data(entity, path, fmt):
+    """把公司、产品或招聘信息导出为 CSV / JSONL，可以再用 import-data 导入"""
+    try:
+        fmt = dataio.detect_format(path, fmt)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    progress = dataio.Progress(echo_err, '已导出')
+    with dataio.open_stream(path, 'w') as stream:
+        writer = dataio.RowWriter(stream, fmt, DATA_ENTITIES[entity][2])
+        for record in export_records(entity):
+            writer.write(record)
+            progress.add(1)
+    progress.done()
+
+# Flask-Admin 列表分页中可以点击的下一页/上一页链接
+ADMIN_NEXT_PAGE = r'<li>\s*<a href="([^"]+)">&gt;</a>'
+ADMIN_PREV_PAGE = r'<li>\s*<a href="([^"]+)">&lt;</a>'
+
+# 各路由最多执行的 SQL 语句数（包括读取表版本号、会话用户和写入版本号），由 flask check-queries 检查
+QUERY_BUDGETS = [
+    query_guard.RouteBudget('search', '/search?q=航空', 2),
+    query_guard.RouteBudget('search_cursor', '/search?q=eVTOL&limit=1', 2),
+    query_guard.RouteBudget('jobs_list', '/jobs', 2),
+    query_guard.RouteBudget('jobs_list_filtered', '/jobs?location=深圳&company=亿航智能', 2),
+    query_guard.RouteBudget('jobs_list_json', '/jobs?format=json&location=深圳', 2),
+    query_guard.RouteBudget('jobs_list_user', '/jobs', 3, login='user'),
+    query_guard.RouteBudget('login', '/login', 1, form={'username': 'query-guard', 'password': 'query-guard'}),
+    query_guard.RouteBudget('post_job', '/jobs/post', 5, login='user', form={
+        'title': '飞控算法工程师', 'company': '亿航智能', 'location': '广州', 'description': '负责飞控算法研发',
+        'requirements': '相关专业硕士', 'salary_range': '20k-30k', 'contact_email': 'hr@example.com',
+    }),
+    query_guard.RouteBudget('admin_user', '/admin/user/', 1, login='admin'),
+    query_guard.RouteBudget('admin_user_search', '/admin/user/?search=query', 1, login='admin'),
+    query_guard.RouteBudget('admin_company', '/admin/evtolcompany/?sort=1', 1, login='admin'),
+    query_guard.RouteBudget('admin_company_search', '/admin/evtolcompany/?search=航空', 1, login='admin'),
+    query_guard.RouteBudget('admin_product', '/admin/evtolproduct/', 1, login='admin'),
+    query_guard.RouteBudget('admin_product_search', '/admin/evtolproduct/?search=亿航', 1, login='admin'),
+    query_guard.RouteBudget('admin_job', '/admin/job/', 1, login='admin'),
+    query_guard.RouteBudget('admin_job_search', '/admin/job/?search=深圳', 1, login='admin'),
+    # 后面的页从上一页链接中的排序键定位（每页 2 行，示例数据也能翻几页）
+    query_guard.RouteBudget('admin_job_next', '/admin/job/?page_size=2', 1, login='admin',
+                            follow=[ADMIN_NEXT_PAGE, ADMIN_NEXT_PAGE]),
+    query_guard.RouteBudget('admin_job_prev', '/admin/job/?page_size=2', 1, login='admin',
+                            follow=[ADMIN_NEXT_PAGE, ADMIN_NEXT_PAGE, ADMIN_PREV_PAGE]),
+    query_guard.RouteBudget('admin_job_salary_next', '/admin/job/?sort=6&desc=1&page_size=2', 1, login='admin',
+                            follow=[ADMIN_NEXT_PAGE]),
+    query_guard.RouteBudget('admin_company_next', '/admin/evtolcompany/?page_size=2', 1, login='admin',
+                            follow=[ADMIN_NEXT_PAGE]),
+]
+
+def clear_caches():
+    table_versions.reset()
+    for local_cache in (response_cache, page_cache, user_cache):
+        local_cache.clear()
+    shared_cache.clear()
+
+@main.cli.command('check-queries')
+@click.option('--verbose', '-v', is_flag=True, help='输出每条语句及其查询计划')
+def check_queries(verbose):
+    """在临时数据库上请求各路由，检查 SQL 语句数是否超出预算、大表是否被全表扫描"""
+    import tempfile
+
+    app = current_app._get_current_object()
+    large_tables = set(app.config['QUERY_GUARD_LARGE_TABLES'])
+    original_uri = app.config['SQLALCHEMY_DATABASE_URI']
+    original_catalog = app.config['CATALOG_SNAPSHOT_ENABLED']
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        # 切换到临时数据库，写入示例数据，不影响正在使用的数据库
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(tmp, 'query_guard.db')
+        # 检查的是数据库查询路径，不使用目录快照
+        app.config['CATALOG_SNAPSHOT_ENABLED'] = False
+        try:
+            setup_database()
+            create_admin()
+            init_db_data()
+            add_sample_jobs()
+            add_sample_products()
+            user = User(username='query-guard', email='query-guard@example.com')
+            user.set_password('query-guard')
+            db.session.add(user)
+            db.session.commit()
+            db.session.remove()
+            # 先执行扩展注册的 before_first_request 函数，不计入第一个路由
+            app.try_trigger_before_first_request_functions()
+
+            logins = {
+                'user': ('/login', {'username': 'query-guard', 'password': 'query-guard'}),
+                'admin': ('/admin/login', {'username': 'admin', 'password': 'admin123'}),
+            }
+            for budget in QUERY_BUDGETS:
+                client = app.test_client()
+                if budget.login:
+                    client.post(*logins[budget.login][:1], data=logins[budget.login][1])
+                # 每个路由都从空缓存开始，统计的是缓存未命中时的语句数
+                clear_caches()
+                status, queries, problems = query_guard.check_route(client, db.engine, budget, large_tables)
+                failures += bool(problems)
+                click.echo(f"{'FAIL' if problems else 'ok':4} {budget.name:20} {status} "
+                           f"{len(queries)}/{budget.max_queries} 条语句")
+                for problem in problems:
+                    click.echo(f'       {problem}')
+                if verbose:
+                    for query in queries:
+                        click.echo(f"       {' '.join(query.statement.split())}")
+                        for detail in query.plan:
+                            click.echo(f'         -> {detail}')
+        finally:
+            db.session.remove()
+            for engine in (db.get_read_engine(), db.engine):
+                if engine is not None:
+                    engine.dispose()
+            shared_cache.dispose()
+            app.config['SQLALCHEMY_DATABASE_URI'] = original_uri
+            app.config['CATALOG_SNAPSHOT_ENABLED'] = original_catalog
+    if failures:
+        raise click.ClickException(f'{failures} 个路由未通过检查')
+
 def init_db_data():
     """初始化数据库数据"""
     # 检查是否已有数据
@@ -376,12 +1394,7 @@ def init_db_data():
     ]
     
     # 添加公司数据到数据库
-    for company_data in chinese_companies + foreign_companies:
-        company = EvtolCompany(**company_data)
-        db.session.add(company)
-    
-    # 提交更改
-    db.session.commit()
+    import_records('companies', chinese_companies + foreign_companies)
     
 def add_sample_jobs():
     """添加示例招聘信息"""
@@ -481,10 +1494,7 @@ def add_sample_jobs():
         }
     ]
     
-    for job_data in sample_jobs:
-        job = Job(**job_data)
-        db.session.add(job)
-    db.session.commit()
+    import_records('jobs', sample_jobs)
 
 def add_sample_products():
     """添加示例EVTOL产品信息"""
@@ -493,140 +1503,140 @@ def add_sample_products():
         
     sample_products = [
         {
-            "company_id": 1,  # 亿航智能
+            "company": "亿航智能",
             "model_name": "EH216-S",
             "max_range": 35,
             "max_speed": 130,
             "passenger_capacity": 2
         },
         {
-            "company_id": 1,
+            "company": "亿航智能",
             "model_name": "EH216-F",
             "max_range": 40,
             "max_speed": 130,
             "passenger_capacity": 0  # 货运版本
         },
         {
-            "company_id": 2,  # 小鹏汇天
+            "company": "小鹏汇天",
             "model_name": "X2",
             "max_range": 35,
             "max_speed": 130,
             "passenger_capacity": 2
         },
         {
-            "company_id": 2,
+            "company": "小鹏汇天",
             "model_name": "X3",
             "max_range": 45,
             "max_speed": 150,
             "passenger_capacity": 4
         },
         {
-            "company_id": 11,  # Joby Aviation
+            "company": "Joby Aviation",
             "model_name": "S4",
             "max_range": 240,
             "max_speed": 320,
             "passenger_capacity": 4
         },
         {
-            "company_id": 12,  # Lilium
+            "company": "Lilium",
             "model_name": "Lilium Jet",
             "max_range": 250,
             "max_speed": 280,
             "passenger_capacity": 6
         },
         {
-            "company_id": 13,  # Volocopter
+            "company": "Volocopter",
             "model_name": "VoloCity",
             "max_range": 35,
             "max_speed": 110,
             "passenger_capacity": 2
         },
         {
-            "company_id": 14,  # Archer Aviation
+            "company": "Archer Aviation",
             "model_name": "Maker",
             "max_range": 100,
             "max_speed": 240,
             "passenger_capacity": 4
         },
         {
-            "company_id": 15,  # Beta Technologies
+            "company": "Beta Technologies",
             "model_name": "ALIA-250",
             "max_range": 250,
             "max_speed": 270,
             "passenger_capacity": 6
         },
         {
-            "company_id": 16,  # Vertical Aerospace
+            "company": "Vertical Aerospace",
             "model_name": "VX4",
             "max_range": 160,
             "max_speed": 320,
             "passenger_capacity": 4
         },
         {
-            "company_id": 17,  # Eve Air Mobility
+            "company": "Eve Air Mobility",
             "model_name": "eVTOL v1",
             "max_range": 100,
             "max_speed": 240,
             "passenger_capacity": 4
         },
         {
-            "company_id": 18,  # Wisk Aero
+            "company": "Wisk Aero",
             "model_name": "Generation 6",
             "max_range": 140,
             "max_speed": 230,
             "passenger_capacity": 4
         },
         {
-            "company_id": 19,  # SkyDrive
+            "company": "SkyDrive",
             "model_name": "SD-03",
             "max_range": 30,
             "max_speed": 100,
             "passenger_capacity": 1
         },
         {
-            "company_id": 20,  # Overair
+            "company": "Overair",
             "model_name": "Butterfly",
             "max_range": 160,
             "max_speed": 280,
             "passenger_capacity": 5
         },
         {
-            "company_id": 3,  # 极飞科技
+            "company": "极飞科技",
             "model_name": "V40",
             "max_range": 50,
             "max_speed": 150,
             "passenger_capacity": 2
         },
         {
-            "company_id": 4,  # 华夏天信
+            "company": "华夏天信",
             "model_name": "HX-1",
             "max_range": 60,
             "max_speed": 180,
             "passenger_capacity": 3
         },
         {
-            "company_id": 5,  # 德事隆航空
+            "company": "德事隆航空",
             "model_name": "DX-20",
             "max_range": 80,
             "max_speed": 200,
             "passenger_capacity": 4
         },
         {
-            "company_id": 6,  # 航天科工
+            "company": "航天科工",
             "model_name": "天行者",
             "max_range": 100,
             "max_speed": 220,
             "passenger_capacity": 4
         },
         {
-            "company_id": 7,  # 锐翔航空
+            "company": "锐翔航空",
             "model_name": "RX-100",
             "max_range": 70,
             "max_speed": 190,
             "passenger_capacity": 3
         },
         {
-            "company_id": 8,  # 零度智控
+            "company": "零度智控",
             "model_name": "Z-1",
             "max_range": 40,
             "max_speed": 140,
@@ -634,16 +1644,20 @@ def add_sample_products():
         }
     ]
     
-    for product_data in sample_products:
-        product = EvtolProduct(**product_data)
-        db.session.add(product)
-    db.session.commit()
+    # 按公司名称关联公司
+    import_records('products', sample_products)
+
+@main.cli.command('seed')
+def seed():
+    """创建表、默认管理员账号和示例数据（已有数据时跳过），并检查全文索引"""
+    migrate_schema()  # 创建表，并为已有的表补加新增的列和索引
+    create_admin()  # 创建管理员账号
+    init_db_data()  # 初始化EVTOL公司数据
+    add_sample_jobs()  # 添加示例招聘信息
+    add_sample_products()  # 添加示例产品信息
+    search_index.ensure_index(db.engine)  # 检查全文索引
+    click.echo('示例数据已就绪')
 
 if __name__ == '__main__':
-    with app.app_context():
-        db.create_all()
-        create_admin()  # 创建管理员账号
-        init_db_data()  # 初始化EVTOL公司数据
-        add_sample_jobs()  # 添加示例招聘信息
-        add_sample_products()  # 添加示例产品信息
-    app.run(debug=True) 
\ No newline at end of file
+    # 示例数据由 flask seed 写入
+    create_app().run(debug=True) 
\ No newline at end of file
@@ -0,0 +1,239 @@
+"""静态资源构建：压缩 CSS / JS，按内容哈希命名，生成 gzip（和 brotli）预压缩文件及清单
+
+构建结果写入 static/dist/，清单 dist/manifest.json 记录源文件到带哈希文件名的映射，
+app.py 启动时读取清单，url_for('static', filename='css/style.css') 生成带哈希的地址。
+文件名随内容变化，nginx 可以让浏览器缓存一年（immutable），并直接发送预压缩文件（gzip_static）。
+
+    python assets.py                 # 构建
+    python assets.py --check         # 源文件修改后清单未重新构建时以非零状态退出
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+
+try:
+    import brotli
+except ImportError:  # 未安装 brotli 时只生成 gzip 文件
+    brotli = None
+
+STATIC_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+DIST = 'dist'
+MANIFEST = 'dist/manifest.json'
+SOURCES = ['css/style.css', 'js/auth.js', 'js/main.js']
+HASH_LENGTH = 10
+MIN_COMPRESS_SIZE = 256  # 小于该字节数的文件不生成预压缩版本
+
+_CSS_TOKEN_RE = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|/\*.*?\*/|\s+|[^"\'/\s]+|/', re.S)
+_CSS_TIGHT = '{};,>'
+# 这些字符之后出现的 / 是正则表达式字面量的开始，否则是除号
+_JS_REGEX_PREFIX = '(,=:[!&|?{};+-*%<>~^'
+_JS_REGEX_KEYWORDS = ('return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'void')
+_JS_TIGHT = '{}()[];,:=<>!&|?'
+
+
+def minify_css(text):
+    """去掉注释和多余空白；字符串原样保留，选择器中的空格（后代选择器）不受影响"""
+    out = []
+    for token in _CSS_TOKEN_RE.findall(text):
+        if token.startswith('/*'):
+            continue
+        if token.isspace():
+            if out and out[-1][-1] not in _CSS_TIGHT + ':' and out[-1] != ' ':
+                out.append(' ')
+            continue
+        if token[0] in _CSS_TIGHT and out and out[-1] == ' ':
+            out.pop()
+        out.append(token)
+    return ''.join(out).replace(';}', '}').strip()
+
+
+def _js_tokens(text):
+    """把 JS 源码切分为 (类型, 文本)：literal（字符串、模板字符串、正则）、comment、space、code"""
+    i, n = 0, len(text)
+    last = ''  # 上一个有效的代码片段，用于区分正则和除号
+    while i < n:
+        c = text[i]
+        if c in '"\'`':
+            j = i + 1
+            while j < n and text[j] != c:
+                j += 2 if text[j] == '\\' else 1
+            yield 'literal', text[i:j + 1]
+            last, i = text[i:j + 1], j + 1
+        elif text.startswith('//', i):
+            j = text.find('\n', i)
+            j = n if j < 0 else j
+            yield 'comment', text[i:j]
+            i = j
+        elif text.startswith('/*', i):
+            j = text.find('*/', i + 2)
+            j = n if j < 0 else j + 2
+            yield 'comment', text[i:j]
+            i = j
+        elif c == '/' and (not last or last[-1] in _JS_REGEX_PREFIX or last in _JS_REGEX_KEYWORDS):
+            j, in_class = i + 1, False
+            while j < n and (in_class or text[j] != '/') and text[j] != '\n':
+                if text[j] == '\\':
+                    j += 1
+                elif text[j] in '[]':
+                    in_class = text[j] == '['
+                j += 1
+            j += 1
+            while j < n and text[j].isalpha():
+                j += 1
+            yield 'literal', text[i:j]
+            last, i = text[i:j], j
+        elif c.isspace():
+            j = i
+            while j < n and text[j].isspace():
+                j += 1
+            yield 'space', text[i:j]
+            i = j
+        else:
+            j = i + 1
+            if c.isalnum() or c in '_$':
+                while j < n and (text[j].isalnum() or text[j] in '_$'):
+                    j += 1
+            yield 'code', text[i:j]
+            last, i = text[i:j], j
+
+
+def minify_js(text):
+    """去掉注释、缩进和多余空白；保留换行（不依赖自动插入分号的规则），字符串和模板字符串原样保留"""
+    out = []
+    pending = ''  # 两个片段之间待定的空白：'' / ' ' / '\n'
+    for kind, token in _js_tokens(text):
+        if kind == 'comment':
+            if token.startswith('//'):
+                pending = pending or ' '
+            elif '\n' in token:
+                pending = '\n'
+            else:
+                pending = pending or ' '
+            continue
+        if kind == 'space':
+            pending = '\n' if '\n' in token or pending == '\n' else pending or ' '
+            continue
+        if out and pending:
+            previous = out[-1][-1]
+            if pending == '\n' and (previous in '{([;,' or token[0] in '})]'):
+                pending = ''
+            elif pending == ' ' and (previous in _JS_TIGHT or token[0] in _JS_TIGHT):
+                pending = ''
+            if pending:
+                out.append(pending)
+        out.append(token)
+        pending = ''
+    return ''.join(out).strip() + '\n'
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+
+def hashed_name(source, data):
+    root, ext = os.path.splitext(source)
+    return f'{DIST}/{root}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{ext}'
+
+
+def load_manifest(path):
+    """读取清单，不存在时返回空字典（使用源文件）"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def minified(static_folder, source):
+    """返回 (源文件字节数, 压缩后的内容)"""
+    with open(os.path.join(static_folder, source), encoding='utf-8') as f:
+        text = f.read().replace('\r\n', '\n')
+    return len(text.encode('utf-8')), MINIFIERS[os.path.splitext(source)[1]](text).encode('utf-8')
+
+
+def build_file(static_folder, source):
+    """压缩一个源文件并写出带哈希的文件及预压缩版本，返回 (带哈希的文件名, 各版本大小)"""
+    size, data = minified(static_folder, source)
+    name = hashed_name(source, data)
+    target = os.path.join(static_folder, name)
+    sizes = {'source': size, 'minified': len(data)}
+    if not os.path.exists(target):
+        _write(target, data)
+    if len(data) >= MIN_COMPRESS_SIZE:
+        variants = [('gz', lambda: gzip.compress(data, 9, mtime=0))]
+        if brotli is not None:
+            variants.append(('br', lambda: brotli.compress(data, quality=11)))
+        for suffix, compress in variants:
+            compressed = compress()
+            sizes[suffix] = len(compressed)
+            if len(compressed) < len(data) and not os.path.exists(f'{target}.{suffix}'):
+                _write(f'{target}.{suffix}', compressed)
+    return name, sizes
+
+
+def prune(static_folder, keep):
+    """删除 dist/ 下不在 keep 中的构建文件（及其预压缩版本）"""
+    dist = os.path.join(static_folder, DIST)
+    removed = 0
+    for root, _, names in os.walk(dist):
+        for name in names:
+            path = os.path.join(root, name)
+            relative = os.path.relpath(path, static_folder).replace(os.sep, '/')
+            if relative == MANIFEST or re.sub(r'\.(gz|br)$', '', relative) in keep:
+                continue
+            os.remove(path)
+            removed += 1
+    return removed
+
+
+def build(static_folder=STATIC_FOLDER, sources=SOURCES):
+    """构建所有源文件并写入清单；上一版清单引用的文件保留，部署时还在使用旧页面的浏览器仍能加载"""
+    manifest_path = os.path.join(static_folder, MANIFEST)
+    previous = load_manifest(manifest_path)
+    manifest, report = {}, {}
+    for source in sources:
+        manifest[source], report[source] = build_file(static_folder, source)
+    _write(manifest_path, json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    prune(static_folder, set(manifest.values()) | set(previous.values()))
+    return manifest, report
+
+
+def is_stale(static_folder=STATIC_FOLDER, sources=SOURCES):
+    """清单缺失或与源文件当前内容不符时返回 True"""
+    manifest = load_manifest(os.path.join(static_folder, MANIFEST))
+    return any(manifest.get(source) != hashed_name(source, minified(static_folder, source)[1])
+               for source in sources)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--static', default=STATIC_FOLDER, help='静态文件目录')
+    parser.add_argument('--check', action='store_true', help='只检查清单是否与源文件一致')
+    args = parser.parse_args()
+
+    if args.check:
+        if is_stale(args.static):
+            raise SystemExit('静态资源需要重新构建：python assets.py')
+        print('静态资源清单是最新的')
+        return
+
+    manifest, report = build(args.static)
+    for source, sizes in report.items():
+        compressed = '  '.join(f'{suffix} {sizes[suffix]}' for suffix in ('gz', 'br') if suffix in sizes)
+        print(f"{source} -> {manifest[source]}  {sizes['source']} -> {sizes['minified']} 字节  {compressed}")
+    if brotli is None:
+        print('未安装 brotli，只生成了 gzip 文件（pip install brotli）')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,64 +1,496 @@
+"""数据库和项目备份
+
+数据库备份使用 SQLite 在线备份 API 分步复制，网站可以照常读写，也不会复制到写了一半的文件；
+快照通过完整性检查后流式压缩保存。增量备份只保存与上一次备份相比发生变化的页。
+
+    python backup.py                              # 备份数据库和项目
+    python backup.py db [--incremental]           # 备份数据库
+    python backup.py list                         # 列出数据库备份
+    python backup.py verify <名称>                # 还原到临时文件并校验
+    python backup.py restore <名称> <目标文件>    # 还原数据库备份（先停止网站）
+    python backup.py project                      # 项目快照（内容寻址，未变化的文件不重复保存）
+    python backup.py snapshots                    # 列出项目快照
+    python backup.py restore-project <名称> <目录>
+    python backup.py prune-project [--keep N]
+"""
+import argparse
+import glob
+import gzip
+import hashlib
+import json
 import os
 import shutil
+import sqlite3
+import struct
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
+from urllib.parse import quote
+
+try:
+    import fcntl
+except ImportError:  # Windows 上没有共享锁，用 msvcrt 的排他锁，项目备份之间也互斥
+    fcntl = None
+    import msvcrt
+
+DATABASE = 'database.db'
+BACKUP_DIR = 'backups'
+PAGES_PER_STEP = 256  # 每步复制的页数，步与步之间释放读锁
+STEP_SLEEP = 0.01  # 每步之后暂停的秒数，把磁盘和 CPU 让给网站请求
+MAX_RESTARTS = 3  # 复制期间源库被修改会从头开始，超过次数后改为一步复制完（WAL 模式下不阻塞写入）
+KEEP_FULL = 7  # 保留最近几个全量备份及其后的增量备份
+MAX_INCREMENTALS = 24  # 一个全量备份之后最多的增量备份数，超过后自动改做全量备份
+COMPRESS_LEVEL = 6
+
+_RECORD = struct.Struct('>I')  # 增量备份中每页前的页号
+
+class _TooManyRestarts(Exception):
+    pass
+
+def snapshot(database, target):
+    """用在线备份 API 把数据库复制为一致的快照文件"""
+    source = sqlite3.connect(f'file:{quote(os.path.abspath(database))}?mode=ro', uri=True)
+    destination = sqlite3.connect(target)
+    state = {'remaining': None, 'restarts': 0}
+
+    def throttle(status, remaining, total):
+        if state['remaining'] is not None and remaining > state['remaining']:
+            state['restarts'] += 1
+            if state['restarts'] > MAX_RESTARTS:
+                raise _TooManyRestarts()
+        state['remaining'] = remaining
+        time.sleep(STEP_SLEEP)
 
-def backup_database():
-    """备份数据库文件"""
-    # 创建备份目录
-    backup_dir = 'backups'
-    if not os.path.exists(backup_dir):
-        os.makedirs(backup_dir)
-    
-    # 生成备份文件名（包含时间戳）
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    backup_file = f'database_backup_{timestamp}.db'
-    backup_path = os.path.join(backup_dir, backup_file)
-    
-    # 复制数据库文件
     try:
-        shutil.copy2('database.db', backup_path)
-        print(f'数据库已备份到: {backup_path}')
+        try:
+            source.backup(destination, pages=PAGES_PER_STEP, progress=throttle)
+        except _TooManyRestarts:
+            print('备份期间数据库持续被修改，改为一次复制完成')
+            source.backup(destination)
+        result = destination.execute('PRAGMA integrity_check').fetchone()[0]
+        if result != 'ok':
+            raise RuntimeError(f'快照完整性检查失败: {result}')
+        return destination.execute('PRAGMA page_size').fetchone()[0]
+    finally:
+        destination.close()
+        source.close()
+
+def _read_pages(path, page_size):
+    with open(path, 'rb') as f:
+        while True:
+            page = f.read(page_size)
+            if not page:
+                return
+            yield page
+
+def _manifest_path(name):
+    return os.path.join(BACKUP_DIR, f'{name}.json')
+
+def _load_manifest(name):
+    with open(_manifest_path(name), encoding='utf-8') as f:
+        return json.load(f)
+
+def _load_page_digests(name):
+    with open(os.path.join(BACKUP_DIR, f'{name}.pages'), 'rb') as f:
+        data = f.read()
+    return [data[i:i + 20] for i in range(0, len(data), 20)]
+
+def list_backups():
+    """按时间顺序返回所有数据库备份的清单"""
+    if not os.path.isdir(BACKUP_DIR):
+        return []
+    names = sorted(name[:-5] for name in os.listdir(BACKUP_DIR)
+                   if name.startswith('database_') and name.endswith('.json'))
+    return [_load_manifest(name) for name in names]
+
+def _write_backup(snapshot_path, page_size, name, previous):
+    """流式压缩快照；previous 为上一次备份的页摘要时只写入变化的页，返回清单"""
+    data_path = os.path.join(BACKUP_DIR, f'{name}.gz')
+    image = hashlib.sha256()  # 数据库文件的摘要，还原后校验
+    content = hashlib.sha256()  # 压缩前内容的摘要，校验压缩文件
+    digests = []
+    changed = 0
+    with gzip.open(data_path + '.tmp', 'wb', compresslevel=COMPRESS_LEVEL) as out:
+        for page_no, page in enumerate(_read_pages(snapshot_path, page_size)):
+            image.update(page)
+            digest = hashlib.sha1(page).digest()
+            digests.append(digest)
+            if previous is None:
+                chunk = page
+            elif page_no >= len(previous) or previous[page_no] != digest:
+                chunk = _RECORD.pack(page_no) + page
+            else:
+                continue
+            changed += 1
+            content.update(chunk)
+            out.write(chunk)
+
+    # 重新读取压缩文件，确认可以完整解压且内容一致
+    check = hashlib.sha256()
+    with gzip.open(data_path + '.tmp', 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            check.update(chunk)
+    if check.digest() != content.digest():
+        os.remove(data_path + '.tmp')
+        raise RuntimeError('压缩文件校验失败')
+    os.replace(data_path + '.tmp', data_path)
+
+    with open(os.path.join(BACKUP_DIR, f'{name}.pages'), 'wb') as f:
+        f.write(b''.join(digests))
+    return {
+        'name': name,
+        'page_size': page_size,
+        'page_count': len(digests),
+        'changed_pages': changed,
+        'sha256': image.hexdigest(),
+        'content_sha256': content.hexdigest(),
+        'size': os.path.getsize(data_path),
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+    }
+
+def backup_database(incremental=False, database=DATABASE):
+    """备份数据库；incremental 为 True 时只保存与上一次备份相比变化的页"""
+    if not os.path.exists(database):
+        print(f'备份失败: 找不到数据库文件 {database}')
+        return None
+    os.makedirs(BACKUP_DIR, exist_ok=True)
+    name = f"database_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+
+    backups = list_backups()
+    parent = backups[-1] if incremental and backups else None
+    if parent is not None and parent.get('chain_length', 0) >= MAX_INCREMENTALS:
+        print(f'已有 {MAX_INCREMENTALS} 个增量备份，本次改做全量备份')
+        parent = None
+
+    fd, snapshot_path = tempfile.mkstemp(suffix='.db', dir=BACKUP_DIR)
+    os.close(fd)
+    try:
+        page_size = snapshot(database, snapshot_path)
+        if parent is not None and parent['page_size'] != page_size:
+            parent = None  # 页大小变化（VACUUM 后）时无法按页比较
+        previous = _load_page_digests(parent['name']) if parent is not None else None
+        manifest = _write_backup(snapshot_path, page_size, name, previous)
     except Exception as e:
         print(f'备份失败: {str(e)}')
+        return None
+    finally:
+        os.remove(snapshot_path)
+
+    if parent is None:
+        manifest.update(kind='full', parent=None, chain_length=0)
+    else:
+        manifest.update(kind='incremental', parent=parent['name'],
+                        chain_length=parent.get('chain_length', 0) + 1)
+    with open(_manifest_path(name), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    print(f"数据库已备份到: {os.path.join(BACKUP_DIR, name + '.gz')} "
+          f"({'增量' if parent else '全量'}, {manifest['changed_pages']}/{manifest['page_count']} 页, "
+          f"{manifest['size']} 字节)")
+    prune_database_backups()
+    return manifest
+
+def restore_database(name, target):
+    """按 全量备份 -> 增量备份 的顺序还原到 target，校验通过后才替换目标文件"""
+    chain = [_load_manifest(name)]
+    while chain[-1]['parent']:
+        chain.append(_load_manifest(chain[-1]['parent']))
+    chain.reverse()
+
+    latest = chain[-1]
+    page_size = latest['page_size']
+    record_size = _RECORD.size + page_size
+    temp_path = target + '.restoring'
+    with open(temp_path, 'wb') as out:
+        for manifest in chain:
+            with gzip.open(os.path.join(BACKUP_DIR, manifest['name'] + '.gz'), 'rb') as f:
+                if manifest['kind'] == 'full':
+                    shutil.copyfileobj(f, out, 1 << 20)
+                    continue
+                for record in iter(lambda: f.read(record_size), b''):
+                    page_no, = _RECORD.unpack_from(record)
+                    out.seek(page_no * page_size)
+                    out.write(record[_RECORD.size:])
+        out.truncate(latest['page_count'] * page_size)
+
+    image = hashlib.sha256()
+    for page in _read_pages(temp_path, page_size):
+        image.update(page)
+    if image.hexdigest() != latest['sha256']:
+        os.remove(temp_path)
+        raise RuntimeError(f'还原结果校验失败: {name}')
+    os.replace(temp_path, target)
+    # 目标文件旁残留的 WAL 属于旧数据库，打开时会被错误地应用
+    for suffix in ('-wal', '-shm'):
+        if os.path.exists(target + suffix):
+            os.remove(target + suffix)
+    return target
+
+def verify_database_backup(name):
+    """还原到临时文件并做完整性检查"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = restore_database(name, os.path.join(tmp, 'verify.db'))
+        connection = sqlite3.connect(path)
+        try:
+            return connection.execute('PRAGMA integrity_check').fetchone()[0] == 'ok'
+        finally:
+            connection.close()
+
+def prune_database_backups(keep_full=KEEP_FULL):
+    """只保留最近 keep_full 个全量备份及其后的增量备份"""
+    backups = list_backups()
+    fulls = [manifest['name'] for manifest in backups if manifest['kind'] == 'full']
+    if len(fulls) <= keep_full:
+        return
+    oldest_kept = fulls[-keep_full]
+    for manifest in backups:
+        if manifest['name'] >= oldest_kept:
+            break
+        for suffix in ('.gz', '.pages', '.json'):
+            path = os.path.join(BACKUP_DIR, manifest['name'] + suffix)
+            if os.path.exists(path):
+                os.remove(path)
+        print(f"已删除过期备份: {manifest['name']}")
+
+# 项目快照：文件按内容的 SHA-256 存为压缩对象，未变化的文件在快照之间共享，每个快照只写一个清单
+PROJECT_BACKUP_DIR = 'project_backups'
+PROJECT_ITEMS = ['*.py', 'requirements.txt', 'README.md', 'PROGRESS.md', 'templates', 'static', 'benchmarks',
+                 DATABASE]
+PROJECT_KEEP = 30  # prune 时保留的快照数
+HASH_WORKERS = 8
+
+def _object_path(digest):
+    return os.path.join(PROJECT_BACKUP_DIR, 'objects', digest[:2], digest[2:])
+
+def _snapshot_manifest_path(name):
+    return os.path.join(PROJECT_BACKUP_DIR, 'snapshots', f'{name}.json')
+
+@contextmanager
+def _project_lock(exclusive):
+    """项目快照目录的文件锁：备份持共享锁，prune 持排他锁
+
+    备份先写对象、最后才写清单，prune 与备份同时进行会把还没写进清单的对象当作无人引用而删除。
+    """
+    os.makedirs(PROJECT_BACKUP_DIR, exist_ok=True)
+    with open(os.path.join(PROJECT_BACKUP_DIR, 'lock'), 'a+b') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield  # 关闭文件时释放
+            return
+        lock.seek(0)
+        while True:
+            try:
+                msvcrt.locking(lock.fileno(), msvcrt.LK_LOCK, 1)  # 最多重试 10 秒，之后抛出 OSError
+                break
+            except OSError:
+                continue
+        try:
+            yield
+        finally:
+            lock.seek(0)
+            msvcrt.locking(lock.fileno(), msvcrt.LK_UNLCK, 1)
+
+def _project_files():
+    """展开 PROJECT_ITEMS，返回相对路径列表"""
+    files = []
+    for item in PROJECT_ITEMS:
+        for path in sorted(glob.glob(item)):
+            if os.path.isdir(path):
+                for root, dirs, names in os.walk(path):
+                    dirs[:] = sorted(d for d in dirs if d != '__pycache__')
+                    files.extend(os.path.join(root, name) for name in sorted(names))
+            elif os.path.isfile(path):
+                files.append(path)
+    return [os.path.normpath(path) for path in files]
+
+def _load_hash_cache():
+    try:
+        with open(os.path.join(PROJECT_BACKUP_DIR, 'hashcache.json'), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _store_object(path):
+    """计算文件的 SHA-256，对象不存在时压缩保存"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    digest = digest.hexdigest()
+    object_path = _object_path(digest)
+    if os.path.exists(object_path):
+        return digest
+    os.makedirs(os.path.dirname(object_path), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(object_path))
+    with os.fdopen(fd, 'wb') as raw, open(path, 'rb') as f:
+        with gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=COMPRESS_LEVEL, mtime=0) as out:
+            shutil.copyfileobj(f, out, 1 << 20)
+    os.replace(temp_path, object_path)
+    return digest
+
+def _snapshot_file(path, cached):
+    """返回 (路径, 清单条目)；大小和修改时间与缓存一致且对象存在时不重新读取文件"""
+    stat = os.stat(path)
+    entry = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'mode': stat.st_mode & 0o777}
+    if (cached and cached['size'] == stat.st_size and cached['mtime_ns'] == stat.st_mtime_ns
+            and os.path.exists(_object_path(cached['sha256']))):
+        entry['sha256'] = cached['sha256']
+    else:
+        entry['sha256'] = _store_object(path)
+    return path, entry
 
 def backup_project():
-    """备份整个项目"""
-    # 创建备份目录
-    backup_dir = 'project_backups'
-    if not os.path.exists(backup_dir):
-        os.makedirs(backup_dir)
-    
-    # 生成备份文件名
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    backup_name = f'project_backup_{timestamp}'
-    backup_path = os.path.join(backup_dir, backup_name)
-    
-    # 要备份的文件和目录
-    items_to_backup = [
-        'app.py',
-        'config.py',
-        'requirements.txt',
-        'templates',
-        'static',
-        'database.db',
-        'PROGRESS.md'
-    ]
-    
-    # 创建备份目录
-    os.makedirs(backup_path)
-    
-    # 复制文件和目录
+    """备份整个项目为内容寻址的快照，返回快照名称"""
+    with _project_lock(exclusive=False):
+        return _backup_project()
+
+def _backup_project():
+    os.makedirs(os.path.join(PROJECT_BACKUP_DIR, 'snapshots'), exist_ok=True)
+    name = f"project_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+    cache = _load_hash_cache()
+    files = {}
+    database_snapshot = None
     try:
-        for item in items_to_backup:
-            if os.path.exists(item):
-                if os.path.isdir(item):
-                    shutil.copytree(item, os.path.join(backup_path, item))
-                else:
-                    shutil.copy2(item, backup_path)
-        print(f'项目已备份到: {backup_path}')
+        paths = [path for path in _project_files() if path != os.path.normpath(DATABASE)]
+        with ThreadPoolExecutor(HASH_WORKERS) as executor:
+            for path, entry in executor.map(lambda path: _snapshot_file(path, cache.get(path)), paths):
+                files[path] = entry
+
+        # 数据库正在使用，先用在线备份 API 取得一致的快照再保存
+        if os.path.exists(DATABASE):
+            fd, database_snapshot = tempfile.mkstemp(suffix='.db', dir=PROJECT_BACKUP_DIR)
+            os.close(fd)
+            snapshot(DATABASE, database_snapshot)
+            stat = os.stat(DATABASE)
+            files[os.path.normpath(DATABASE)] = {
+                'size': os.path.getsize(database_snapshot), 'mtime_ns': stat.st_mtime_ns,
+                'mode': stat.st_mode & 0o777, 'sha256': _store_object(database_snapshot),
+            }
     except Exception as e:
         print(f'备份失败: {str(e)}')
+        return None
+    finally:
+        if database_snapshot:
+            os.remove(database_snapshot)
+
+    manifest = {'name': name, 'created_at': datetime.now().isoformat(timespec='seconds'), 'files': files}
+    with open(_snapshot_manifest_path(name), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    # 多个备份可以同时进行（共享锁），各自写临时文件再替换
+    fd, cache_tmp = tempfile.mkstemp(suffix='.json', dir=PROJECT_BACKUP_DIR)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(files, f)
+    os.replace(cache_tmp, os.path.join(PROJECT_BACKUP_DIR, 'hashcache.json'))
+    print(f'项目已备份: {name}（{len(files)} 个文件）')
+    return name
+
+def list_project_snapshots():
+    directory = os.path.join(PROJECT_BACKUP_DIR, 'snapshots')
+    if not os.path.isdir(directory):
+        return []
+    return sorted(name[:-5] for name in os.listdir(directory) if name.endswith('.json'))
+
+def restore_project(name, target):
+    """把快照中的文件还原到 target 目录，逐个校验内容摘要；还原期间 prune 不会删除快照的对象"""
+    with _project_lock(exclusive=False):
+        return _restore_project(name, target)
+
+def _restore_project(name, target):
+    with open(_snapshot_manifest_path(name), encoding='utf-8') as f:
+        files = json.load(f)['files']
+
+    def restore_file(item):
+        path, entry = item
+        destination = os.path.join(target, path)
+        os.makedirs(os.path.dirname(destination) or '.', exist_ok=True)
+        digest = hashlib.sha256()
+        with gzip.open(_object_path(entry['sha256']), 'rb') as f, open(destination + '.tmp', 'wb') as out:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+                out.write(chunk)
+        if digest.hexdigest() != entry['sha256']:
+            os.remove(destination + '.tmp')
+            raise RuntimeError(f'文件内容校验失败: {path}')
+        os.chmod(destination + '.tmp', entry['mode'])
+        os.replace(destination + '.tmp', destination)
+        os.utime(destination, ns=(entry['mtime_ns'], entry['mtime_ns']))
+
+    with ThreadPoolExecutor(HASH_WORKERS) as executor:
+        list(executor.map(restore_file, files.items()))
+    return len(files)
+
+def prune_project_snapshots(keep=PROJECT_KEEP):
+    """只保留最近 keep 个快照，并删除不再被任何快照引用的对象；等待正在进行的项目备份完成后才开始"""
+    with _project_lock(exclusive=True):
+        _prune_project_snapshots(keep)
+
+def _prune_project_snapshots(keep):
+    names = list_project_snapshots()
+    for name in names[:-keep] if keep else names:
+        os.remove(_snapshot_manifest_path(name))
+    referenced = set()
+    for name in list_project_snapshots():
+        with open(_snapshot_manifest_path(name), encoding='utf-8') as f:
+            referenced.update(entry['sha256'] for entry in json.load(f)['files'].values())
+
+    removed = freed = 0
+    objects_dir = os.path.join(PROJECT_BACKUP_DIR, 'objects')
+    for root, _, object_names in os.walk(objects_dir):
+        for object_name in object_names:
+            if os.path.basename(root) + object_name not in referenced:
+                path = os.path.join(root, object_name)
+                freed += os.path.getsize(path)
+                os.remove(path)
+                removed += 1
+    print(f'已删除 {max(len(names) - keep, 0)} 个快照、{removed} 个对象，释放 {freed} 字节')
+
+def main():
+    parser = argparse.ArgumentParser(description='数据库和项目备份')
+    commands = parser.add_subparsers(dest='command')
+    db_parser = commands.add_parser('db', help='备份数据库')
+    db_parser.add_argument('--incremental', action='store_true', help='只保存与上一次备份相比变化的页')
+    commands.add_parser('list', help='列出数据库备份')
+    verify_parser = commands.add_parser('verify', help='还原到临时文件并校验')
+    verify_parser.add_argument('name')
+    restore_parser = commands.add_parser('restore', help='还原数据库备份')
+    restore_parser.add_argument('name')
+    restore_parser.add_argument('target')
+    restore_parser.add_argument('--force', action='store_true', help='覆盖已存在的目标文件')
+    commands.add_parser('project', help='备份项目文件和数据库')
+    commands.add_parser('snapshots', help='列出项目快照')
+    restore_project_parser = commands.add_parser('restore-project', help='还原项目快照到指定目录')
+    restore_project_parser.add_argument('name')
+    restore_project_parser.add_argument('target')
+    prune_parser = commands.add_parser('prune-project', help='删除旧快照和不再引用的对象')
+    prune_parser.add_argument('--keep', type=int, default=PROJECT_KEEP, help='保留的快照数')
+    args = parser.parse_args()
+
+    if args.command == 'db':
+        backup_database(incremental=args.incremental)
+    elif args.command == 'list':
+        for manifest in list_backups():
+            print(f"{manifest['name']}  {manifest['kind']:<11}  {manifest['changed_pages']:>8}/"
+                  f"{manifest['page_count']} 页  {manifest['size']:>10} 字节  {manifest['created_at']}")
+    elif args.command == 'verify':
+        print('校验通过' if verify_database_backup(args.name) else '校验失败')
+    elif args.command == 'restore':
+        if os.path.exists(args.target) and not args.force:
+            parser.error(f'{args.target} 已存在，确认覆盖请加 --force')
+        print(f'已还原到: {restore_database(args.name, args.target)}')
+    elif args.command == 'project':
+        backup_project()
+    elif args.command == 'snapshots':
+        for name in list_project_snapshots():
+            print(name)
+    elif args.command == 'restore-project':
+        print(f'已还原 {restore_project(args.name, args.target)} 个文件到: {args.target}')
+    elif args.command == 'prune-project':
+        prune_project_snapshots(args.keep)
+    else:
+        backup_database()
+        backup_project()
 
 if __name__ == '__main__':
-    backup_database()
-    backup_project() 
\ No newline at end of file
+    main()
@@ -0,0 +1,71 @@
+"""对比两次压测结果（loadtest.py 的输出），吞吐下降或 p95/p99 上升超过阈值时以状态码 1 退出
+
+    python benchmarks/compare.py results/before.json results/after.json --threshold 10
+"""
+import argparse
+import json
+
+# 指标 -> 数值变大是否为退步
+METRICS = (('throughput', False), ('p50_ms', True), ('p95_ms', True), ('p99_ms', True), ('ok_ratio', False))
+GATED = ('throughput', 'p95_ms', 'p99_ms', 'ok_ratio')
+
+
+def change(before, after):
+    if before in (None, 0) or after is None:
+        return None
+    return (after - before) / before * 100
+
+
+def compare(before, after, threshold):
+    """返回 (输出行, 退步项)"""
+    lines = []
+    regressions = []
+    for scenario in sorted(set(before['scenarios']) & set(after['scenarios'])):
+        lines.append(f'[{scenario}]')
+        for metric, higher_is_worse in METRICS:
+            old = before['scenarios'][scenario].get(metric)
+            new = after['scenarios'][scenario].get(metric)
+            delta = change(old, new)
+            mark = ''
+            if delta is not None and metric in GATED:
+                worse = delta > threshold if higher_is_worse else delta < -threshold
+                if worse:
+                    mark = '  <-- 退步'
+                    regressions.append(f'{scenario}.{metric}')
+            delta_text = f'{delta:+.1f}%' if delta is not None else '-'
+            lines.append(f'  {metric:<11} {old!s:>10} -> {new!s:>10}  {delta_text}{mark}')
+
+    for endpoint in sorted(set(before.get('sql_per_request', {})) | set(after.get('sql_per_request', {}))):
+        old = before.get('sql_per_request', {}).get(endpoint)
+        new = after.get('sql_per_request', {}).get(endpoint)
+        if old != new:
+            lines.append(f'SQL/请求 {endpoint}: {old} -> {new}')
+
+    old = before.get('server_memory', {}).get('total_pss_kb')
+    new = after.get('server_memory', {}).get('total_pss_kb')
+    if old is not None and new is not None:
+        lines.append(f'服务器内存 PSS: {old / 1024:.1f}MB -> {new / 1024:.1f}MB  {change(old, new):+.1f}%')
+    return lines, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--threshold', type=float, default=10, help='允许的变化百分比')
+    args = parser.parse_args()
+
+    with open(args.before, encoding='utf-8') as f:
+        before = json.load(f)
+    with open(args.after, encoding='utf-8') as f:
+        after = json.load(f)
+    lines, regressions = compare(before, after, args.threshold)
+    print(f"{before.get('revision')} -> {after.get('revision')}")
+    print('\n'.join(lines))
+    if regressions:
+        print(f"退步: {', '.join(regressions)}")
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""生成压测用的合成数据：中英文混合的公司、产品和招聘信息，输出为 import-data 可直接导入的 JSONL
+
+    python benchmarks/datagen.py --out /tmp/bench-data --companies 100000 --jobs 1000000
+"""
+import argparse
+import json
+import os
+import random
+from datetime import datetime, timedelta
+
+ZH_WORDS = ['天翼', '云鹰', '鲲鹏', '凌空', '翔龙', '飞鸿', '星航', '御风', '青云', '极光',
+            '蓝天', '智飞', '远航', '峰行', '九天', '长空', '鸿雁', '天行', '启航', '银翼']
+ZH_SUFFIXES = ['航空科技', '智能', '飞行器', '通用航空', '空中交通', '无人机']
+EN_WORDS = ['Aero', 'Sky', 'Vertical', 'Lift', 'Urban', 'Wing', 'Jet', 'Air', 'Volt', 'Hover',
+            'Cloud', 'Falcon', 'Swift', 'Orbit', 'Zephyr', 'Glide', 'Nimbus', 'Strato', 'Rotor', 'Blue']
+EN_SUFFIXES = ['Aviation', 'Mobility', 'Aerospace', 'Air Taxi', 'Dynamics', 'Technologies']
+COUNTRIES = ['中国', '美国', '德国', '英国', '日本', '巴西', '法国', '韩国', '以色列', '加拿大']
+CERTIFICATIONS = ['研发阶段', '原型机试飞', '正在申请适航认证', '已获得型号合格证', 'FAA G-1 阶段', 'EASA 认证中']
+DESCRIPTION_WORDS = ['电动垂直起降', 'eVTOL', '城市空中交通', 'urban air mobility', '自动驾驶', 'autonomous flight',
+                     '分布式电推进', 'distributed electric propulsion', '低空物流', 'cargo drone', '倾转旋翼',
+                     'tilt-rotor', '多旋翼', 'multicopter', '氢燃料电池', 'battery pack', '适航认证', 'certification']
+CITIES = ['深圳', '广州', '上海', '北京', '杭州', '成都', '西安', '武汉', '南京', '苏州', '合肥', '珠海']
+ROLES = ['飞控算法工程师', '结构设计工程师', '电池系统工程师', '试飞工程师', '适航工程师', '嵌入式软件工程师',
+         'Flight Test Engineer', 'Avionics Engineer', 'Propulsion Engineer', '产品经理', '供应链经理', '运营专员']
+SALARIES = ['15k-25k', '20k-30k', '25k-40k', '30-50万/年', '40万以上', '8千-1.2万', '1.5万-2.5万', '面议']
+
+
+def company_name(rng, i):
+    """第 i 家公司的名称，末尾带编号保证唯一"""
+    if rng.random() < 0.6:
+        return f'{rng.choice(ZH_WORDS)}{rng.choice(ZH_WORDS)}{rng.choice(ZH_SUFFIXES)}{i}'
+    return f'{rng.choice(EN_WORDS)}{rng.choice(EN_WORDS).lower()} {rng.choice(EN_SUFFIXES)} {i}'
+
+
+def description(rng, words=12):
+    return '，'.join(rng.choice(DESCRIPTION_WORDS) for _ in range(words))
+
+
+def generate(out, companies, products, jobs, seed=42):
+    rng = random.Random(seed)
+    os.makedirs(out, exist_ok=True)
+    names = [company_name(rng, i) for i in range(companies)]
+
+    with open(os.path.join(out, 'companies.jsonl'), 'w', encoding='utf-8') as f:
+        for name in names:
+            f.write(json.dumps({
+                'name': name,
+                'country': rng.choice(COUNTRIES),
+                'description': description(rng),
+                'certification_status': rng.choice(CERTIFICATIONS),
+            }, ensure_ascii=False) + '\n')
+
+    with open(os.path.join(out, 'products.jsonl'), 'w', encoding='utf-8') as f:
+        for i in range(products):
+            f.write(json.dumps({
+                'company': rng.choice(names),
+                'model_name': f'{rng.choice(EN_WORDS)[:2].upper()}-{i}',
+                'max_range': rng.randint(20, 300),
+                'max_speed': rng.randint(80, 320),
+                'passenger_capacity': rng.choice([0, 1, 2, 2, 4, 4, 5, 6]),
+            }, ensure_ascii=False) + '\n')
+
+    now = datetime(2025, 1, 1)
+    with open(os.path.join(out, 'jobs.jsonl'), 'w', encoding='utf-8') as f:
+        for i in range(jobs):
+            f.write(json.dumps({
+                'title': f'{rng.choice(ROLES)}（{i}）',
+                'company': rng.choice(names),
+                'location': rng.choice(CITIES),
+                'description': description(rng, 20),
+                'requirements': description(rng, 8),
+                'salary_range': rng.choice(SALARIES),
+                'contact_email': f'hr{i % 1000}@example.com',
+                'created_at': (now - timedelta(seconds=rng.randint(0, 365 * 86400))).isoformat(),
+            }, ensure_ascii=False) + '\n')
+
+    # 压测时使用的搜索词：公司名称中的词，覆盖中文、英文和前缀
+    terms = ZH_WORDS + EN_WORDS + [word[:3] for word in EN_WORDS] + ['航空', 'eVTOL', 'Aviation']
+    with open(os.path.join(out, 'terms.json'), 'w', encoding='utf-8') as f:
+        json.dump({'search_terms': terms, 'locations': CITIES}, f, ensure_ascii=False)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--out', required=True, help='输出目录')
+    parser.add_argument('--companies', type=int, default=10000)
+    parser.add_argument('--products', type=int, default=20000)
+    parser.add_argument('--jobs', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=42, help='随机种子，相同参数生成相同的数据')
+    args = parser.parse_args()
+    generate(args.out, args.companies, args.products, args.jobs, args.seed)
+    print(f'已生成到: {args.out}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""发布招聘写入基准：多个线程通过测试客户端持续发布招聘，对比逐条提交与分组提交的吞吐
+
+每种模式在独立的子进程和临时数据库中运行，分组提交模式下写连接使用 synchronous=FULL。
+
+    python benchmarks/group_commit.py --threads 16 --duration 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def worker(app, deadline, counts, errors):
+    client = app.test_client()
+    client.post('/login', data={'username': 'bench', 'password': 'bench'})
+    count = failed = 0
+    while time.perf_counter() < deadline:
+        response = client.post('/jobs/post', data={
+            'title': f'工程师 {count}', 'company': '基准公司', 'location': '深圳',
+            'description': '负责EVTOL飞行器研发', 'requirements': '相关专业本科及以上学历',
+            'salary_range': '25k-35k', 'contact_email': 'hr@example.com',
+        })
+        if response.status_code == 302:
+            count += 1
+        else:
+            failed += 1
+    counts.append(count)
+    errors.append(failed)
+
+
+def run_mode(threads, duration):
+    """在子进程中执行：环境变量已指定数据库和是否开启分组提交"""
+    sys.path.insert(0, ROOT)
+    from app import User, create_app, db, migrate_schema
+
+    app = create_app()
+    with app.app_context():
+        migrate_schema()
+        user = User(username='bench', email='bench@example.com')
+        user.set_password('bench')
+        db.session.add(user)
+        db.session.commit()
+
+    counts, errors = [], []
+    deadline = time.perf_counter() + duration
+    workers = [threading.Thread(target=worker, args=(app, deadline, counts, errors)) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+    print(json.dumps({
+        'group_commit': app.config['GROUP_COMMIT_ENABLED'],
+        'posts_per_second': round(sum(counts) / duration, 1),
+        'errors': sum(errors),
+    }, ensure_ascii=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16, help='并发发布线程数')
+    parser.add_argument('--duration', type=float, default=5, help='每种模式运行的秒数')
+    parser.add_argument('--mode', choices=['single', 'group', 'both'], default='both')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_mode(args.threads, args.duration)
+        return
+
+    modes = ['single', 'group'] if args.mode == 'both' else [args.mode]
+    for mode in modes:
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ,
+                       DATABASE_URL='sqlite:///' + os.path.join(tmp, 'bench.db'),
+                       GROUP_COMMIT_ENABLED='1' if mode == 'group' else '0')
+            subprocess.run([sys.executable, os.path.abspath(__file__), '--child',
+                            '--threads', str(args.threads), '--duration', str(args.duration)],
+                           env=env, cwd=ROOT, check=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,290 @@
+"""在 gunicorn 下压测热点接口：/search、/jobs、/login、/jobs/post，输出各场景的吞吐和 p50/p95/p99 延迟
+
+准备临时数据库（合成数据经 flask import-data 导入）并启动 gunicorn，多个客户端进程通过 keep-alive 连接持续请求，
+结果保存为 JSON，用 benchmarks/compare.py 对比两次结果。
+
+    python benchmarks/loadtest.py --companies 100000 --jobs 1000000 --output results/after.json
+    python benchmarks/loadtest.py --data /tmp/bench-data --scenarios search,jobs --duration 20
+    python benchmarks/loadtest.py --worker-class sync --workers 8 --concurrency 32 --output results/sync.json
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from urllib.parse import urlencode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import datagen  # noqa: E402
+import startup  # noqa: E402
+
+SCENARIOS = ('search', 'jobs', 'jobs_html', 'login', 'post_job')
+BENCH_USER = {'username': 'bench', 'password': 'bench-password'}
+
+CREATE_USER = """
+from app import create_app, db, User, migrate_schema
+with create_app().app_context():
+    migrate_schema()
+    if not User.query.filter_by(username={username!r}).first():
+        user = User(username={username!r}, email='bench@example.com')
+        user.set_password({password!r})
+        db.session.add(user)
+        db.session.commit()
+"""
+
+
+class Client:
+    """单个 keep-alive 连接，断开后自动重连"""
+
+    def __init__(self, port):
+        self.port = port
+        self.cookie = None
+        self.connection = None
+
+    def request(self, method, path, form=None):
+        body = urlencode(form).encode() if form is not None else None
+        headers = {'Content-Type': 'application/x-www-form-urlencoded'} if form is not None else {}
+        if self.cookie:
+            headers['Cookie'] = self.cookie
+        for attempt in range(2):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+            try:
+                self.connection.request(method, path, body=body, headers=headers)
+                response = self.connection.getresponse()
+                response.read()
+                cookie = response.getheader('Set-Cookie')
+                if cookie:
+                    self.cookie = cookie.split(';', 1)[0]
+                if response.getheader('Connection', '').lower() == 'close':
+                    self.connection.close()
+                    self.connection = None
+                return response.status
+            except (http.client.HTTPException, OSError):
+                self.connection.close()
+                self.connection = None
+                if attempt:
+                    raise
+        return None
+
+
+def make_request(scenario, client, rng, terms, counter):
+    if scenario == 'search':
+        return client.request('GET', '/search?' + urlencode({'q': rng.choice(terms['search_terms'])}))
+    if scenario == 'jobs':
+        params = {'format': 'json'}
+        if rng.random() < 0.5:
+            params['location'] = rng.choice(terms['locations'])
+        return client.request('GET', '/jobs?' + urlencode(params))
+    if scenario == 'jobs_html':
+        return client.request('GET', '/jobs')
+    if scenario == 'login':
+        return client.request('POST', '/login', BENCH_USER)
+    if scenario == 'post_job':
+        return client.request('POST', '/jobs/post', {
+            'title': f'压测职位 {counter}', 'company': '压测公司', 'location': rng.choice(terms['locations']),
+            'description': '负责 eVTOL 飞行器研发', 'requirements': '相关专业本科及以上学历',
+            'salary_range': '20k-30k', 'contact_email': 'bench@example.com',
+        })
+    raise ValueError(scenario)
+
+
+def client_worker(scenario, port, terms, warmup, duration, seed, results):
+    rng = random.Random(seed)
+    client = Client(port)
+    if scenario == 'post_job':
+        client.request('POST', '/login', BENCH_USER)
+    latencies = []
+    statuses = {}
+    counter = 0
+    began = time.perf_counter()
+    measure_from = began + warmup
+    deadline = measure_from + duration
+    while True:
+        started = time.perf_counter()
+        if started >= deadline:
+            break
+        try:
+            status = make_request(scenario, client, rng, terms, counter)
+        except (http.client.HTTPException, OSError):
+            status = 'error'
+        counter += 1
+        if started >= measure_from:
+            latencies.append(time.perf_counter() - started)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+    results.put((latencies, statuses))
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def run_scenario(scenario, port, terms, concurrency, warmup, duration):
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=client_worker,
+                                       args=(scenario, port, terms, warmup, duration, i, results))
+               for i in range(concurrency)]
+    for worker in workers:
+        worker.start()
+    collected = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+
+    latencies = sorted(latency for worker_latencies, _ in collected for latency in worker_latencies)
+    statuses = {}
+    for _, worker_statuses in collected:
+        for status, count in worker_statuses.items():
+            statuses[status] = statuses.get(status, 0) + count
+    ok = sum(count for status, count in statuses.items() if status.startswith(('2', '3')))
+    return {
+        'requests': len(latencies),
+        'throughput': round(len(latencies) / duration, 1),
+        'ok_ratio': round(ok / len(latencies), 4) if latencies else None,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+        'statuses': statuses,
+    }
+
+
+def sql_per_request(port):
+    """从 /metrics 读取每个路由的平均 SQL 语句数"""
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    connection.request('GET', '/metrics')
+    text = connection.getresponse().read().decode()
+    queries = {endpoint: float(value) for endpoint, value in
+               re.findall(r'^evtol_sql_queries_total\{endpoint="([^"]+)"\} (\S+)$', text, re.M)}
+    counts = {endpoint: float(value) for endpoint, value in
+              re.findall(r'^evtol_request_sql_queries_count\{endpoint="([^"]+)"\} (\S+)$', text, re.M)}
+    return {endpoint: round(queries[endpoint] / counts[endpoint], 2)
+            for endpoint in queries if counts.get(endpoint)}
+
+
+def server_memory(master_pid):
+    """压测结束时 gunicorn 各进程的内存（KB），PSS 之和为实际占用"""
+    workers = [startup.memory_kb(pid) for pid in startup.worker_pids(master_pid)]
+    master_rss, master_pss = startup.memory_kb(master_pid)
+    return {
+        'workers_rss_kb': [rss for rss, _ in workers],
+        'total_pss_kb': (master_pss or 0) + sum(pss or 0 for _, pss in workers),
+    }
+
+
+def prepare_database(data_dir, env):
+    for entity in ('companies', 'products', 'jobs'):
+        subprocess.run([sys.executable, '-m', 'flask', 'import-data', entity,
+                        os.path.join(data_dir, f'{entity}.jsonl'), '--chunk-size', '5000'],
+                       cwd=ROOT, env=env, check=True)
+    subprocess.run([sys.executable, '-c', CREATE_USER.format(**BENCH_USER)], cwd=ROOT, env=env, check=True)
+
+
+def wait_until_ready(port, process, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('gunicorn 启动失败')
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            connection.request('GET', '/')
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError('等待 gunicorn 超时')
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--data', help='已生成的数据目录（datagen.py 的输出），不指定时按下面的规模生成')
+    parser.add_argument('--companies', type=int, default=10000)
+    parser.add_argument('--products', type=int, default=20000)
+    parser.add_argument('--jobs', type=int, default=100000)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='逗号分隔，可选: ' + ','.join(SCENARIOS))
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn 工作进程数')
+    parser.add_argument('--worker-class', default='gthread', choices=['gthread', 'sync'], help='gunicorn 工作模式')
+    parser.add_argument('--threads', type=int, default=8, help='gthread 模式下每个工作进程的线程数')
+    parser.add_argument('--concurrency', type=int, default=8, help='客户端进程数')
+    parser.add_argument('--duration', type=float, default=10, help='每个场景计入结果的秒数')
+    parser.add_argument('--warmup', type=float, default=2, help='每个场景开始时不计入结果的秒数')
+    parser.add_argument('--port', type=int, default=8731)
+    parser.add_argument('--output', help='结果 JSON 文件，默认 benchmarks/results/<时间>.json')
+    args = parser.parse_args()
+    scenarios = [name for name in args.scenarios.split(',') if name]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f'未知场景: {", ".join(sorted(unknown))}')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = args.data or datagen.generate(os.path.join(tmp, 'data'), args.companies, args.products,
+                                                 args.jobs)
+        with open(os.path.join(data_dir, 'terms.json'), encoding='utf-8') as f:
+            terms = json.load(f)
+        env = dict(os.environ, FLASK_APP='app.py',
+                   DATABASE_URL='sqlite:///' + os.path.join(tmp, 'bench.db'),
+                   METRICS_DIR=os.path.join(tmp, 'metrics'))
+        print('导入数据...', file=sys.stderr)
+        prepare_database(data_dir, env)
+
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '-w', str(args.workers),
+             '-k', args.worker_class, '--threads', str(args.threads if args.worker_class == 'gthread' else 1),
+             '-b', f'127.0.0.1:{args.port}', '--access-logfile', '/dev/null',
+             '--error-logfile', os.path.join(tmp, 'gunicorn.log'), 'app:create_app()'],
+            cwd=ROOT, env=env
+        )
+        try:
+            wait_until_ready(args.port, server)
+            results = {}
+            for scenario in scenarios:
+                print(f'场景 {scenario}...', file=sys.stderr)
+                results[scenario] = run_scenario(scenario, args.port, terms, args.concurrency,
+                                                 args.warmup, args.duration)
+                print(json.dumps({scenario: results[scenario]}, ensure_ascii=False), file=sys.stderr)
+            sql = sql_per_request(args.port)
+            memory = server_memory(server.pid)
+        finally:
+            server.terminate()
+            try:
+                server.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                server.kill()
+                server.wait()
+
+    report = {
+        'revision': git_revision(),
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'params': {key: value for key, value in vars(args).items() if key != 'output'},
+        'scenarios': results,
+        'sql_per_request': sql,
+        'server_memory': memory,
+    }
+    output = args.output or os.path.join(ROOT, 'benchmarks', 'results',
+                                         f"{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f'结果已保存到: {output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""SQLite 读写并发基准：一个进程持续发布招聘（每条一次提交），多个进程同时读取招聘列表
+
+对比默认配置（回滚日志、FULL 同步）与 config.Config.SQLITE_PRAGMAS（WAL 等）下的读吞吐。
+
+    python benchmarks/sqlite_rw.py --readers 4 --duration 5
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from urllib.parse import quote
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config  # noqa: E402
+
+PROFILES = {
+    # 改动前的行为：默认回滚日志，pysqlite 默认 5 秒等待
+    'default': {'pragmas': {}, 'read_only': False},
+    'tuned': {'pragmas': Config.SQLITE_PRAGMAS, 'read_only': True},
+}
+
+SCHEMA = """
+CREATE TABLE job (
+    id INTEGER PRIMARY KEY,
+    title VARCHAR(200) NOT NULL,
+    company VARCHAR(100) NOT NULL,
+    location VARCHAR(100),
+    description TEXT,
+    requirements TEXT,
+    salary_range VARCHAR(100),
+    contact_email VARCHAR(120),
+    created_at DATETIME
+);
+CREATE INDEX ix_job_created_at_id ON job (created_at, id);
+"""
+
+READ_SQL = "SELECT * FROM job ORDER BY created_at DESC, id DESC LIMIT 21"
+WRITE_SQL = ("INSERT INTO job (title, company, location, description, requirements, salary_range, "
+             "contact_email, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, datetime('now'))")
+
+
+def job_row(i):
+    return (f'工程师 {i}', f'公司 {i % 50}', '深圳', '负责EVTOL飞行器研发' * 5,
+            '1. 相关专业本科及以上学历' * 3, '25k-35k', 'hr@example.com')
+
+
+def connect(path, profile, read_only):
+    if read_only:
+        connection = sqlite3.connect(f'file:{quote(path)}?mode=ro', uri=True)
+        pragmas = {k: v for k, v in profile['pragmas'].items() if k != 'journal_mode'}
+    else:
+        connection = sqlite3.connect(path)
+        pragmas = profile['pragmas']
+    for name, value in pragmas.items():
+        connection.execute(f'PRAGMA {name} = {value}')
+    return connection
+
+
+def prepare(path, profile, rows):
+    connection = connect(path, profile, read_only=False)
+    connection.executescript(SCHEMA)
+    connection.executemany(WRITE_SQL, (job_row(i) for i in range(rows)))
+    connection.commit()
+    connection.close()
+
+
+def writer(path, profile, start, duration, results):
+    connection = connect(path, profile, read_only=False)
+    count = errors = 0
+    i = 0
+    start.wait()
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        try:
+            connection.execute(WRITE_SQL, job_row(i))
+            connection.commit()
+            count += 1
+        except sqlite3.OperationalError:
+            connection.rollback()
+            errors += 1
+        i += 1
+    results.put(('write', count, errors, []))
+
+
+def reader(path, profile, start, duration, results):
+    connection = connect(path, profile, read_only=profile['read_only'])
+    count = errors = 0
+    latencies = []
+    start.wait()
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        began = time.perf_counter()
+        try:
+            connection.execute(READ_SQL).fetchall()
+            count += 1
+            latencies.append(time.perf_counter() - began)
+        except sqlite3.OperationalError:
+            errors += 1
+    results.put(('read', count, errors, latencies))
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def run(name, rows, readers, duration):
+    profile = PROFILES[name]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        prepare(path, profile, rows)
+
+        start = multiprocessing.Event()
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=writer, args=(path, profile, start, duration, results))]
+        processes += [multiprocessing.Process(target=reader, args=(path, profile, start, duration, results))
+                      for _ in range(readers)]
+        for process in processes:
+            process.start()
+        start.set()
+        collected = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+    reads = [r for r in collected if r[0] == 'read']
+    writes = [r for r in collected if r[0] == 'write']
+    latencies = [latency for r in reads for latency in r[3]]
+    return {
+        'profile': name,
+        'reads_per_second': round(sum(r[1] for r in reads) / duration, 1),
+        'read_errors': sum(r[2] for r in reads),
+        'read_p99_ms': round(percentile(latencies, 99) * 1000, 3) if latencies else None,
+        'writes_per_second': round(sum(r[1] for r in writes) / duration, 1),
+        'write_errors': sum(r[2] for r in writes),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20000, help='初始招聘数据行数')
+    parser.add_argument('--readers', type=int, default=4, help='读进程数')
+    parser.add_argument('--duration', type=float, default=5, help='每个配置运行的秒数')
+    parser.add_argument('--profile', choices=['default', 'tuned', 'both'], default='both')
+    args = parser.parse_args()
+
+    names = ['default', 'tuned'] if args.profile == 'both' else [args.profile]
+    for name in names:
+        print(json.dumps(run(name, args.rows, args.readers, args.duration), ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""对比 preload_app 开启和关闭时 gunicorn 的启动耗时和各工作进程的内存（RSS / PSS）
+
+PSS 把共享的内存页平摊到共享它的进程上，各进程 PSS 之和就是这组进程实际占用的内存。
+
+    python benchmarks/startup.py --workers 4 --output results/startup.json
+"""
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def memory_kb(pid):
+    """返回 (RSS, PSS)，单位 KB"""
+    values = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                name, _, rest = line.partition(':')
+                if name in ('Rss', 'Pss'):
+                    values[name] = int(rest.split()[0])
+    except OSError:
+        return None, None
+    return values.get('Rss'), values.get('Pss')
+
+
+def worker_pids(master_pid):
+    try:
+        with open(f'/proc/{master_pid}/task/{master_pid}/children') as f:
+            return [int(pid) for pid in f.read().split()]
+    except OSError:
+        return []
+
+
+def wait_until_ready(port, process, workers, timeout=120):
+    """等待所有工作进程启动并能处理请求"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('gunicorn 启动失败')
+        if len(worker_pids(process.pid)) >= workers:
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+                connection.request('GET', '/')
+                if connection.getresponse().status == 200:
+                    return
+            except OSError:
+                pass
+        time.sleep(0.05)
+    raise RuntimeError('等待 gunicorn 超时')
+
+
+def measure(preload, workers, port, env):
+    env = dict(env, GUNICORN_PRELOAD='1' if preload else '0')
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '-w', str(workers),
+         '-b', f'127.0.0.1:{port}', '--access-logfile', '/dev/null', '--error-logfile', '/dev/null',
+         'app:create_app()'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_until_ready(port, server, workers)
+        ready_seconds = time.perf_counter() - started
+        # 每个工作进程先处理几个请求，内存接近实际运行时的状态
+        for _ in range(workers * 4):
+            for path in ('/', '/jobs', '/search?q=eVTOL'):
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                connection.request('GET', path)
+                connection.getresponse().read()
+        master_rss, master_pss = memory_kb(server.pid)
+        worker_memory = [memory_kb(pid) for pid in worker_pids(server.pid)]
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
+    return {
+        'ready_seconds': round(ready_seconds, 3),
+        'master': {'rss_kb': master_rss, 'pss_kb': master_pss},
+        'workers': [{'rss_kb': rss, 'pss_kb': pss} for rss, pss in worker_memory],
+        'total_pss_kb': (master_pss or 0) + sum(pss or 0 for _, pss in worker_memory),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--port', type=int, default=8732)
+    parser.add_argument('--output', help='结果 JSON 文件')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, FLASK_APP='app.py', DATABASE_URL='sqlite:///' + os.path.join(tmp, 'startup.db'),
+                   METRICS_DIR=os.path.join(tmp, 'metrics'))
+        subprocess.run([sys.executable, '-m', 'flask', 'seed'], cwd=ROOT, env=env, check=True,
+                       stdout=subprocess.DEVNULL)
+        report = {mode: measure(mode == 'preload', args.workers, args.port, env)
+                  for mode in ('no_preload', 'preload')}
+
+    for mode, result in report.items():
+        workers = result['workers']
+        print(f"{mode:10} 启动 {result['ready_seconds']:.2f}s  "
+              f"工作进程平均 RSS {sum(w['rss_kb'] or 0 for w in workers) / max(len(workers), 1) / 1024:.1f}MB  "
+              f"平均 PSS {sum(w['pss_kb'] or 0 for w in workers) / max(len(workers), 1) / 1024:.1f}MB  "
+              f"合计 PSS {result['total_pss_kb'] / 1024:.1f}MB")
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,347 @@
+"""响应缓存和整页缓存：进程内 LRU（容量上限 + 过期时间，按数据表标记失效），其后可接各进程共用的 SQLite 缓存文件；
+以及基于数据表版本的条件 GET"""
+import functools
+import hashlib
+import logging
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from flask import Response, make_response, render_template, request
+from markupsafe import Markup
+
+
+logger = logging.getLogger('evtol')
+
+
+class SharedCache:
+    """同一台机器上各工作进程共用的缓存，保存在单独的 SQLite 文件中，不需要外部服务
+
+    path 为返回缓存文件路径的函数（返回 None 时不使用），每个线程各用一个连接；单条语句的读写和删除都是原子的。
+    键加上 namespace 后取哈希，namespace 变化（例如重新部署）后旧条目不再命中，过期后清除。
+    只适合键或值中已包含数据表版本的缓存：共享层不按标记失效，其他进程的修改靠版本号变化体现。
+    缓存文件出错（被锁、损坏）时按未命中处理，不影响请求。
+    """
+
+    PURGE_EVERY = 256  # 每写入多少次清理一次过期条目
+
+    def __init__(self, path, max_entries=20000, namespace=''):
+        self.path = path
+        self.max_entries = max_entries
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._writes = 0
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        path = self.path()
+        if not path:
+            return None
+        connections = getattr(self._local, 'connections', None)
+        if connections is None:
+            connections = self._local.connections = {}
+        connection = connections.get(path)
+        if connection is None:
+            connection = sqlite3.connect(path, timeout=0.1, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode = WAL')
+            connection.execute('PRAGMA synchronous = OFF')  # 缓存内容可以丢失，不需要 fsync
+            connection.execute('CREATE TABLE IF NOT EXISTS shared_cache ('
+                               'key BLOB PRIMARY KEY, expires_at REAL NOT NULL, value BLOB NOT NULL) WITHOUT ROWID')
+            connection.execute('CREATE INDEX IF NOT EXISTS shared_cache_expires ON shared_cache (expires_at)')
+            connections[path] = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def _key(self, key):
+        return hashlib.sha1(repr((self.namespace, key)).encode()).digest()
+
+    def _error(self, action, error):
+        self.errors += 1
+        logger.warning('共享缓存%s失败: %r', action, error)
+
+    def get(self, key):
+        """返回 (过期时间戳, 值)，不存在或已过期时返回 None"""
+        try:
+            connection = self._connect()
+            if connection is None:
+                return None
+            row = connection.execute('SELECT expires_at, value FROM shared_cache WHERE key = ? AND expires_at > ?',
+                                     (self._key(key), time.time())).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value = pickle.loads(row[1])
+        except (sqlite3.Error, pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+            self._error('读取', e)
+            return None
+        self.hits += 1
+        return row[0], value
+
+    def set(self, key, value, ttl):
+        try:
+            data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError) as e:
+            self._error('序列化', e)
+            return
+        try:
+            connection = self._connect()
+            if connection is None:
+                return
+            connection.execute('INSERT OR REPLACE INTO shared_cache (key, expires_at, value) VALUES (?, ?, ?)',
+                               (self._key(key), time.time() + ttl, data))
+            self._writes += 1
+            if self._writes % self.PURGE_EVERY == 0:
+                self.purge()
+        except sqlite3.Error as e:
+            self._error('写入', e)
+
+    def delete(self, key):
+        try:
+            connection = self._connect()
+            if connection is not None:
+                connection.execute('DELETE FROM shared_cache WHERE key = ?', (self._key(key),))
+        except sqlite3.Error as e:
+            self._error('删除', e)
+
+    def purge(self):
+        """删除过期条目，条目数仍超过上限时删除最早过期的条目"""
+        connection = self._connect()
+        if connection is None:
+            return
+        connection.execute('DELETE FROM shared_cache WHERE expires_at <= ?', (time.time(),))
+        excess = connection.execute('SELECT COUNT(*) FROM shared_cache').fetchone()[0] - self.max_entries
+        if excess > 0:
+            connection.execute('DELETE FROM shared_cache WHERE key IN '
+                               '(SELECT key FROM shared_cache ORDER BY expires_at LIMIT ?)', (excess,))
+
+    def clear(self):
+        try:
+            connection = self._connect()
+            if connection is not None:
+                connection.execute('DELETE FROM shared_cache')
+        except sqlite3.Error as e:
+            self._error('清空', e)
+
+    def dispose(self, close=True):
+        """丢弃所有线程的连接；fork 出的子进程传 close=False，不关闭父进程的连接"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+            self._local = threading.local()
+        if close:
+            for connection in connections:
+                connection.close()
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'errors': self.errors, 'max_entries': self.max_entries}
+
+
+class LRUCache:
+    """带容量上限和过期时间的 LRU 缓存，线程安全
+
+    指定 shared（SharedCache）和 name 时，本进程未命中再查各进程共用的缓存，写入时两层都写。
+    """
+
+    def __init__(self, max_size=512, ttl=30, shared=None, name=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.shared = shared
+        self.name = name
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # 键 -> (过期时间, 标记集合, 值)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] >= time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            if entry is not None:
+                del self._data[key]
+
+        found = self.shared.get((self.name, key)) if self.shared is not None else None
+        with self._lock:
+            if found is None:
+                self.misses += 1
+                return None
+            self.shared_hits += 1
+        expires_at, (tags, value) = found
+        # 本进程中的副本与共享条目同时过期
+        self._store(key, value, tags, time.monotonic() + max(expires_at - time.time(), 0))
+        return value
+
+    def _store(self, key, value, tags, expires):
+        with self._lock:
+            self._data[key] = (expires, frozenset(tags), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def set(self, key, value, tags=()):
+        self._store(key, value, tags, time.monotonic() + self.ttl)
+        if self.shared is not None:
+            self.shared.set((self.name, key), (tuple(tags), value), self.ttl)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+        if self.shared is not None:
+            self.shared.delete((self.name, key))
+
+    def invalidate_tags(self, tags):
+        """删除带有任一标记的条目"""
+        tags = set(tags)
+        if not tags:
+            return
+        with self._lock:
+            for key in [key for key, entry in self._data.items() if entry[1] & tags]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+            'size': len(self._data),
+            'max_size': self.max_size,
+            'ttl': self.ttl,
+        }
+
+
+def query_string_key():
+    """按查询参数（与顺序无关）区分缓存"""
+    return tuple(sorted(request.args.items(multi=True)))
+
+
+class ResponseCache(LRUCache):
+    """缓存视图函数的完整响应，只缓存 200 且非流式的响应
+
+    stamps 为可选的 stamps(tables) 函数，返回这些表的版本，版本号参与缓存键，
+    因此其他进程提交的修改也能立即让旧条目失效。
+    """
+
+    def __init__(self, max_size=512, ttl=30, stamps=None, shared=None, name=None):
+        super().__init__(max_size, ttl, shared, name)
+        self.stamps = stamps
+
+    def cached(self, key_func=query_string_key, tables=()):
+        """装饰视图函数；tables 为响应所依赖的数据表，这些表的数据提交后缓存失效"""
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                key = (request.endpoint, key_func())
+                if self.stamps is not None:
+                    key += (self.stamps(tables),)
+                entry = self.get(key)
+                if entry is not None:
+                    body, status, headers = entry
+                    response = Response(body, status=status, headers=headers)
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+
+                response = make_response(view(*args, **kwargs))
+                if response.status_code == 200 and not response.is_streamed:
+                    headers = [(name, value) for name, value in response.headers
+                               if name.lower() != 'set-cookie']
+                    self.set(key, (response.get_data(), response.status_code, headers), tables)
+                response.headers['X-Cache'] = 'MISS'
+                return response
+            return wrapper
+        return decorator
+
+
+HOLE_MARKER = '<!--hole:{}-->'
+
+
+def hole(name):
+    """模板中的占位符，缓存的整页在返回前替换为按当前用户渲染的片段"""
+    return Markup(HOLE_MARKER.format(name))
+
+
+class PageCache(LRUCache):
+    """整页 HTML 缓存，所有访客共用一份，用户相关的片段（fragments：名称 -> 模板）单独渲染后填入"""
+
+    def __init__(self, max_size=256, ttl=300, stamps=None, fragments=None, shared=None, name=None):
+        super().__init__(max_size, ttl, shared, name)
+        self.stamps = stamps
+        self.fragments = fragments or {}
+        self._fragment_cache = LRUCache(max_size, ttl)
+
+    def get_or_render(self, tables, render, key_func=query_string_key):
+        """返回缓存的页面，未命中时调用 render() 渲染；render() 返回 None 时不缓存"""
+        key = (request.endpoint, key_func())
+        if self.stamps is not None:
+            key += (self.stamps(tables),)
+        page = self.get(key)
+        if page is None:
+            page = render()
+            if page is not None:
+                self.set(key, page, tables)
+        return page
+
+    def fill(self, page, user):
+        for name, template in self.fragments.items():
+            marker = HOLE_MARKER.format(name)
+            if marker in page:
+                page = page.replace(marker, self._render_fragment(template, user))
+        return page
+
+    def _render_fragment(self, template, user):
+        key = (template, user.id, user.username) if user else (template, None)
+        html = self._fragment_cache.get(key)
+        if html is None:
+            html = render_template(template, user=user)
+            self._fragment_cache.set(key, html)
+        return html
+
+
+def conditional(stamps, tables, key_func=query_string_key, vary=()):
+    """根据 stamps(tables) 返回的版本生成强 ETag 和 Last-Modified，客户端缓存仍有效时直接返回 304，不执行视图函数
+
+    key_func 需要区分同一地址的不同响应（例如按 Accept 头选择的格式），这些请求头同时列在 vary 中。
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            current = stamps(tables)
+            etag = hashlib.sha1(repr((request.endpoint, key_func(), current)).encode()).hexdigest()
+            modified = [updated_at for _, updated_at in current if updated_at]
+            last_modified = datetime.fromtimestamp(int(max(modified)), timezone.utc) if modified else None
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
+            else:
+                not_modified = bool(last_modified and request.if_modified_since
+                                    and request.if_modified_since >= last_modified)
+            if not_modified:
+                response = Response(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            if last_modified:
+                response.last_modified = last_modified
+            for header in vary:
+                response.vary.add(header)
+            # 允许客户端和代理保存副本，但每次使用前都要重新验证
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,461 @@
+"""公司和产品目录的只读快照：列式数组加预先构建的搜索倒排索引，保存在单个文件中
+
+各工作进程用 mmap 读取（内存页由所有进程共享），/search 和联想索引直接从快照取数据，不执行 SQL、不构造 ORM 对象。
+快照记录构建时 evtol_company、evtol_product 的版本号，与数据库当前版本不一致时调用方回退到 SQL 查询；
+写入这两张表后在后台重新构建，先写临时文件再原子替换，其他进程发现文件变化后重新映射。
+
+搜索与 search_index.ranked_matches 的结果相同：按 FTS5 bm25() 的公式（列权重 COLUMN_WEIGHTS）计算得分，
+分数逐位一致，两条路径的翻页游标可以互用。
+"""
+import array
+import bisect
+import heapq
+import json
+import logging
+import math
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+import time
+from urllib.parse import quote
+
+try:
+    import fcntl
+except ImportError:  # 没有 fcntl（Windows）时不加文件锁，多个进程可能同时构建，替换仍是原子的
+    fcntl = None
+
+import search_index
+
+logger = logging.getLogger('evtol')
+
+MAGIC = b'EVCATLG1'
+TABLES = ('evtol_company', 'evtol_product')
+COMPANY_COLUMNS = ('name', 'country', 'description', 'certification_status')
+INDEXED_COLUMNS = ('name', 'country', 'description')  # 与全文索引表的列相同
+BM25_K1 = 1.2  # 与 FTS5 bm25() 相同的参数
+BM25_B = 0.75
+PHRASE_COST = 4  # 短语的每个候选行要读取原文核对，估算工作量时按 4 条倒排记录计
+
+_HEADER = struct.Struct('<8sI')  # 魔数、JSON 头部长度
+
+
+def _align(offset):
+    return (offset + 7) // 8 * 8
+
+
+class _Strings:
+    """列式字符串：offsets（n + 1 个）指向 UTF-8 数据，nulls 标记 NULL"""
+
+    def __init__(self, offsets, data, nulls):
+        self._offsets = offsets
+        self._data = data
+        self._nulls = nulls
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if self._nulls[i]:
+            return None
+        return str(self._data[self._offsets[i]:self._offsets[i + 1]], 'utf-8')
+
+    def raw(self, i):
+        """第 i 个值的 UTF-8 字节，NULL 为空"""
+        return bytes(self._data[self._offsets[i]:self._offsets[i + 1]])
+
+
+def _has_border(value):
+    """value 的某个真前缀同时也是后缀时，出现位置可能重叠"""
+    return any(value[:k] == value[-k:] for k in range(1, len(value)))
+
+
+def _count(data, needle, overlapping):
+    """needle 在 data 中出现的次数；UTF-8 按字节匹配与按字符匹配的结果相同"""
+    if not overlapping:
+        return data.count(needle)
+    count, start = 0, data.find(needle)
+    while start >= 0:
+        count += 1
+        start = data.find(needle, start + 1)
+    return count
+
+
+class Snapshot:
+    """映射到内存的快照文件，只读，可以被多个线程同时使用"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            stat = os.fstat(f.fileno())
+        self.file_id = (stat.st_ino, stat.st_mtime_ns)
+        self.size = stat.st_size
+        magic, header_size = _HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            raise ValueError(f'不是目录快照文件: {path}')
+        header = json.loads(self._mmap[_HEADER.size:_HEADER.size + header_size])
+        base = _align(_HEADER.size + header_size)
+        view = memoryview(self._mmap)
+        sections = {name: view[base + offset:base + offset + size].cast(typecode)
+                    for name, (offset, size, typecode) in header['sections'].items()}
+
+        def strings(name):
+            return _Strings(sections[name + '.off'], sections[name + '.data'], sections[name + '.null'])
+
+        self.stamps = {name: tuple(stamp) for name, stamp in header['stamps'].items()}
+        self.built_at = header['built_at']
+        self.company_id = sections['company.id']
+        self.company_norm = sections['company.norm']  # bm25() 分母中与文档长度有关的部分
+        self.company = {column: strings('company.' + column) for column in COMPANY_COLUMNS}
+        self.product_id = sections['product.id']
+        self.product_model_name = strings('product.model_name')
+        self.terms = strings('term')
+        self.posting_offsets = sections['posting.off']
+        self.posting_rows = sections['posting.row']
+        self.posting_weights = sections['posting.weight']  # 按列权重加权的词频
+        self.posting_freqs = sections['posting.freq']  # 每条倒排记录三个数：各列中出现的次数
+
+    def matches(self, stamps):
+        """快照中这些表的版本与 stamps（表名 -> 版本）一致时返回 True"""
+        return all(self.stamps.get(table) == stamp for table, stamp in stamps.items())
+
+    def company_dict(self, row):
+        return {column: self.company[column][row] for column in COMPANY_COLUMNS}
+
+    def suggest_rows(self):
+        """联想索引全量加载所需的 (id, 名称, 国家) 和 (id, 型号)"""
+        names, countries = self.company['name'], self.company['country']
+        companies = [(self.company_id[row], names[row], countries[row]) for row in range(len(self.company_id))]
+        products = [(self.product_id[row], self.product_model_name[row]) for row in range(len(self.product_id))]
+        return companies, products
+
+    def _term_range(self, prefix, exact):
+        start = bisect.bisect_left(self.terms, prefix)
+        if exact:
+            return range(start, start + (start < len(self.terms) and self.terms[start] == prefix))
+        end = start
+        while end < len(self.terms) and self.terms[end].startswith(prefix):
+            end += 1
+        return range(start, end)
+
+    def _postings_count(self, terms):
+        return sum(self.posting_offsets[t + 1] - self.posting_offsets[t] for t in terms)
+
+    def _weighted_freqs(self, kind, value):
+        """一个检索项在各行中的加权词频（与 bm25() 中的 aFreq 相同），返回 {行号: 加权词频}
+
+        列权重为整数，加权词频是整数值的浮点数，求和顺序不影响结果。
+        """
+        offsets, rows, weights = self.posting_offsets, self.posting_rows, self.posting_weights
+        if kind == 'prefix' or len(value) == 2:
+            terms = self._term_range(value, exact=kind != 'prefix')
+            if len(terms) == 1:
+                t = terms[0]
+                return dict(zip(rows[offsets[t]:offsets[t + 1]], weights[offsets[t]:offsets[t + 1]]))
+            freqs = {}
+            for t in terms:
+                for row, weight in zip(rows[offsets[t]:offsets[t + 1]], weights[offsets[t]:offsets[t + 1]]):
+                    freqs[row] = freqs.get(row, 0.0) + weight
+            return freqs
+
+        # 多个二元组组成的短语：取包含所有二元组的行，再统计原文中的出现次数（与相邻二元组的出现次数相同），
+        # 最少见的二元组在某列中没有出现时，短语也不会出现在该列中
+        bigram_terms = [self._term_range(bigram, exact=True) for bigram in search_index.bigrams(value)]
+        if not all(bigram_terms):
+            return {}
+        bigram_terms.sort(key=self._postings_count)
+        t = bigram_terms[0][0]
+        candidates = dict(zip(rows[offsets[t]:offsets[t + 1]], range(offsets[t], offsets[t + 1])))
+        for terms in bigram_terms[1:]:
+            t = terms[0]
+            found = set(rows[offsets[t]:offsets[t + 1]])
+            candidates = {row: j for row, j in candidates.items() if row in found}
+
+        needle, overlapping = value.encode('utf-8'), _has_border(value)
+        counts, freqs = self.posting_freqs, {}
+        for row, j in sorted(candidates.items()):
+            freq = 0.0
+            for i, (weight, column) in enumerate(zip(search_index.COLUMN_WEIGHTS, INDEXED_COLUMNS)):
+                if counts[3 * j + i]:
+                    freq += weight * _count(self.company[column].raw(row), needle, overlapping)
+            if freq:
+                freqs[row] = freq
+        return freqs
+
+    def _scan_size(self, terms):
+        """估算一次搜索的工作量，单位为倒排记录数"""
+        total = 0
+        for kind, value in terms:
+            if kind == 'prefix' or len(value) == 2:
+                total += self._postings_count(self._term_range(value, exact=kind != 'prefix'))
+            else:
+                total += PHRASE_COST * min(self._postings_count(self._term_range(bigram, exact=True))
+                                           for bigram in search_index.bigrams(value))
+        return total
+
+    def search(self, query, limit, cursor=None, max_postings=None):
+        """按相关度返回一页公司 [(公司字典, 排序键)]，最多 limit + 1 条；
+
+        需要读取的倒排记录超过 max_postings 时返回 None，由调用方改用 FTS5 查询。
+        """
+        if not query:
+            start = bisect.bisect_right(self.company_id, cursor[-1]) if cursor else 0
+            end = min(start + limit + 1, len(self.company_id))
+            return [(self.company_dict(row), [self.company_id[row]]) for row in range(start, end)]
+
+        terms = search_index.query_terms(query)
+        if not terms:
+            return []
+        if max_postings is not None and self._scan_size(terms) > max_postings:
+            return None
+
+        row_count = len(self.company_id)
+        phrase_freqs, idfs = [], []
+        for kind, value in terms:
+            freqs = self._weighted_freqs(kind, value)
+            if not freqs:
+                return []
+            idf = math.log((row_count - len(freqs) + 0.5) / (len(freqs) + 0.5))
+            phrase_freqs.append(freqs)
+            idfs.append(idf if idf > 0.0 else 1e-6)
+
+        norms, keys = self.company_norm, []
+        for row in set(phrase_freqs[0]).intersection(*phrase_freqs[1:]):
+            norm = norms[row]
+            score = 0.0
+            for idf, freqs in zip(idfs, phrase_freqs):
+                freq = freqs[row]
+                score += idf * ((freq * (BM25_K1 + 1.0)) / (freq + norm))
+            key = (-1.0 * score, self.company_id[row])
+            if cursor is None or key > tuple(cursor):
+                keys.append((key, row))
+        return [(self.company_dict(row), list(key)) for key, row in heapq.nsmallest(limit + 1, keys)]
+
+
+class _Writer:
+    """按节（section）收集数组，写出带 JSON 头部的快照文件"""
+
+    def __init__(self):
+        self.sections = []
+
+    def add(self, name, typecode, values):
+        self.sections.append((name, typecode, values if isinstance(values, array.array)
+                              else array.array(typecode, values)))
+
+    def add_strings(self, name, values):
+        offsets, data, nulls = array.array('q', [0]), bytearray(), bytearray()
+        for value in values:
+            nulls.append(value is None)
+            if value is not None:
+                data += value.encode('utf-8')
+            offsets.append(len(data))
+        self.add(name + '.off', 'q', offsets)
+        self.add(name + '.data', 'B', array.array('B', data))
+        self.add(name + '.null', 'B', array.array('B', nulls))
+
+    def write(self, path, meta):
+        layout, offset = {}, 0
+        for name, typecode, values in self.sections:
+            size = len(values) * values.itemsize
+            layout[name] = (offset, size, typecode)
+            offset = _align(offset + size)
+        header = json.dumps(dict(meta, sections=layout)).encode('utf-8')
+        with open(path, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, len(header)) + header)
+            base = _align(_HEADER.size + len(header))
+            for name, _, values in self.sections:
+                f.seek(base + layout[name][0])
+                values.tofile(f)
+            f.truncate(base + offset)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def read_stamps(connection, tables=TABLES):
+    """与 versions.TableVersions.stamps 相同格式的版本号，从未写入过的表为 (0, None)"""
+    marks = ', '.join('?' * len(tables))
+    rows = connection.execute(f'SELECT name, version, updated_at FROM table_version WHERE name IN ({marks})',
+                              tables).fetchall()
+    versions = {name: (version, updated_at) for name, version, updated_at in rows}
+    return {table: versions.get(table, (0, None)) for table in tables}
+
+
+def build(database, target):
+    """从数据库读取目录并写出快照文件（先写临时文件再替换），返回快照中的版本号"""
+    source = sqlite3.connect(f'file:{quote(os.path.abspath(database))}?mode=ro', uri=True)
+    try:
+        # 版本号和数据在同一个读事务中读取，快照与版本号一致
+        source.execute('BEGIN')
+        stamps = read_stamps(source)
+        companies = source.execute('SELECT id, name, country, description, certification_status '
+                                   'FROM evtol_company ORDER BY id').fetchall()
+        products = source.execute('SELECT id, model_name FROM evtol_product ORDER BY id').fetchall()
+    finally:
+        source.close()
+
+    postings = {}  # 词 -> (行号数组, 各列次数数组)
+    lengths = array.array('I')
+    for row, company in enumerate(companies):
+        counts = {}
+        for column, value in enumerate(company[1:4]):
+            for token in search_index.tokenize(value):
+                counts.setdefault(token, [0, 0, 0])[column] += 1
+        lengths.append(sum(sum(freqs) for freqs in counts.values()))
+        for token, freqs in counts.items():
+            entry = postings.get(token)
+            if entry is None:
+                entry = postings[token] = (array.array('I'), array.array('I'))
+            entry[0].append(row)
+            entry[1].extend(freqs)
+
+    # 与 FTS5 相同：文档长度为各列的词数之和，平均长度为总词数除以行数
+    avgdl = sum(lengths) / len(lengths) if lengths else 1.0
+    writer = _Writer()
+    writer.add('company.id', 'q', (company[0] for company in companies))
+    writer.add('company.norm', 'd', (BM25_K1 * (1 - BM25_B + BM25_B * length / avgdl) for length in lengths))
+    for i, column in enumerate(COMPANY_COLUMNS, 1):
+        writer.add_strings('company.' + column, (company[i] for company in companies))
+    writer.add('product.id', 'q', (product[0] for product in products))
+    writer.add_strings('product.model_name', (product[1] for product in products))
+
+    terms = sorted(postings)
+    w_name, w_country, w_description = search_index.COLUMN_WEIGHTS
+    offsets, rows, freqs = array.array('q', [0]), array.array('I'), array.array('I')
+    for term in terms:
+        rows.extend(postings[term][0])
+        freqs.extend(postings[term][1])
+        offsets.append(len(rows))
+    weights = array.array('d', (w_name * freqs[i] + w_country * freqs[i + 1] + w_description * freqs[i + 2]
+                                for i in range(0, len(freqs), 3)))
+    writer.add_strings('term', terms)
+    writer.add('posting.off', 'q', offsets)
+    writer.add('posting.row', 'I', rows)
+    writer.add('posting.weight', 'd', weights)
+    writer.add('posting.freq', 'I', freqs)
+
+    tmp = target + '.tmp'
+    writer.write(tmp, {'stamps': stamps, 'built_at': time.time()})
+    os.replace(tmp, target)
+    return stamps
+
+
+class CatalogSnapshots:
+    """管理快照文件：按需重新映射、检查版本、在后台线程中重新构建
+
+    paths 为返回 (数据库文件, 快照文件) 的函数，返回 None 时不使用快照。
+    """
+
+    def __init__(self, paths, retry_interval=1.0):
+        self.paths = paths
+        self.retry_interval = retry_interval  # 构建被其他进程占用时，两次尝试之间的最短秒数
+        self.hits = 0
+        self.misses = 0
+        self.builds = 0
+        self.last_build_ms = None
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._builder = None
+        self._pending = False
+        self._attempted_at = 0.0
+
+    def current(self, stamps):
+        """返回与 stamps（表名 -> 版本）一致的快照；不一致时安排重新构建并返回 None"""
+        paths = self.paths()
+        if paths is None:
+            return None
+        snapshot = self._snapshot
+        if snapshot is None or not snapshot.matches(stamps):
+            # 其他进程可能已经构建了新文件
+            snapshot = self._reload(paths[1])
+        if snapshot is not None and snapshot.matches(stamps):
+            self.hits += 1
+            return snapshot
+        self.misses += 1
+        self.request_build()
+        return None
+
+    def _reload(self, path):
+        try:
+            stat = os.stat(path)
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.file_id != (stat.st_ino, stat.st_mtime_ns):
+                snapshot = self._snapshot = Snapshot(path)
+            return snapshot
+        except (OSError, ValueError, KeyError, struct.error) as e:
+            # 文件损坏或格式不符时当作没有快照，下次构建时覆盖
+            if not isinstance(e, FileNotFoundError):
+                logger.warning('读取目录快照失败: %r', e)
+            return None
+
+    def request_build(self):
+        """在后台线程中重新构建；构建期间再次请求时，本次完成后再构建一次"""
+        with self._lock:
+            self._pending = True
+            if self._builder is not None or time.monotonic() - self._attempted_at < self.retry_interval:
+                return
+            self._attempted_at = time.monotonic()
+            self._builder = threading.Thread(target=self._run, name='catalog-snapshot', daemon=True)
+            self._builder.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._builder = None
+                    return
+                self._pending = False
+            try:
+                if not self.build(wait=False):
+                    # 其他进程正在构建，文件替换后各进程会重新映射
+                    with self._lock:
+                        self._builder = None
+                    return
+            except Exception as e:
+                logger.warning('构建目录快照失败: %r', e)
+
+    def build(self, wait=True):
+        """快照落后于数据库时重新构建；wait=False 且其他进程正在构建时、或者构建失败时返回 False"""
+        paths = self.paths()
+        if paths is None:
+            return False
+        try:
+            return self._build(*paths, wait)
+        except (OSError, sqlite3.Error) as e:
+            # 没有快照时各请求查询数据库，不影响启动和写入
+            logger.warning('构建目录快照失败: %r', e)
+            return False
+
+    def _build(self, database, target, wait):
+        with open(target + '.lock', 'a') as lock:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | (0 if wait else fcntl.LOCK_NB))
+                except BlockingIOError:
+                    return False
+            snapshot = self._reload(target)
+            connection = sqlite3.connect(f'file:{quote(os.path.abspath(database))}?mode=ro', uri=True)
+            try:
+                stamps = read_stamps(connection)
+            finally:
+                connection.close()
+            if snapshot is None or not snapshot.matches(stamps):
+                started = time.perf_counter()
+                build(database, target)
+                self.builds += 1
+                self.last_build_ms = round((time.perf_counter() - started) * 1000, 2)
+                self._reload(target)
+        return True
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'builds': self.builds,
+            'last_build_ms': self.last_build_ms,
+            'companies': len(snapshot.company_id) if snapshot else None,
+            'products': len(snapshot.product_id) if snapshot else None,
+            'size': snapshot.size if snapshot else None,
+            'built_at': snapshot.built_at if snapshot else None,
+        }
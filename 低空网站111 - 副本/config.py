@@ -1,17 +1,83 @@
 import os
 
+CPU_COUNT = os.cpu_count() or 1
+
 class Config:
     # 基础配置
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'your-secret-key'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///database.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # gunicorn 工作模式（gunicorn.conf.py 读取）：gthread 每个进程用多个线程处理请求，慢客户端和慢查询只占用一个线程；
+    # 设为 sync 时每个进程同时只处理一个请求
+    SERVER_WORKER_CLASS = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+    # 工作进程数，未设置时按 CPU 核数计算：gthread 的线程在等待 SQLite 和密码哈希进程时释放 GIL，每个核一个进程即可；
+    # sync 模式靠进程数提高并发
+    SERVER_WORKERS = int(os.environ.get('GUNICORN_WORKERS', 0)) or (
+        CPU_COUNT + 1 if SERVER_WORKER_CLASS == 'gthread' else CPU_COUNT * 2 + 1
+    )
+    SERVER_THREADS = int(os.environ.get('GUNICORN_THREADS', 8))  # gthread 模式下每个工作进程的线程数
+    
+    # SQLite 存储配置：每个连接建立时执行的 PRAGMA
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',  # 读写互不阻塞，写入不会让读请求等待
+        'synchronous': 'NORMAL',  # WAL 模式下只在检查点时 fsync，进程崩溃不丢数据
+        'busy_timeout': 5000,  # 等待其他进程释放写锁的毫秒数
+        'mmap_size': 268435456,  # 256MB 内存映射读取
+        'cache_size': -64000,  # 每个连接约 64MB 页缓存
+    }
+    SQLITE_READ_ONLY_CONNECTIONS = True  # GET 请求使用只读连接
+    SQLITE_READ_POOL_SIZE = max(5, SERVER_THREADS)  # 每个进程的只读连接数（可临时再超出同样数量），不少于线程数
+    SQLITE_WRITE_POOL_SIZE = 1  # 每个进程只有一个写连接，进程内的写入依次进行
+    SQLITE_BEGIN_IMMEDIATE = True  # 写事务开始时即获取写锁
+
+    # 分组提交：发布招聘和注册的写入合并为一次提交，调用方在所在批次提交后才返回
+    GROUP_COMMIT_ENABLED = os.environ.get('GROUP_COMMIT_ENABLED', '').lower() in ('1', 'true', 'yes')
+    GROUP_COMMIT_MAX_BATCH = 64  # 每批最多合并的写操作数
+    GROUP_COMMIT_MAX_WAIT = 0.005  # 收到第一个写操作后最多再等待的秒数
+    GROUP_COMMIT_TIMEOUT = 10  # 调用方等待提交结果的秒数
+    GROUP_COMMIT_SYNCHRONOUS = 'FULL'  # 开启分组提交时写连接的同步级别，每次提交都 fsync，成本由整批分摊
+    
+    # 密码哈希配置：PBKDF2 在进程池中计算，不占用 Web 工作进程
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:260000'  # 修改后，旧哈希在用户下次登录时自动升级
+    # 每个 Web 工作进程的哈希进程数，0 表示在请求线程中计算；默认把 CPU 核数平均分给各工作进程，
+    # 整台机器上的哈希进程数约等于核数，不随工作进程数成倍增加
+    PASSWORD_HASH_WORKERS = max(1, CPU_COUNT // SERVER_WORKERS)
+    PASSWORD_HASH_MAX_PENDING = 16  # 每个 Web 工作进程同时等待哈希的请求上限，超过返回 503
+    PASSWORD_HASH_TIMEOUT = 10  # 从请求开始哈希到拿到结果最多等待的秒数
+    
+    # 指标和日志配置
+    # 各工作进程的指标文件目录，为空时只统计本进程；gunicorn.conf.py 未设置时使用临时目录，不写入代码目录
+    METRICS_DIR = os.environ.get('METRICS_DIR', '')
+    METRICS_FLUSH_INTERVAL = 1.0  # 工作进程写出指标文件的最短间隔秒数
+    SLOW_QUERY_SECONDS = 0.1  # 超过该耗时的 SQL 连同参数记入慢查询日志
+    SLOW_REQUEST_SECONDS = 1.0  # 超过该耗时的请求一定记录日志
+    REQUEST_LOG_SAMPLE_RATE = 0.01  # 其他请求按该比例抽样记录
+    SEARCH_LOG_SAMPLE_RATE = 0.1  # 搜索关键词日志的抽样比例
+    LOG_LEVEL = 'INFO'
+    QUERY_GUARD_LARGE_TABLES = ('user', 'evtol_company', 'evtol_product', 'job')  # flask check-queries 不允许全表扫描的表
+
     # 管理后台配置
     FLASK_ADMIN_SWATCH = 'cerulean'
+
+    # 搜索和缓存配置
+    SUGGEST_REFRESH_SECONDS = 300  # 联想索引兜底的全量刷新间隔；公司或产品表的版本号变化时立即重新加载
+    RESPONSE_CACHE_SIZE = 512  # 响应缓存最多条目数
+    RESPONSE_CACHE_TTL = 30  # 响应缓存过期秒数
+    PAGE_CACHE_SIZE = 256  # 整页缓存最多条目数
+    PAGE_CACHE_TTL = 300  # 整页缓存过期秒数
+    USER_CACHE_SIZE = 1024  # 登录用户信息缓存最多条目数
+    USER_CACHE_TTL = 300  # 登录用户信息缓存过期秒数
+    SHARED_CACHE_ENABLED = os.environ.get('SHARED_CACHE', '1') != '0'  # 以上三种缓存之后再接一层各进程共用的缓存文件（<数据库>-cache）
+    SHARED_CACHE_MAX_ENTRIES = 20000  # 共享缓存文件最多条目数
+    VERSION_CHECK_INTERVAL = 1.0  # 数据表版本号的进程内复用秒数，即其他进程修改数据后的最长延迟
+    CATALOG_SNAPSHOT_ENABLED = os.environ.get('CATALOG_SNAPSHOT', '1') != '0'  # /search 和联想索引读取目录快照（<数据库>-catalog）
+    CATALOG_SNAPSHOT_MAX_POSTINGS = 10000  # 一次搜索在快照中最多读取的倒排记录数，更宽泛的词交给 FTS5 查询（此时比快照更快）
     
     # 静态文件配置
     STATIC_FOLDER = 'static'
     TEMPLATES_FOLDER = 'templates'
+    ASSET_MAX_AGE = 31536000  # static/dist/ 下带内容哈希的文件的浏览器缓存秒数（一年）
 
 class ProductionConfig(Config):
     DEBUG = False
@@ -0,0 +1,100 @@
+"""批量导入导出的文件读写：CSV / JSONL 逐行流式处理，按块交给调用方，内存占用与文件大小无关"""
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+
+FORMATS = ('csv', 'jsonl')
+
+
+def detect_format(path, fmt=None):
+    """未指定格式时按扩展名判断，标准输入输出默认为 JSONL"""
+    if fmt:
+        return fmt
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    if extension in ('jsonl', 'ndjson', 'json'):
+        return 'jsonl'
+    if extension == 'csv':
+        return 'csv'
+    if path == '-':
+        return 'jsonl'
+    raise ValueError(f'无法从文件名判断格式: {path}，请用 --format 指定')
+
+
+def open_stream(path, mode):
+    """打开文件，'-' 表示标准输入输出；CSV 需要 newline=''，带 BOM 的 UTF-8 文件也能读取"""
+    if path == '-':
+        return open((sys.stdin if mode == 'r' else sys.stdout).fileno(), mode, encoding='utf-8',
+                    newline='', closefd=False)
+    return open(path, mode, encoding='utf-8-sig' if mode == 'r' else 'utf-8', newline='')
+
+
+def read_rows(stream, fmt):
+    """逐行读取为字典；CSV 的空字符串视为空值"""
+    if fmt == 'csv':
+        for row in csv.DictReader(stream):
+            yield {key: (value if value != '' else None) for key, value in row.items()}
+    else:
+        for line in stream:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+class RowWriter:
+    def __init__(self, stream, fmt, fields):
+        self.stream = stream
+        self.fmt = fmt
+        self.fields = fields
+        if fmt == 'csv':
+            self._csv = csv.DictWriter(stream, fields, extrasaction='ignore')
+            self._csv.writeheader()
+
+    def write(self, row):
+        if self.fmt == 'csv':
+            self._csv.writerow(row)
+        else:
+            self.stream.write(json.dumps({field: row.get(field) for field in self.fields},
+                                         ensure_ascii=False, default=str) + '\n')
+
+
+def chunked(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Progress:
+    """累计处理行数，每隔 interval 秒和结束时输出速度"""
+
+    def __init__(self, echo, label, interval=1.0):
+        self.echo = echo
+        self.label = label
+        self.interval = interval
+        self.rows = 0
+        self.counts = {}
+        self._started = time.perf_counter()
+        self._reported = self._started
+
+    def add(self, rows, counts=None):
+        """counts 为分类计数，如 {'插入': 10, '更新': 2}"""
+        self.rows += rows
+        for name, value in (counts or {}).items():
+            self.counts[name] = self.counts.get(name, 0) + value
+        now = time.perf_counter()
+        if now - self._reported >= self.interval:
+            self._reported = now
+            self.echo(self._line())
+
+    def done(self):
+        self.echo(self._line() + '，完成')
+
+    def _line(self):
+        elapsed = max(time.perf_counter() - self._started, 1e-9)
+        details = ''.join(f'，{name} {value}' for name, value in self.counts.items())
+        return f'{self.label} {self.rows} 行{details}，{self.rows / elapsed:.0f} 行/秒'
@@ -1,16 +1,29 @@
-# gunicorn 配置文件
-import multiprocessing
+# gunicorn 配置文件，入口为 app:create_app()
+import os
+import shutil
+import tempfile
+
+# 指标文件目录：未通过 METRICS_DIR 指定时，每个 gunicorn 主进程在临时目录中使用自己的目录（须在导入 config 之前设置）
+_default_metrics_dir = os.path.join(tempfile.gettempdir(), f'evtol-metrics-{os.getpid()}')
+os.environ.setdefault('METRICS_DIR', _default_metrics_dir)
+
+from config import Config
 
 # 监听地址和端口
 bind = "0.0.0.0:8000"
 
-# 工作进程数
-workers = multiprocessing.cpu_count() * 2 + 1
+# 在主进程中导入应用并完成启动准备，工作进程 fork 后共享这部分内存（写时复制）
+# 设置 GUNICORN_PRELOAD=0 可关闭，用于对比或修改代码后只重启工作进程
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') != '0'
 
-# 工作模式
-worker_class = 'sync'
+# 工作模式、进程数和线程数由 config.py 中的 SERVER_* 配置，可用 GUNICORN_WORKER_CLASS 等环境变量覆盖
+worker_class = Config.SERVER_WORKER_CLASS
+threads = Config.SERVER_THREADS if worker_class == 'gthread' else 1
 
-# 最大客户端并发数量
+# 工作进程数在 config.py 中计算，密码哈希进程池按它分配每个工作进程的进程数
+workers = Config.SERVER_WORKERS
+
+# gthread 工作进程最多同时保持的客户端连接数（包括空闲的 keep-alive 连接），sync 模式不使用
 worker_connections = 1000
 
 # 进程名称
@@ -26,4 +39,31 @@ accesslog = "logs/access.log"
 errorlog = "logs/error.log"
 
 # 日志级别
-loglevel = 'info' 
\ No newline at end of file
+loglevel = 'info'
+
+# 指标：每个工作进程把指标写入 METRICS_DIR，/metrics 汇总
+def on_starting(server):
+    import metrics
+    metrics.clear_directory(Config.METRICS_DIR)
+
+# 主进程退出时删除自动创建的临时指标目录
+def on_exit(server):
+    if Config.METRICS_DIR == _default_metrics_dir:
+        shutil.rmtree(_default_metrics_dir, ignore_errors=True)
+
+# 工作进程退出后保留它的计数，重启工作进程时指标不会倒退
+def child_exit(server, worker):
+    import metrics
+    metrics.mark_process_dead(worker.pid, Config.METRICS_DIR) 
+
+# fork 出的工作进程不沿用主进程的数据库连接（preload_app 时主进程已经创建了应用）
+def post_fork(server, worker):
+    import sys
+    app_module = sys.modules.get('app')
+    if app_module is not None and server.app.callable is not None:
+        app_module.dispose_engines(server.app.callable, close=False)
+
+# 记录各工作进程启动后的内存，用于对比 preload_app 的效果
+def post_worker_init(worker):
+    import metrics
+    metrics.log_event('worker_started', rss_kb=metrics.rss_kb())
@@ -0,0 +1,122 @@
+"""密码哈希：PBKDF2 计算放到有界进程池中执行，排队过多时直接拒绝，不占满 Web 工作进程"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HashingBusy(Exception):
+    """等待哈希的请求超过上限或等待超时"""
+
+
+def _timed(func, *args):
+    # 在子进程中执行，返回结果和纯计算耗时
+    began = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - began
+
+
+def _hash(password, method):
+    return generate_password_hash(password, method=method)
+
+
+class PasswordHasher:
+    """workers 为 0 时在当前线程计算（命令行和初始化数据时使用）；registry 为 metrics.Registry 时同时记录到 /metrics"""
+
+    def __init__(self, method='pbkdf2:sha256:260000', workers=2, max_pending=16, timeout=10, registry=None):
+        self.configure(method, workers, max_pending, timeout)
+        self.calls = 0
+        self.rejected = 0
+        self.compute_seconds = 0.0  # 子进程中的计算时间
+        self.wait_seconds = 0.0  # 请求线程等待的总时间，包括排队
+        self.max_wait_seconds = 0.0
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.registry = registry
+
+    def configure(self, method, workers, max_pending, timeout):
+        """设置哈希参数，在开始计算之前调用"""
+        self.method = method
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def hash(self, password):
+        return self._run(_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        if not pwhash:
+            return False
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """哈希不是用当前的算法和迭代次数生成的"""
+        return bool(pwhash) and pwhash.split('$', 1)[0] != self.method
+
+    def stats(self):
+        return {
+            'method': self.method,
+            'workers': self.workers,
+            'calls': self.calls,
+            'rejected': self.rejected,
+            'compute_seconds': round(self.compute_seconds, 3),
+            'wait_seconds': round(self.wait_seconds, 3),
+            'max_wait_seconds': round(self.max_wait_seconds, 3),
+        }
+
+    def _run(self, func, *args):
+        # 排队、启动进程池和计算共用同一个截止时间，整个调用最多等待 timeout 秒
+        began = time.perf_counter()
+        if not self._slots.acquire(blocking=False):
+            self._reject('busy')
+            raise HashingBusy('password hashing queue is full')
+        if self.workers:
+            try:
+                future = self._get_executor().submit(_timed, func, *args)
+            except Exception:
+                self._slots.release()
+                raise
+            # 等待超时后已经开始的计算仍在进行，名额到计算结束才归还；还在排队的直接取消
+            future.add_done_callback(lambda _: self._slots.release())
+            try:
+                result, elapsed = future.result(max(0.0, self.timeout - (time.perf_counter() - began)))
+            except TimeoutError:
+                future.cancel()
+                self._reject('timeout')
+                raise HashingBusy('password hashing timed out')
+        else:
+            try:
+                result, elapsed = _timed(func, *args)
+            finally:
+                self._slots.release()
+
+        waited = time.perf_counter() - began
+        with self._lock:
+            self.calls += 1
+            self.compute_seconds += elapsed
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        if self.registry is not None:
+            self.registry.observe('evtol_password_hash_wait_seconds', {}, waited)
+            self.registry.observe('evtol_password_hash_compute_seconds', {}, elapsed)
+        return result
+
+    def _reject(self, reason):
+        with self._lock:
+            self.rejected += 1
+        if self.registry is not None:
+            self.registry.inc('evtol_password_hash_rejected_total', {'reason': reason})
+
+    def _get_executor(self):
+        # 每个 Web 工作进程在第一次使用时创建自己的进程池；用 spawn 避免复制带线程的父进程
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    self.workers, mp_context=multiprocessing.get_context('spawn')
+                )
+                self._pid = os.getpid()
+            return self._executor
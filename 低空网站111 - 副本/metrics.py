@@ -0,0 +1,329 @@
+"""请求耗时、SQL 次数和耗时、模板渲染耗时的指标，以 Prometheus 文本格式输出；以及抽样的结构化日志
+
+gunicorn 的每个工作进程把自己的指标定期写入 METRICS_DIR/metrics_<pid>.json，
+/metrics 汇总目录中所有进程的数据；工作进程退出后其数据并入 metrics_dead.json，计数不会倒退。
+"""
+import atexit
+import fcntl
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+from flask import g, has_request_context, request
+from flask.signals import before_render_template, signals_available, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+DEAD_FILE = 'metrics_dead.json'
+
+logger = logging.getLogger('evtol')
+
+
+def log_event(event_name, sample_rate=1.0, level=logging.INFO, **fields):
+    """输出一行 JSON 日志；sample_rate 小于 1 时按比例抽样"""
+    if sample_rate < 1.0 and random.random() >= sample_rate:
+        return
+    if not logger.isEnabledFor(level):
+        return
+    record = {'event': event_name, 'time': round(time.time(), 3), 'pid': os.getpid()}
+    if sample_rate < 1.0:
+        record['sample_rate'] = sample_rate
+    record.update(fields)
+    logger.log(level, json.dumps(record, ensure_ascii=False, default=str))
+
+
+def configure_logging(level='INFO'):
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.propagate = False
+    logger.setLevel(level)
+
+
+def rss_kb(pid='self'):
+    """进程的常驻内存（KB），无法读取 /proc 时返回 None"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _labels_key(labels):
+    return json.dumps(sorted(labels.items()), ensure_ascii=False)
+
+
+class Registry:
+    """进程内的计数器和直方图，线程安全"""
+
+    def __init__(self):
+        self.counters = {}  # 名称 -> {标签: 值}
+        self.histograms = {}  # 名称 -> {标签: [各桶计数..., 总和, 次数]}
+        self.buckets = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, labels, value=1):
+        key = _labels_key(labels)
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, labels, value, buckets=LATENCY_BUCKETS):
+        key = _labels_key(labels)
+        with self._lock:
+            self.buckets[name] = buckets
+            series = self.histograms.setdefault(name, {})
+            data = series.get(key)
+            if data is None:
+                data = series[key] = [0] * (len(buckets) + 2)
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    data[i] += 1
+                    break
+            data[-2] += value
+            data[-1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': {name: dict(series) for name, series in self.counters.items()},
+                'histograms': {name: {key: list(data) for key, data in series.items()}
+                               for name, series in self.histograms.items()},
+                'buckets': {name: list(buckets) for name, buckets in self.buckets.items()},
+            }
+
+
+def merge(total, snapshot):
+    """把 snapshot 累加到 total 上"""
+    for name, series in snapshot.get('counters', {}).items():
+        target = total.setdefault('counters', {}).setdefault(name, {})
+        for key, value in series.items():
+            target[key] = target.get(key, 0) + value
+    for name, series in snapshot.get('histograms', {}).items():
+        total.setdefault('buckets', {})[name] = snapshot['buckets'][name]
+        target = total.setdefault('histograms', {}).setdefault(name, {})
+        for key, data in series.items():
+            if key in target:
+                target[key] = [a + b for a, b in zip(target[key], data)]
+            else:
+                target[key] = list(data)
+    return total
+
+
+def _format_labels(key, extra=()):
+    pairs = [tuple(pair) for pair in json.loads(key)] + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def render_text(snapshot, help_texts=None):
+    """输出 Prometheus 文本格式"""
+    help_texts = help_texts or {}
+    lines = []
+    for name, series in sorted(snapshot.get('counters', {}).items()):
+        if name in help_texts:
+            lines.append(f'# HELP {name} {help_texts[name]}')
+        lines.append(f'# TYPE {name} counter')
+        for key, value in sorted(series.items()):
+            lines.append(f'{name}{_format_labels(key)} {value}')
+    for name, series in sorted(snapshot.get('histograms', {}).items()):
+        buckets = snapshot['buckets'][name]
+        if name in help_texts:
+            lines.append(f'# HELP {name} {help_texts[name]}')
+        lines.append(f'# TYPE {name} histogram')
+        for key, data in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(buckets, data):
+                cumulative += count
+                lines.append(f'{name}_bucket{_format_labels(key, [("le", bound)])} {cumulative}')
+            lines.append(f'{name}_bucket{_format_labels(key, [("le", "+Inf")])} {data[-1]}')
+            lines.append(f'{name}_sum{_format_labels(key)} {round(data[-2], 6)}')
+            lines.append(f'{name}_count{_format_labels(key)} {data[-1]}')
+    return '\n'.join(lines) + '\n'
+
+
+def _write_json(path, data):
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(path + '.tmp', path)
+
+
+def _read_json(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def mark_process_dead(pid, directory):
+    """工作进程退出后（gunicorn child_exit 钩子中调用）把它的数据并入 metrics_dead.json"""
+    path = os.path.join(directory, f'metrics_{pid}.json')
+    if not os.path.exists(path):
+        return
+    with open(os.path.join(directory, 'metrics.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        dead_path = os.path.join(directory, DEAD_FILE)
+        _write_json(dead_path, merge(_read_json(dead_path), _read_json(path)))
+        os.remove(path)
+
+
+def clear_directory(directory):
+    """主进程启动时清除上次运行留下的数据"""
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        if name.startswith('metrics'):
+            os.remove(os.path.join(directory, name))
+
+
+HELP = {
+    'evtol_request_duration_seconds': '请求处理耗时（不含流式响应的输出时间）',
+    'evtol_request_sql_queries': '每个请求执行的 SQL 语句数',
+    'evtol_sql_queries_total': 'SQL 语句数',
+    'evtol_sql_seconds_total': 'SQL 语句总耗时',
+    'evtol_slow_queries_total': '超过 SLOW_QUERY_SECONDS 的 SQL 语句数',
+    'evtol_template_render_seconds': '模板渲染耗时（包括嵌套模板）',
+    'evtol_password_hash_wait_seconds': '请求线程等待密码哈希的时间，包括排队',
+    'evtol_password_hash_compute_seconds': '密码哈希的纯计算时间',
+    'evtol_password_hash_rejected_total': '排队已满（busy）或等待超时（timeout）被拒绝的密码哈希',
+}
+
+
+class RequestMetrics:
+    """Flask 扩展：记录每个路由的耗时、SQL 次数和耗时、模板渲染耗时"""
+
+    def __init__(self, app=None):
+        self.registry = Registry()
+        self.directory = None
+        self.flush_interval = 1.0
+        self.slow_query_seconds = 0.1
+        self.slow_request_seconds = 1.0
+        self.request_log_sample_rate = 0.0
+        self._dirty = False
+        self._flusher_pid = None
+        self._flush_lock = threading.Lock()  # 后台线程和 /metrics 请求线程写同一个文件
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.directory = app.config['METRICS_DIR']
+        self.flush_interval = app.config['METRICS_FLUSH_INTERVAL']
+        self.slow_query_seconds = app.config['SLOW_QUERY_SECONDS']
+        self.slow_request_seconds = app.config['SLOW_REQUEST_SECONDS']
+        self.request_log_sample_rate = app.config['REQUEST_LOG_SAMPLE_RATE']
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            atexit.register(self._flush_at_exit)
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        # 所有引擎（写连接和只读连接）都统计；多个应用共用一个 RequestMetrics 时只监听一次
+        if not event.contains(Engine, 'after_cursor_execute', self._after_execute):
+            event.listen(Engine, 'before_cursor_execute', self._before_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_execute)
+        if signals_available:
+            before_render_template.connect(self._before_render, app)
+            template_rendered.connect(self._after_render, app)
+
+    def _start_request(self):
+        g.metrics_started = time.perf_counter()
+        g.sql_queries = 0
+        g.sql_seconds = 0.0
+
+    def _finish_request(self, response):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        endpoint = request.endpoint or 'unmatched'
+        labels = {'endpoint': endpoint, 'method': request.method, 'status': response.status_code}
+        self.registry.observe('evtol_request_duration_seconds', labels, elapsed)
+        self.registry.observe('evtol_request_sql_queries', {'endpoint': endpoint}, g.sql_queries,
+                              QUERY_COUNT_BUCKETS)
+        self.registry.inc('evtol_sql_queries_total', {'endpoint': endpoint}, g.sql_queries)
+        self.registry.inc('evtol_sql_seconds_total', {'endpoint': endpoint}, g.sql_seconds)
+
+        slow = elapsed >= self.slow_request_seconds
+        log_event('request', 1.0 if slow else self.request_log_sample_rate,
+                  logging.WARNING if slow else logging.INFO,
+                  method=request.method, path=request.full_path.rstrip('?'), endpoint=endpoint,
+                  status=response.status_code, duration_ms=round(elapsed * 1000, 2),
+                  sql_queries=g.sql_queries, sql_ms=round(g.sql_seconds * 1000, 2))
+        self._dirty = True
+        self._ensure_flusher()
+        return response
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['metrics_started'].pop()
+        endpoint = None
+        if has_request_context() and 'sql_queries' in g:
+            g.sql_queries += 1
+            g.sql_seconds += elapsed
+            endpoint = request.endpoint
+        if elapsed >= self.slow_query_seconds:
+            self.registry.inc('evtol_slow_queries_total', {})
+            log_event('slow_query', level=logging.WARNING, endpoint=endpoint,
+                      duration_ms=round(elapsed * 1000, 2), statement=statement,
+                      parameters=parameters if not executemany else f'{len(parameters)} 组参数')
+
+    def _before_render(self, sender, template, context, **extra):
+        if has_request_context():
+            g.setdefault('template_started', []).append(time.perf_counter())
+
+    def _after_render(self, sender, template, context, **extra):
+        if has_request_context() and g.get('template_started'):
+            elapsed = time.perf_counter() - g.template_started.pop()
+            self.registry.observe('evtol_template_render_seconds', {'template': template.name}, elapsed)
+
+    def _ensure_flusher(self):
+        # 后台线程每隔 flush_interval 秒写出有变化的数据；fork 出的工作进程各自启动
+        if self.directory and self._flusher_pid != os.getpid():
+            self._flusher_pid = os.getpid()
+            threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True).start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            if self._dirty:
+                self.flush()
+
+    def _flush_at_exit(self):
+        # 只有处理过请求的进程才写出，命令行和初始化数据的进程不留下指标文件
+        if self._flusher_pid == os.getpid():
+            self.flush()
+
+    def flush(self):
+        """把本进程的数据写入 METRICS_DIR"""
+        if not self.directory:
+            return
+        with self._flush_lock:
+            self._dirty = False
+            _write_json(os.path.join(self.directory, f'metrics_{os.getpid()}.json'), self.registry.snapshot())
+
+    def collect(self):
+        """汇总所有工作进程（包括已退出的）的数据"""
+        if not self.directory:
+            return self.registry.snapshot()
+        self.flush()
+        total = {}
+        for name in sorted(os.listdir(self.directory)):
+            if name.startswith('metrics') and name.endswith('.json'):
+                merge(total, _read_json(os.path.join(self.directory, name)))
+        return total
+
+    def render(self):
+        return render_text(self.collect(), HELP)
@@ -0,0 +1,126 @@
+"""查询预算检查：记录请求执行的 SQL，用 EXPLAIN QUERY PLAN 找出大表的全表扫描
+
+每个路由声明最多可执行的语句数（RouteBudget），超过预算（例如循环中逐行加载关联对象）
+或者在标记为大表的表上出现 SCAN（不走索引，或者按索引从头读到尾而不是定位）都视为失败。由 flask check-queries 调用。
+"""
+import html
+import re
+import threading
+from collections import namedtuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_PLANNED = ('SELECT', 'UPDATE', 'DELETE', 'WITH')
+# 全表扫描，或者 SCAN ... USING INDEX：按索引顺序逐行读取并过滤，行数随表增长，与全表扫描一样慢
+_SCAN_RE = re.compile(r'^SCAN (\w+)(?: AS \w+)?(?: USING (?:COVERING )?INDEX \w+)?$')
+
+Query = namedtuple('Query', ['statement', 'parameters', 'plan', 'scans'])
+
+
+class RouteBudget:
+    """路由的查询预算；form 不为 None 时发送 POST，login 为登录方式（'user' 或 'admin'）
+
+    follow 为正则表达式序列时从 path 开始，依次打开响应中每个表达式第一个分组匹配到的链接（例如下一页），
+    检查的是最后打开的链接，而不是 path 本身。
+    """
+
+    def __init__(self, name, path, max_queries, form=None, login=None, allow_scans=(), follow=()):
+        self.name = name
+        self.path = path
+        self.max_queries = max_queries
+        self.form = form
+        self.login = login
+        self.allow_scans = set(allow_scans)
+        self.follow = tuple(follow)
+
+
+class QueryRecorder:
+    """with 块内记录当前线程通过任一引擎执行的语句"""
+
+    _local = threading.local()
+    _installed = False
+
+    def __init__(self):
+        self.statements = []
+
+    @classmethod
+    def _install(cls):
+        if not cls._installed:
+            event.listen(Engine, 'before_cursor_execute', cls._record)
+            cls._installed = True
+
+    @classmethod
+    def _record(cls, conn, cursor, statement, parameters, context, executemany):
+        recorder = getattr(cls._local, 'recorder', None)
+        if recorder is not None:
+            recorder.statements.append((statement, parameters, executemany))
+
+    def __enter__(self):
+        self._install()
+        self._local.recorder = self
+        return self
+
+    def __exit__(self, *exc):
+        self._local.recorder = None
+
+
+def explain(connection, statement, parameters):
+    """返回 EXPLAIN QUERY PLAN 的说明列表，非查询语句返回空列表"""
+    if not statement.lstrip().upper().startswith(_PLANNED):
+        return []
+    rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+    return [row[-1] for row in rows]
+
+
+def reads_first_rows(statement, plan):
+    """没有 WHERE、不需要额外排序并且带 LIMIT：按 rowid 顺序读到 LIMIT 行即停止，不算全表扫描"""
+    upper = ' '.join(statement.upper().split())
+    return (' WHERE ' not in upper and ' LIMIT ' in upper
+            and not any(detail.startswith('USE TEMP B-TREE') for detail in plan))
+
+
+def full_scans(statement, plan, large_tables):
+    scans = []
+    for detail in plan:
+        match = _SCAN_RE.match(detail)
+        if match and match.group(1) in large_tables and not reads_first_rows(statement, plan):
+            scans.append(match.group(1))
+    return scans
+
+
+def analyse(engine, statements, large_tables):
+    """对记录的语句执行 EXPLAIN QUERY PLAN，返回 Query 列表"""
+    queries = []
+    with engine.connect() as connection:
+        for statement, parameters, executemany in statements:
+            plan = [] if executemany else explain(connection, statement, parameters)
+            queries.append(Query(statement, parameters, plan, full_scans(statement, plan, large_tables)))
+    return queries
+
+
+def check_route(client, engine, budget, large_tables):
+    """请求一个路由，返回 (状态码, 查询列表, 问题列表)"""
+    path = budget.path
+    for pattern in budget.follow:
+        match = re.search(pattern, client.get(path).get_data(as_text=True))
+        if match is None:
+            return None, [], [f'{path} 中没有找到要打开的链接']
+        path = html.unescape(match.group(1))
+    with QueryRecorder() as recorder:
+        if budget.form is None:
+            response = client.get(path)
+        else:
+            response = client.post(path, data=budget.form)
+    queries = analyse(engine, recorder.statements, large_tables)
+
+    problems = []
+    if response.status_code >= 400:
+        problems.append(f'状态码 {response.status_code}')
+    if len(queries) > budget.max_queries:
+        problems.append(f'执行了 {len(queries)} 条语句，预算 {budget.max_queries} 条')
+    for query in queries:
+        for table in query.scans:
+            if table not in budget.allow_scans:
+                problems.append(f'全表扫描 {table}: {" ".join(query.statement.split())[:120]}')
+    return response.status_code, queries, problems
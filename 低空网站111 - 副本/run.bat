@@ -6,5 +6,8 @@ mkdir logs
 :: 安装依赖
 pip install -r requirements.txt
 
+:: 构建带内容哈希的静态资源
+python assets.py
+
 :: 启动 Gunicorn
-gunicorn -c gunicorn.conf.py app:app 
\ No newline at end of file
+gunicorn -c gunicorn.conf.py "app:create_app()" 
\ No newline at end of file
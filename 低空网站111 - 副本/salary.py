@@ -0,0 +1,47 @@
+"""薪资范围解析：把 "25k-35k"、"2.5万-3.5万"、"30K以上" 等文本转换为月薪（元）"""
+import re
+
+_NUMBER_RE = re.compile(r'(\d+(?:\.\d+)?)\s*([kK千wW万]?)')
+# "15k·14薪"、"20-30k 13薪" 中的发薪月数不是薪资数字
+_MONTHS_RE = re.compile(r'[·•*×xX]?\s*\d+\s*薪')
+
+_UNITS = {'': 1, 'k': 1000, '千': 1000, 'w': 10000, '万': 10000}
+
+
+def parse_salary(value):
+    """解析单个薪资值，如 "25k"、"30000"，无法解析时返回 None"""
+    salary_min, salary_max = parse_salary_range(value)
+    return salary_min if salary_min is not None else salary_max
+
+
+def parse_salary_range(value):
+    """返回 (salary_min, salary_max)，单位为元/月，无法解析的一端为 None
+
+    >>> parse_salary_range('15k·14薪')
+    (15000, 15000)
+    >>> parse_salary_range('20-30k·13薪')
+    (20000, 30000)
+    >>> parse_salary_range('2.5万-3.5万 16薪')
+    (25000, 35000)
+    >>> parse_salary_range('30K以上')
+    (30000, None)
+    """
+    value = _MONTHS_RE.sub('', value or '')
+    matches = _NUMBER_RE.findall(value)[:2]
+    if not matches:
+        return None, None
+
+    # "25-35k" 这类写法只在后一个数字上带单位
+    fallback_unit = matches[-1][1].lower()
+    numbers = [float(number) * _UNITS[unit.lower() or fallback_unit] for number, unit in matches]
+    if '年' in value:
+        numbers = [number / 12 for number in numbers]
+    numbers = [int(round(number)) for number in numbers]
+
+    if len(numbers) == 1:
+        if '以上' in value or '起' in value or '+' in value:
+            return numbers[0], None
+        if '以下' in value:
+            return None, numbers[0]
+        return numbers[0], numbers[0]
+    return min(numbers), max(numbers)
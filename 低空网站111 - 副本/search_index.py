@@ -0,0 +1,180 @@
+"""EVTOL公司全文检索索引（基于 SQLite FTS5）
+
+中文按字二元组（bigram）切分，英文和数字按单词切分并转为小写，
+切分结果以空格连接后写入 FTS5 虚拟表，由 unicode61 分词器按空格建立倒排索引。
+"""
+import logging
+import re
+
+from sqlalchemy import Float, Integer, bindparam, column, text
+
+import metrics
+
+FTS_TABLE = 'evtol_company_fts'
+
+# 中文连续片段 或 英文/数字单词
+_TOKEN_RE = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+|[0-9A-Za-z]+')
+
+# bm25() 中 name、country、description 三列的权重：名称命中的权重最高，其次是国家，最后是描述
+COLUMN_WEIGHTS = (10.0, 5.0, 1.0)
+
+# None 表示尚未检测，False 表示当前 SQLite 不支持 FTS5
+_available = None
+
+
+def _is_cjk(run):
+    return not run[0].isascii()
+
+
+def bigrams(run):
+    return [run[i:i + 2] for i in range(len(run) - 1)]
+
+
+def tokenize(value):
+    """把文本切分为索引词列表"""
+    tokens = []
+    for run in _TOKEN_RE.findall(value or ''):
+        if not _is_cjk(run):
+            tokens.append(run.lower())
+        elif len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(bigrams(run))
+            # 末字单独入索引，保证任意单字都能以前缀方式命中
+            tokens.append(run[-1])
+    return tokens
+
+
+def query_terms(query):
+    """把用户输入切分为检索项：('prefix', 词) 为前缀匹配，('phrase', 中文片段) 为相邻二元组组成的短语"""
+    terms = []
+    for run in _TOKEN_RE.findall(query or ''):
+        if not _is_cjk(run):
+            terms.append(('prefix', run.lower()))
+        elif len(run) == 1:
+            terms.append(('prefix', run))
+        else:
+            terms.append(('phrase', run))
+    return terms
+
+
+def match_query(query):
+    """把用户输入转换为 FTS5 MATCH 表达式，没有可检索的词时返回 None"""
+    terms = []
+    for kind, value in query_terms(query):
+        if kind == 'prefix':
+            terms.append(f'"{value}"*')
+        else:
+            # 相邻二元组组成短语，等价于原先的子串匹配
+            terms.append('"' + ' '.join(bigrams(value)) + '"')
+    return ' AND '.join(terms) or None
+
+
+def ensure_table(connection, recheck=False):
+    """创建索引表（若不存在），返回当前 SQLite 是否支持 FTS5；recheck 为 True 时已检测过也再执行一次（换了数据库）"""
+    global _available
+    if _available is None or (recheck and _available):
+        try:
+            connection.execute(text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+                f"USING fts5(name, country, description, tokenize='unicode61', prefix='1 2')"
+            ))
+            _available = True
+        except Exception as e:
+            metrics.log_event('fts_unavailable', level=logging.WARNING, error=repr(e))  # 回退为 LIKE 查询
+            _available = False
+    return _available
+
+
+def index_company(connection, company):
+    """写入或更新一家公司的索引"""
+    if not ensure_table(connection):
+        return
+    connection.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {'id': company.id})
+    connection.execute(
+        text(f"INSERT INTO {FTS_TABLE} (rowid, name, country, description) "
+             f"VALUES (:id, :name, :country, :description)"),
+        _index_row(company.id, company.name, company.country, company.description)
+    )
+
+
+def index_companies(connection, rows):
+    """批量写入或更新索引，rows 为 (id, name, country, description) 列表"""
+    if not rows or not ensure_table(connection):
+        return
+    connection.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), [{'id': row[0]} for row in rows])
+    connection.execute(
+        text(f"INSERT INTO {FTS_TABLE} (rowid, name, country, description) "
+             f"VALUES (:id, :name, :country, :description)"),
+        [_index_row(*row) for row in rows]
+    )
+
+
+def remove_company(connection, company_id):
+    """删除一家公司的索引"""
+    if ensure_table(connection):
+        connection.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {'id': company_id})
+
+
+def rebuild(connection, batch_size=1000):
+    """从 evtol_company 表全量重建索引"""
+    if not ensure_table(connection):
+        return
+    connection.execute(text(f"DELETE FROM {FTS_TABLE}"))
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            text("SELECT id, name, country, description FROM evtol_company "
+                 "WHERE id > :last_id ORDER BY id LIMIT :limit"),
+            {'last_id': last_id, 'limit': batch_size}
+        ).fetchall()
+        if not rows:
+            break
+        connection.execute(
+            text(f"INSERT INTO {FTS_TABLE} (rowid, name, country, description) "
+                 f"VALUES (:id, :name, :country, :description)"),
+            [_index_row(*row) for row in rows]
+        )
+        last_id = rows[-1][0]
+
+
+def ensure_index(engine):
+    """启动时检查索引，与公司表行数不一致时全量重建"""
+    with engine.begin() as connection:
+        if not ensure_table(connection, recheck=True):
+            return False
+        indexed = connection.execute(text(f"SELECT count(*) FROM {FTS_TABLE}")).scalar()
+        total = connection.execute(text("SELECT count(*) FROM evtol_company")).scalar()
+        if indexed != total:
+            metrics.log_event('fts_rebuild', indexed=indexed, companies=total)
+            rebuild(connection)
+    return True
+
+
+def is_available():
+    """当前进程是否可以使用全文索引"""
+    return _available is True
+
+
+def ranked_matches(query):
+    """返回 (rowid, score) 子查询，score 为 BM25 得分（越小越相关），没有可检索的词时返回 None
+
+    参数名唯一，同一条语句中可以组合多个子查询（例如后台按多个词搜索）。
+    """
+    expression = match_query(query)
+    if expression is None:
+        return None
+    weights = ', '.join(map(str, COLUMN_WEIGHTS))
+    return text(
+        f"SELECT rowid, bm25({FTS_TABLE}, {weights}) AS score "
+        f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :q"
+    ).bindparams(bindparam('q', expression, unique=True)).columns(column('rowid', Integer), column('score', Float))
+
+
+def _index_row(company_id, name, country, description):
+    return {
+        'id': company_id,
+        'name': ' '.join(tokenize(name)),
+        'country': ' '.join(tokenize(country)),
+        'description': ' '.join(tokenize(description)),
+    }
@@ -1,3 +1,126 @@
+// 创建元素并用 textContent 写入文本，数据不会被当作 HTML 解析
+function createText(tag, className, text) {
+    const element = document.createElement(tag);
+    if (className) {
+        element.className = className;
+    }
+    element.textContent = text == null ? '' : text;
+    return element;
+}
+
+// 带粗体标签的字段，例如 “国家/地区：中国”
+function createField(className, label, text) {
+    const field = createText('p', className, text);
+    field.prepend(createText('strong', null, label));
+    return field;
+}
+
+// 公司数据来自后台编辑和导入，全部用 textContent 写入
+function renderCompany(company) {
+    const card = document.createElement('div');
+    card.className = 'company-card';
+    card.append(
+        createText('h3', null, company.name),
+        createField('company-location', '国家/地区：', company.country),
+        createText('p', 'company-desc', company.description),
+        createField('certification-status', '认证状态：', company.certification_status)
+    );
+    return card;
+}
+
+// 逐行读取 NDJSON 响应，每收到一家公司就回调一次，返回下一页游标
+async function readNdjson(response, onCompany) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let nextCursor = null;
+
+    const handleLine = line => {
+        if (!line.trim()) {
+            return;
+        }
+        const item = JSON.parse(line);
+        if (item.company) {
+            onCompany(item.company);
+        } else {
+            nextCursor = item.next_cursor;
+        }
+    };
+
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) {
+            break;
+        }
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        lines.forEach(handleLine);
+    }
+    handleLine(buffer);
+    return nextCursor;
+}
+
+async function fetchResults(query, cursor, onCompany) {
+    let url = `/search?q=${encodeURIComponent(query)}&format=ndjson`;
+    if (cursor) {
+        url += `&cursor=${encodeURIComponent(cursor)}`;
+    }
+    const response = await fetch(url, { headers: { 'Accept': 'application/x-ndjson' } });
+    if (!response.ok) {
+        throw new Error('搜索请求失败');
+    }
+    if (response.body && response.body.getReader) {
+        return readNdjson(response, onCompany);
+    }
+    // 不支持流式读取的浏览器一次性解析
+    const text = await response.text();
+    let nextCursor = null;
+    text.split('\n').filter(line => line.trim()).forEach(line => {
+        const item = JSON.parse(line);
+        if (item.company) {
+            onCompany(item.company);
+        } else {
+            nextCursor = item.next_cursor;
+        }
+    });
+    return nextCursor;
+}
+
+async function loadPage(query, cursor) {
+    const resultsDiv = document.getElementById('searchResults');
+    let count = 0;
+    const onCompany = company => {
+        if (count === 0 && !cursor) {
+            resultsDiv.innerHTML = '';
+        }
+        resultsDiv.appendChild(renderCompany(company));
+        count++;
+    };
+
+    try {
+        const nextCursor = await fetchResults(query, cursor, onCompany);
+        console.log('搜索结果:', count, '条');
+        if (count === 0 && !cursor) {
+            resultsDiv.innerHTML = '<div class="no-results">未找到相关结果</div>';
+        }
+        if (nextCursor) {
+            const more = document.createElement('button');
+            more.type = 'button';
+            more.className = 'load-more';
+            more.textContent = '加载更多';
+            more.addEventListener('click', () => {
+                more.remove();
+                loadPage(query, nextCursor);
+            });
+            resultsDiv.appendChild(more);
+        }
+    } catch (error) {
+        console.error('搜索错误:', error);
+        resultsDiv.innerHTML = '<div class="error">搜索出错，请稍后重试</div>';
+    }
+}
+
 function search() {
     const query = document.getElementById('searchInput').value;
     console.log('搜索关键词:', query);
@@ -5,47 +128,104 @@ function search() {
     const resultsDiv = document.getElementById('searchResults');
     resultsDiv.innerHTML = '<div class="loading">搜索中...</div>';
 
-    fetch(`/search?q=${encodeURIComponent(query)}`)
-        .then(response => {
-            if (!response.ok) {
-                throw new Error('搜索请求失败');
-            }
-            return response.json();
-        })
-        .then(data => {
-            console.log('搜索结果:', data);
-            let html = '';
-            
-            if (data.companies && data.companies.length > 0) {
-                data.companies.forEach(company => {
-                    html += `
-                        <div class="company-card">
-                            <h3>${company.name}</h3>
-                            <p class="company-location"><strong>国家/地区：</strong>${company.country}</p>
-                            <p class="company-desc">${company.description}</p>
-                            <p class="certification-status"><strong>认证状态：</strong>${company.certification_status}</p>
-                        </div>
-                    `;
-                });
-            } else {
-                html = '<div class="no-results">未找到相关结果</div>';
-            }
-            
-            resultsDiv.innerHTML = html;
-        })
-        .catch(error => {
-            console.error('搜索错误:', error);
-            resultsDiv.innerHTML = '<div class="error">搜索出错，请稍后重试</div>';
-        });
+    loadPage(query, null);
+}
+
+const SUGGEST_TYPES = { company: '公司', product: '产品', country: '国家' };
+
+// 输入时请求联想建议，停止输入 150ms 后才发送，只渲染最后一次请求的结果
+function attachSuggest(input) {
+    const list = input.parentElement.querySelector('.suggest-list');
+    let timer = null;
+    let latest = 0;
+
+    const close = () => {
+        list.classList.remove('open');
+        list.innerHTML = '';
+    };
+
+    const choose = text => {
+        input.value = text;
+        close();
+        document.getElementById('searchInput').value = text;
+        search();
+    };
+
+    input.addEventListener('input', () => {
+        clearTimeout(timer);
+        const query = input.value.trim();
+        if (!query) {
+            close();
+            return;
+        }
+        timer = setTimeout(() => {
+            const requestId = ++latest;
+            fetch(`/search/suggest?q=${encodeURIComponent(query)}`)
+                .then(response => response.json())
+                .then(data => {
+                    if (requestId !== latest) {
+                        return;
+                    }
+                    if (!data.suggestions || data.suggestions.length === 0) {
+                        close();
+                        return;
+                    }
+                    // 建议文本来自后台编辑和导入的数据，用 textContent 写入，不按 HTML 解析
+                    list.replaceChildren(...data.suggestions.map(item => {
+                        const li = document.createElement('li');
+                        li.dataset.text = item.text;
+                        li.textContent = item.text;
+                        const type = document.createElement('span');
+                        type.className = 'suggest-type';
+                        type.textContent = SUGGEST_TYPES[item.type] || '';
+                        li.appendChild(type);
+                        return li;
+                    }));
+                    list.classList.add('open');
+                })
+                .catch(error => console.error('联想错误:', error));
+        }, 150);
+    });
+
+    // mousedown 先于 blur 触发，避免点击前列表被关闭
+    list.addEventListener('mousedown', e => {
+        const item = e.target.closest('li');
+        if (item) {
+            e.preventDefault();
+            choose(item.dataset.text);
+        }
+    });
+
+    input.addEventListener('blur', close);
+    input.addEventListener('keydown', e => {
+        if (e.key === 'Escape') {
+            close();
+        }
+    });
 }
 
 // 添加回车键搜索功能
 document.getElementById('searchInput').addEventListener('keypress', function(e) {
     if (e.key === 'Enter') {
+        this.parentElement.querySelector('.suggest-list').classList.remove('open');
         search();
     }
 });
 
+// 导航栏搜索框回车时使用主搜索框展示结果
+const navSearch = document.querySelector('.nav-search');
+if (navSearch) {
+    navSearch.addEventListener('keypress', function(e) {
+        if (e.key === 'Enter') {
+            document.getElementById('searchInput').value = this.value;
+            this.parentElement.querySelector('.suggest-list').classList.remove('open');
+            search();
+        }
+    });
+}
+
+document.querySelectorAll('#searchInput, .nav-search').forEach(attachSuggest);
+
 // 为搜索按钮添加点击事件
 document.addEventListener('DOMContentLoaded', function() {
     const searchButton = document.querySelector('button');
@@ -0,0 +1,138 @@
+"""SQLite 存储配置：连接建立时执行 PRAGMA，请求中的查询走只读连接池，写入走每个进程唯一的写连接"""
+import sqlite3
+import threading
+from urllib.parse import quote
+
+from flask import has_request_context
+from flask_sqlalchemy import SignallingSession, SQLAlchemy
+from sqlalchemy import create_engine, event, orm
+from sqlalchemy.pool import QueuePool
+
+
+def apply_pragmas(dbapi_connection, pragmas):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+    finally:
+        cursor.close()
+
+
+def is_file_database(url):
+    return url.drivername.startswith('sqlite') and url.database not in (None, '', ':memory:')
+
+
+class RoutingSession(SignallingSession):
+    """请求中的查询使用只读连接；第一次 flush 之后到事务结束都使用写连接
+
+    这样登录等只读的 POST 请求不会占用写连接和写锁。
+    """
+
+    def __init__(self, db, **options):
+        self.db = db
+        self.writing = False
+        super().__init__(db, **options)
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self._flushing:
+            self.writing = True
+        elif not self.writing and has_request_context():
+            read_engine = self.db.get_read_engine(self.app)
+            if read_engine is not None:
+                return read_engine
+        return super().get_bind(mapper, clause)
+
+
+@event.listens_for(RoutingSession, 'after_transaction_end')
+def _end_writing(session, transaction):
+    if transaction.parent is None:
+        session.writing = False
+
+
+class SQLiteProfileSQLAlchemy(SQLAlchemy):
+    """按 SQLITE_* 配置创建 SQLite 引擎的 SQLAlchemy 扩展"""
+
+    def __init__(self, *args, **kwargs):
+        self._read_engines = {}
+        self._read_engine_lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def apply_driver_hacks(self, app, sa_url, options):
+        sa_url, options = super().apply_driver_hacks(app, sa_url, options)
+        if is_file_database(sa_url):
+            # 写连接池只有固定数量的连接，进程内的写入依次排队
+            options['poolclass'] = QueuePool
+            options['pool_size'] = app.config['SQLITE_WRITE_POOL_SIZE']
+            options['max_overflow'] = 0
+            options.setdefault('connect_args', {})['check_same_thread'] = False
+        return sa_url, options
+
+    def create_engine(self, sa_url, engine_opts):
+        engine = super().create_engine(sa_url, engine_opts)
+        if engine.dialect.name != 'sqlite':
+            return engine
+
+        config = self.get_app().config
+        pragmas = dict(config['SQLITE_PRAGMAS'])
+        if config['GROUP_COMMIT_ENABLED']:
+            # 同步级别只能在事务外设置，因此在建立写连接时按分组提交的要求设置
+            pragmas['synchronous'] = config['GROUP_COMMIT_SYNCHRONOUS']
+        begin_immediate = config['SQLITE_BEGIN_IMMEDIATE']
+
+        @event.listens_for(engine, 'connect')
+        def _on_connect(dbapi_connection, connection_record):
+            if begin_immediate:
+                # 关闭 pysqlite 自动发出的 BEGIN，改由下面的 begin 事件发出
+                dbapi_connection.isolation_level = None
+            apply_pragmas(dbapi_connection, pragmas)
+
+        if begin_immediate:
+            # 写事务一开始就获取写锁，避免读锁升级为写锁时失败
+            @event.listens_for(engine, 'begin')
+            def _on_begin(connection):
+                connection.exec_driver_sql('BEGIN IMMEDIATE')
+
+        return engine
+
+    def get_read_engine(self, app=None):
+        """返回只读引擎；内存数据库或关闭读写分离时返回 None"""
+        app = self.get_app(app)
+        if not app.config['SQLITE_READ_ONLY_CONNECTIONS']:
+            return None
+        engine = self.get_engine(app)
+        if not is_file_database(engine.url):
+            return None
+
+        with self._read_engine_lock:
+            read_engine = self._read_engines.get(engine)
+            if read_engine is None:
+                read_engine = self._create_read_engine(engine.url.database, app.config)
+                self._read_engines[engine] = read_engine
+            return read_engine
+
+    def dispose_engines(self, app=None, close=True):
+        """丢弃写引擎和只读引擎连接池中的连接，之后按需重新建立"""
+        engine = self.get_engine(self.get_app(app))
+        with self._read_engine_lock:
+            engines = [engine, self._read_engines.get(engine)]
+        for pool_engine in engines:
+            if pool_engine is not None:
+                pool_engine.dispose(close=close)
+
+    def _create_read_engine(self, path, config):
+        pragmas = {name: value for name, value in config['SQLITE_PRAGMAS'].items()
+                   if name != 'journal_mode'}
+        pragmas['query_only'] = 'ON'
+
+        def connect():
+            connection = sqlite3.connect(f'file:{quote(path)}?mode=ro', uri=True, check_same_thread=False)
+            apply_pragmas(connection, pragmas)
+            return connection
+
+        return create_engine(
+            'sqlite://', creator=connect, poolclass=QueuePool,
+            pool_size=config['SQLITE_READ_POOL_SIZE'], max_overflow=config['SQLITE_READ_POOL_SIZE']
+        )
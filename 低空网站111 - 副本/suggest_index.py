@@ -0,0 +1,140 @@
+"""搜索框联想（typeahead）使用的内存前缀索引
+
+每个工作进程持有一份有序键列表，用二分查找定位前缀，
+数据变更时只增删受影响的条目，不需要每次请求访问数据库。
+"""
+import bisect
+import threading
+import time
+
+try:
+    from pypinyin import Style, lazy_pinyin
+except ImportError:  # 未安装 pypinyin 时不生成拼音键
+    lazy_pinyin = None
+
+
+def _has_cjk(value):
+    return any(not ch.isascii() for ch in value)
+
+
+def make_keys(value):
+    """生成一个名称可被前缀匹配的所有键：全称、英文各单词起始、拼音全拼和首字母"""
+    value = (value or '').strip()
+    if not value:
+        return []
+    lowered = value.lower()
+    keys = {lowered}
+    words = lowered.split()
+    # 从第二个单词开始的后缀，使 "aviation" 也能联想到 "Joby Aviation"
+    for i in range(1, len(words)):
+        keys.add(' '.join(words[i:]))
+    if lazy_pinyin is not None and _has_cjk(value):
+        keys.add(''.join(lazy_pinyin(value)).lower())
+        keys.add(''.join(lazy_pinyin(value, style=Style.FIRST_LETTER)).lower())
+    return sorted(keys)
+
+
+class SuggestIndex:
+    """有序前缀索引，条目以 (类型, id) 标识"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = []      # 有序的 (键, 类型, id)
+        self._items = {}     # (类型, id) -> (显示文本, 键列表, 国家)
+        self._countries = {}  # 国家 -> 引用该国家的公司数
+        self.loaded_at = 0
+        self.stamps = None  # 加载时数据表的版本号，变化后由调用方重新加载
+
+    def load(self, companies, products, stamps=None):
+        """全量构建：companies 为 (id, 名称, 国家)，products 为 (id, 型号)，stamps 为读取数据前的表版本号"""
+        with self._lock:
+            self._keys = []
+            self._items = {}
+            self._countries = {}
+            for company_id, name, country in companies:
+                self._add('company', company_id, name, country)
+                self._ref_country(country, 1, insort=False)
+            for product_id, model_name in products:
+                self._add('product', product_id, model_name)
+            self._keys.sort()
+            self.loaded_at = time.time()
+            self.stamps = stamps
+
+    def upsert_company(self, company_id, name, country):
+        with self._lock:
+            old = self._items.get(('company', company_id))
+            if old is not None:
+                self._remove('company', company_id)
+                self._ref_country(old[2], -1)
+            self._add('company', company_id, name, country, insort=True)
+            self._ref_country(country, 1)
+
+    def remove_company(self, company_id):
+        with self._lock:
+            old = self._items.get(('company', company_id))
+            if old is not None:
+                self._remove('company', company_id)
+                self._ref_country(old[2], -1)
+
+    def upsert_product(self, product_id, model_name):
+        with self._lock:
+            self._remove('product', product_id)
+            self._add('product', product_id, model_name, insort=True)
+
+    def remove_product(self, product_id):
+        with self._lock:
+            self._remove('product', product_id)
+
+    def lookup(self, prefix, limit=8):
+        """返回以 prefix 开头的建议，按键的字典序，同一条目只出现一次"""
+        prefix = prefix.strip().lower()
+        results = []
+        seen = set()
+        with self._lock:
+            keys = self._keys
+            i = bisect.bisect_left(keys, (prefix,))
+            while i < len(keys) and len(results) < limit:
+                key, kind, item_id = keys[i]
+                if not key.startswith(prefix):
+                    break
+                i += 1
+                if (kind, item_id) in seen:
+                    continue
+                seen.add((kind, item_id))
+                results.append({'text': self._items[(kind, item_id)][0], 'type': kind})
+        return results
+
+    def __len__(self):
+        return len(self._items)
+
+    def _add(self, kind, item_id, text, country=None, insort=False):
+        keys = make_keys(text)
+        if not keys:
+            return
+        self._items[(kind, item_id)] = (text, keys, country)
+        for key in keys:
+            if insort:
+                bisect.insort(self._keys, (key, kind, item_id))
+            else:
+                self._keys.append((key, kind, item_id))
+
+    def _remove(self, kind, item_id):
+        item = self._items.pop((kind, item_id), None)
+        if item is None:
+            return
+        for key in item[1]:
+            i = bisect.bisect_left(self._keys, (key, kind, item_id))
+            if i < len(self._keys) and self._keys[i] == (key, kind, item_id):
+                del self._keys[i]
+
+    def _ref_country(self, country, delta, insort=True):
+        if not country:
+            return
+        count = self._countries.get(country, 0) + delta
+        if count > 0:
+            self._countries[country] = count
+            if count == delta:
+                self._add('country', country, country, insort=insort)
+        else:
+            self._countries.pop(country, None)
+            self._remove('country', country)
@@ -0,0 +1,49 @@
+"""数据表版本号：每次写入在同一事务内递增，读路由据此生成 ETag / Last-Modified"""
+import threading
+import time
+
+from sqlalchemy import text
+
+VERSION_TABLE = 'table_version'
+
+_BUMP_SQL = text(
+    f"INSERT INTO {VERSION_TABLE} (name, version, updated_at) VALUES (:name, 1, :now) "
+    f"ON CONFLICT(name) DO UPDATE SET version = version + 1, updated_at = :now"
+)
+
+
+class TableVersions:
+    """读取各表的 (版本号, 最后修改时间)，在 check_interval 秒内复用上次读取的结果"""
+
+    def __init__(self, check_interval=1.0):
+        self.check_interval = check_interval
+        self._versions = {}
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def bump(self, connection, tables):
+        """在当前事务内递增版本号，随业务数据一起提交或回滚"""
+        now = time.time()
+        for name in sorted(tables):
+            connection.execute(_BUMP_SQL, {'name': name, 'now': now})
+
+    def reset(self):
+        """本进程提交后调用，下次读取时直接查询最新版本"""
+        self._checked_at = None
+
+    def get(self, engine):
+        with self._lock:
+            now = time.monotonic()
+            if self._checked_at is None or now - self._checked_at >= self.check_interval:
+                with engine.connect() as connection:
+                    rows = connection.execute(
+                        text(f"SELECT name, version, updated_at FROM {VERSION_TABLE}")
+                    ).fetchall()
+                self._versions = {name: (version, updated_at) for name, version, updated_at in rows}
+                self._checked_at = now
+            return self._versions
+
+    def stamps(self, engine, tables):
+        """返回指定表的 ((版本号, 修改时间), ...)，从未写入过的表为 (0, None)"""
+        versions = self.get(engine)
+        return tuple(versions.get(name, (0, None)) for name in tables)
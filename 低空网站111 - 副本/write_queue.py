@@ -0,0 +1,116 @@
+"""分组提交（group commit）：多个请求的写入由后台线程合并为一次事务提交
+
+每个写操作在自己的 SAVEPOINT 中执行，失败只回滚自己；整批提交成功后才通知调用方，
+因此调用方返回响应时数据已经落盘。
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+
+class WriteQueueBusy(Exception):
+    """队列已满或等待超时，写操作没有执行，可以安全重试"""
+
+
+class GroupCommitQueue:
+    """work(session) 在写线程中执行，返回值（应为普通数据而非 ORM 对象）在提交后交给调用方
+
+    init_app(app) 之后才能提交，写线程在该应用的上下文中运行，批次大小和等待时间取 GROUP_COMMIT_* 配置。
+    """
+
+    def __init__(self, db, max_batch=64, max_wait=0.005, max_pending=1000):
+        self.app = None
+        self.db = db
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batches = 0
+        self.committed = 0
+        self._queue = queue.Queue(max_pending)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        self.max_batch = app.config['GROUP_COMMIT_MAX_BATCH']
+        self.max_wait = app.config['GROUP_COMMIT_MAX_WAIT']
+
+    def submit(self, work, timeout=10):
+        """提交写操作并等待所在批次提交完成，返回 work 的返回值或抛出其异常
+
+        排队超过 timeout 秒仍未开始执行时取消并抛出 WriteQueueBusy；已经开始执行的一直等到所在批次提交或失败，
+        不会出现调用方收到错误、数据却在之后提交的情况。
+        """
+        self._ensure_thread()
+        future = Future()
+        try:
+            self._queue.put((work, future), timeout=timeout)
+        except queue.Full:
+            raise WriteQueueBusy('group commit queue is full')
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            if future.cancel():
+                raise WriteQueueBusy('group commit timed out')
+            return future.result()
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'committed': self.committed,
+            'pending': self._queue.qsize(),
+        }
+
+    def _ensure_thread(self):
+        # 线程在第一次使用时启动，gunicorn fork 出的每个工作进程各有一个
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name='group-commit', daemon=True)
+                    self._thread.start()
+
+    def _collect(self):
+        """阻塞等待第一个写操作，再在 max_wait 内尽量凑满一批"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        with self.app.app_context():
+            while True:
+                self._commit_batch(self._collect())
+
+    def _commit_batch(self, batch):
+        session = self.db.session
+        done = []
+        try:
+            for work, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue  # 调用方等待超时已取消
+                try:
+                    with session.begin_nested():
+                        result = work(session)
+                    done.append((future, result))
+                except Exception as e:
+                    future.set_exception(e)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            for future, _ in done:
+                future.set_exception(e)
+            return
+        finally:
+            self.db.session.remove()
+
+        self.batches += 1
+        self.committed += len(done)
+        for future, result in done:
+            future.set_result(result)